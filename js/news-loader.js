@@ -1,7 +1,11 @@
 document.addEventListener('DOMContentLoaded', function() {
-    const NEWS_PER_PAGE = 9; // 每頁顯示9則新聞
+    const NEWS_PER_PAGE = 9; // 每頁顯示9則新聞（與 scripts/generate_news_shards.py 一致）
+    const SHARD_BASE = '../js/news-shards/';
+    let shardIndex = null; // news-shards/index.json；載入失敗時改用完整 manifest
+    const shardCache = new Map(); // "分類/頁碼" -> 該頁新聞
     let allNews = [];
     let filteredNews = [];
+    let currentCategory = 'all';
     let currentPage = 1;
 
     const newsGrid = document.querySelector('.news-grid');
@@ -15,18 +19,51 @@ document.addEventListener('DOMContentLoaded', function() {
         currentPage = pageFromUrl;
     }
 
-    // 獲取新聞資料
-    fetch('../js/news-manifest.json')
-        .then(response => response.json())
-        .then(data => {
+    function fetchJson(url) {
+        return fetch(url).then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}: ${url}`);
+            return response.json();
+        });
+    }
+
+    // 獲取新聞資料：優先讀取分頁 shard 索引，只下載當頁 9 則；
+    // 索引不存在時退回舊方式，一次載入完整 news-manifest.json
+    fetchJson(SHARD_BASE + 'index.json')
+        .then(index => { shardIndex = index; })
+        .catch(() => fetchJson('../js/news-manifest.json').then(data => {
             allNews = data;
             filteredNews = allNews;
-            renderPage(currentPage);
-        })
-        .catch(error => {
-            console.error('Error fetching news data:', error);
-            newsGrid.innerHTML = '<p>新聞載入失敗，請稍後再試。</p>';
-        });
+        }))
+        .then(() => renderPage(currentPage))
+        .catch(showLoadError);
+
+    function showLoadError(error) {
+        console.error('Error fetching news data:', error);
+        newsGrid.innerHTML = '<p>新聞載入失敗，請稍後再試。</p>';
+    }
+
+    // 取得分類總頁數
+    function getTotalPages() {
+        if (shardIndex) {
+            const info = shardIndex.categories[currentCategory];
+            return info ? info.pages : 0;
+        }
+        return Math.ceil(filteredNews.length / NEWS_PER_PAGE);
+    }
+
+    // 取得指定頁的新聞（shard 模式下只抓該頁檔案並快取）
+    function getPageNews(page) {
+        if (!shardIndex) {
+            const start = (page - 1) * NEWS_PER_PAGE;
+            return Promise.resolve(filteredNews.slice(start, start + NEWS_PER_PAGE));
+        }
+        if (!shardIndex.categories[currentCategory]) return Promise.resolve([]);
+        const key = `${currentCategory}/${page}`;
+        if (!shardCache.has(key)) {
+            shardCache.set(key, fetchJson(`${SHARD_BASE}${key}.json`));
+        }
+        return shardCache.get(key);
+    }
 
     // 渲染新聞卡片
     function renderNews(newsItems) {
@@ -81,26 +118,25 @@ document.addEventListener('DOMContentLoaded', function() {
         
         paginationHTML += '</div>';
         paginationContainer.innerHTML = paginationHTML;
-        
-        // 重新綁定分頁按鈕事件
-        addPaginationListeners();
     }
     
     // 渲染指定頁面
     function renderPage(page) {
-        const totalPages = Math.ceil(filteredNews.length / NEWS_PER_PAGE);
-        if (page < 1) page = 1;
+        const totalPages = getTotalPages();
         if (page > totalPages) page = totalPages;
-        
-        const start = (page - 1) * NEWS_PER_PAGE;
-        const end = start + NEWS_PER_PAGE;
-        const newsForPage = filteredNews.slice(start, end);
+        if (page < 1) page = 1;
 
-        renderNews(newsForPage);
-        renderPagination(totalPages, page);
-        
         // 更新當前頁碼
         currentPage = page;
+        const category = currentCategory;
+        getPageNews(page)
+            .then(newsForPage => {
+                // 載入期間若已切換分類或頁碼，放棄這次結果
+                if (category !== currentCategory || page !== currentPage) return;
+                renderNews(newsForPage);
+                renderPagination(totalPages, page);
+            })
+            .catch(showLoadError);
         
         // 為了SEO和使用者體驗，更新URL但不要重載頁面
         const newUrl = window.location.pathname + `?page=${page}`;
@@ -121,11 +157,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // 綁定分頁按鈕事件監聽
-    function addPaginationListeners() {
-        if (paginationContainer) {
-            paginationContainer.addEventListener('click', handlePageClick);
-        }
+    // 綁定分頁按鈕事件監聽（容器只綁一次，按鈕重繪不需重綁）
+    if (paginationContainer) {
+        paginationContainer.addEventListener('click', handlePageClick);
     }
 
     // 處理分類篩選
@@ -134,6 +168,7 @@ document.addEventListener('DOMContentLoaded', function() {
             categoryBtns.forEach(b => b.classList.remove('active'));
             this.classList.add('active');
             const selectedCategory = this.getAttribute('data-category');
+            currentCategory = selectedCategory;
             
             if (selectedCategory === 'all') {
                 filteredNews = allNews;
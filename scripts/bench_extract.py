@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Compare site_corpus.parse_page (html_events tokenizer) with the per-field
+regexes it replaced.
+- Correctness: small cases the regexes got wrong (quoted '>', markup in
+  comments and scripts, attribute-less <a>, entities, ...)
+- Agreement: both extractors over the real pages, listing any page where
+  the records differ
+- Throughput: large synthetic pages (real page bodies repeated) and a
+  pathological page with unclosed <a>/<hN> tags, which make the lazy
+  (.*?)</a> regexes rescan to the end of the file for every tag
+- Scaling: tags that never reach their '>' (or closing quote) must keep
+  the tokenizer linear; 8x the input may take at most MAX_GROWTH x the
+  time, or the run fails
+
+Usage: python3 scripts/bench_extract.py [--size-kb 1024] [--pages 20]
+"""
+from __future__ import annotations
+import argparse
+import re
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from site_corpus import Page, iter_html_files, parse_page, read_html
+
+# tags left open, each repeated to build a page; quadratic behaviour
+# would show as ~64x the time for 8x the input
+UNCLOSED = ('<a x ', '<a href="', "<img alt='", '<!x ', '<div id="a" ', '<a<')
+MAX_GROWTH = 20
+
+# -- the regex extractor as it was before html_events ---------------------
+
+RE_TITLE = re.compile(r'<title>(.*?)</title>', re.I | re.S)
+RE_META = re.compile(r'<meta\s+([^>]+)>', re.I)
+RE_LINK_TAG = re.compile(r'<link\s+([^>]+)>', re.I)
+RE_SCRIPT = re.compile(r'<script\b([^>]*)>', re.I)
+RE_IMG = re.compile(r'<img\s+([^>]+)>', re.I)
+RE_ANCHOR = re.compile(r'<a\s+([^>]*)>(.*?)</a>', re.I | re.S)
+RE_HEADING = re.compile(r'<h([1-6])[^>]*>(.*?)</h\1>', re.I | re.S)
+RE_ATTR = re.compile(
+    r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+RE_TAGS = re.compile(r'<[^>]+>')
+
+
+def regex_attrs(raw: str) -> dict:
+    attrs = {}
+    for m in RE_ATTR.finditer(raw):
+        name = m.group(1).lower()
+        if name not in attrs:
+            attrs[name] = next((g for g in m.groups()[1:] if g is not None), '')
+    return attrs
+
+
+def regex_strip(fragment: str) -> str:
+    return RE_TAGS.sub('', fragment).strip()
+
+
+def parse_page_regex(rel: str, html: str) -> Page:
+    title = RE_TITLE.search(html)
+    return Page(
+        rel=rel,
+        title=title.group(1).strip() if title else None,
+        metas=[regex_attrs(m) for m in RE_META.findall(html)],
+        links=[regex_attrs(m) for m in RE_LINK_TAG.findall(html)],
+        scripts=[regex_attrs(m) for m in RE_SCRIPT.findall(html)],
+        imgs=[regex_attrs(m) for m in RE_IMG.findall(html)],
+        anchors=[(regex_attrs(a), regex_strip(t))
+                 for a, t in RE_ANCHOR.findall(html)],
+        headings=[(int(level), regex_strip(t)[:60])
+                  for level, t in RE_HEADING.findall(html)],
+    )
+
+
+# -- correctness -----------------------------------------------------------
+
+CASES: List[Tuple[str, str, Callable[[Page], object], object]] = [
+    ("'>' inside a quoted attribute",
+     '<img alt="3 > 2" src="a.webp">', lambda p: p.imgs[0].get('src'), 'a.webp'),
+    ('single-quoted link attributes',
+     "<link rel='canonical' href='/x.html'>", lambda p: p.link_href('canonical'),
+     '/x.html'),
+    ('anchor inside an HTML comment',
+     '<!-- <a href="old.html">old</a> --><a href="new.html">new</a>',
+     lambda p: [a.get('href') for a, _ in p.anchors], ['new.html']),
+    ('markup inside a script string',
+     '<script>var s = \'<a href="x">x</a>\';</script>',
+     lambda p: len(p.anchors), 0),
+    ('<a> without attributes',
+     '<a>here</a>', lambda p: [t for _, t in p.anchors], ['here']),
+    ('entities in title and attributes',
+     '<title>R&amp;D</title><a href="?a=1&amp;b=2">x</a>',
+     lambda p: (p.title, p.anchors[0][0]['href']), ('R&D', '?a=1&b=2')),
+    ('heading text across a comment',
+     '<h2>Ad<!-- x -->mission</h2>', lambda p: p.headings, [(2, 'Admission')]),
+    ('uppercase tags',
+     '<A HREF="u.html">U</A>', lambda p: [a.get('href') for a, _ in p.anchors],
+     ['u.html']),
+]
+
+
+def correctness() -> bool:
+    ok = True
+    print(f"{'case':<36} {'regex':<8} {'tokenizer':<9}")
+    for name, html, probe, want in CASES:
+        row = []
+        for parse in (parse_page_regex, parse_page):
+            try:
+                got = probe(parse('case.html', html))
+            except (IndexError, KeyError, TypeError):
+                got = None
+            row.append('ok' if got == want else 'WRONG')
+        ok &= row[1] == 'ok'
+        print(f"{name:<36} {row[0]:<8} {row[1]:<9}")
+    return ok
+
+
+def agreement() -> None:
+    # ids were never extracted by the regexes
+    fields = ('title', 'metas', 'links', 'scripts', 'imgs', 'anchors', 'headings')
+    differ = []
+    rels = iter_html_files()
+    for rel in rels:
+        html = read_html(rel)
+        old, new = parse_page_regex(rel, html), parse_page(rel, html)
+        bad = [f for f in fields if getattr(old, f) != getattr(new, f)]
+        if bad:
+            differ.append((rel, bad))
+    print(f"\nReal pages: {len(rels) - len(differ)}/{len(rels)} identical records")
+    for rel, bad in differ:
+        print(f"  {rel}: {', '.join(bad)} differ")
+
+
+# -- throughput ------------------------------------------------------------
+
+def timed(parse, rel: str, html: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        parse(rel, html)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def throughput(size_kb: int, pages: int) -> None:
+    bodies = [read_html(rel) for rel in iter_html_files()
+              if rel.startswith(('pages/', 'news/'))]
+    big = ''.join(bodies)
+    big = (big * (size_kb * 1024 // len(big.encode('utf-8')) + 1))
+    mb = len(big.encode('utf-8')) / 2**20
+    print(f"\nLarge page: {mb:.1f} MB, best of 3, x{pages} pages")
+    for label, parse in (('regex', parse_page_regex), ('tokenizer', parse_page)):
+        secs = timed(parse, 'big.html', big, 3)
+        print(f"  {label:<10} {secs * 1000:8.1f} ms/page  {mb / secs:6.1f} MB/s"
+              f"  {pages * secs:6.2f} s for {pages} pages")
+
+    print("\nPathological page (unclosed <a> and <h2>, growing size):")
+    for count in (500, 1000, 2000):
+        html = '<p>' + '<a href="x.html">text <h2>title ' * count + '</p>'
+        kb = len(html) / 1024
+        row = [f"  {count:>5} tags ({kb:5.0f} KB)"]
+        for label, parse in (('regex', parse_page_regex), ('tokenizer', parse_page)):
+            row.append(f"{label} {timed(parse, 'bad.html', html, 1) * 1000:8.1f} ms")
+        print('  '.join(row))
+
+
+def scaling() -> bool:
+    print(f"\nUnclosed tags, 8x the input (linear ~8x, fails above {MAX_GROWTH}x):")
+    ok = True
+    for unit in UNCLOSED:
+        small, large = (timed(parse_page, 'bad.html', unit * n, 3) for n in (4000, 32000))
+        growth = large / small
+        ok &= growth <= MAX_GROWTH
+        print(f"  {unit!r:<16} {small * 1000:7.1f} ms -> {large * 1000:7.1f} ms "
+              f"({growth:4.1f}x){'' if growth <= MAX_GROWTH else '  NOT LINEAR'}")
+    return ok
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--size-kb', type=int, default=1024,
+                    help='size of the synthetic large page (default 1024)')
+    ap.add_argument('--pages', type=int, default=20,
+                    help='pages to extrapolate total time for (default 20)')
+    args = ap.parse_args()
+    ok = correctness()
+    agreement()
+    throughput(args.size_kb, args.pages)
+    ok &= scaling()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
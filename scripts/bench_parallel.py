@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark run_all's --jobs scaling on a generated corpus.
+- Builds N news pages (cloned from the real news/ and pages/ HTML, with
+  per-page text so no two files are identical) in a temp directory
+- Times parse + all checks via site_corpus.analyze_files for each job count
+- Verifies every job count yields the same findings as the serial run
+
+Usage: python3 scripts/bench_parallel.py [--pages 5000 20000] [--jobs 1 2 4]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from run_all import CHECKS
+from site_corpus import analyze_files, iter_html_files, read_html
+
+
+def build_corpus(dest: Path, count: int) -> None:
+    templates = [read_html(rel) for rel in iter_html_files()
+                 if rel.startswith(('news/', 'pages/'))]
+    (dest / 'news').mkdir(parents=True)
+    for i in range(count):
+        html = templates[i % len(templates)].replace(
+            '</h1>', f' #{i}</h1>', 1)
+        (dest / 'news' / f'bench-{i:06d}.html').write_text(
+            html, encoding='utf-8')
+
+
+def run(root: Path, jobs: int) -> tuple[float, list]:
+    t = time.perf_counter()
+    findings = [found for _, _, found, _ in
+                analyze_files(iter_html_files(root), CHECKS, root, jobs)]
+    return time.perf_counter() - t, findings
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--pages', type=int, nargs='+', default=[5000, 20000])
+    ap.add_argument('--jobs', type=int, nargs='+',
+                    default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = ap.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    ok = True
+    for count in args.pages:
+        with tempfile.TemporaryDirectory(prefix='shu-bench-') as tmp:
+            root = Path(tmp)
+            build_corpus(root, count)
+            base = None
+            for jobs in args.jobs:
+                elapsed, findings = run(root, jobs)
+                if base is None:
+                    base = (elapsed, findings)
+                same = findings == base[1]
+                ok &= same
+                print(f"  pages={count:<6} jobs={jobs:<3} "
+                      f"{elapsed:7.2f} s  {count / elapsed:8.0f} pages/s  "
+                      f"x{base[0] / elapsed:4.2f}  "
+                      f"{'identical' if same else 'DIFFERENT'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
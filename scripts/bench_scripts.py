@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scripts/ toolchain end to end on a synthetic large site.
+- Generates one site with synth_site.py (sizes and densities are the
+  --news/--pages/--links/--imgs/--headings options) and runs each script
+  in BENCHMARKS against a fresh copy of it, --repeat times
+- Records wall and CPU time (best run) and peak RSS of the script's
+  process; one extra run under cProfile splits the time into phases: the
+  scripts/ functions the script's main() (or module body) calls directly
+- Saves the results as JSON (default .cache/bench/<commit>.json);
+  --compare OLD.json flags every benchmark whose wall time or peak RSS
+  grew by more than --threshold (and more than a small absolute floor,
+  so sub-noise changes never fail) and exits non-zero
+
+Usage: python3 scripts/bench_scripts.py [--news 5000] [--repeat 3]
+       [--only sitemaps run_all_cold] [--compare .cache/bench/abc1234.json]
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import datetime as _dt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from site_corpus import ROOT
+from synth_site import add_spec_args, generate_site, spec_from_args
+
+RESULTS_DIR = ROOT / '.cache' / 'bench'
+# regressions smaller than these are treated as noise
+MIN_WALL_DELTA = 0.05  # seconds
+MIN_RSS_DELTA = 4.0    # MB
+
+
+class Bench(NamedTuple):
+    name: str
+    argv: Tuple[str, ...]          # script under scripts/ plus arguments
+    warmup: Tuple[Tuple[str, ...], ...] = ()  # untimed runs first (fill caches)
+
+
+BENCHMARKS = [
+    Bench('news_stubs', ('generate_news_stubs.py',)),
+    Bench('news_shards', ('generate_news_shards.py',)),
+    Bench('sitemaps', ('generate_sitemaps.py',)),
+    Bench('validate_news', ('validate_news.py',)),
+    Bench('validate_seo', ('validate_seo.py',)),
+    Bench('internal_links', ('check_internal_links.py',)),
+    Bench('run_all_cold', ('run_all.py', '--no-cache')),
+    Bench('run_all_warm', ('run_all.py',), warmup=(('run_all.py',),)),
+    Bench('link_graph', ('link_graph.py', '--orphans', '--broken', '--anchors'),
+          warmup=(('run_all.py',), ('link_graph.py',))),
+]
+
+# Runs a script under cProfile and writes {phase: seconds} to argv[2]
+PHASE_PROBE = r'''
+import cProfile, json, os, pstats, runpy, sys
+script, out = sys.argv[1], sys.argv[2]
+sys.argv = [script] + sys.argv[3:]
+sys.path.insert(0, os.path.dirname(script))
+prof = cProfile.Profile()
+try:
+    prof.runcall(runpy.run_path, script, run_name='__main__')
+except SystemExit:
+    pass
+stats = pstats.Stats(prof).stats
+own = [k for k in stats if k[0] == script]
+entry = next((k for k in own if k[2] == 'main'), None) or \
+    next((k for k in own if k[2] == '<module>'), None)
+phases = {}
+if entry is not None:
+    here = os.path.dirname(script)
+    for key, (cc, nc, tt, ct, callers) in stats.items():
+        if entry in callers and os.path.dirname(key[0]) == here:
+            name = os.path.basename(key[0])[:-3] + '.' + key[2]
+            phases[name] = phases.get(name, 0.0) + callers[entry][3]
+    phases['(total)'] = stats[entry][3]
+with open(out, 'w') as f:
+    json.dump(phases, f)
+'''
+
+
+def commit_id() -> str:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(['git', '-C', str(ROOT), *args], check=True,
+                                  capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+    sha = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    return sha + ('-dirty' if git('status', '--porcelain', '--', 'scripts') else '')
+
+
+def run_script(site: Path, argv: Sequence[str]) -> Dict[str, float]:
+    """One run in its own process: wall/CPU seconds, peak RSS, exit code."""
+    cmd = [sys.executable, str(site / 'scripts' / argv[0]), *argv[1:]]
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=site, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        'wall_s': wall,
+        'cpu_s': usage.ru_utime + usage.ru_stime,
+        'max_rss_mb': usage.ru_maxrss / 1024,  # KiB on Linux
+        'exit': proc.returncode,
+    }
+
+
+def profile_phases(site: Path, argv: Sequence[str]) -> Dict[str, float]:
+    out = site / '.bench-phases.json'
+    subprocess.run([sys.executable, '-c', PHASE_PROBE,
+                    str(site / 'scripts' / argv[0]), str(out), *argv[1:]],
+                   cwd=site, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return json.loads(out.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def fresh_copy(master: Path, dest: Path, warmup: Sequence[Sequence[str]]) -> Path:
+    if dest.exists():
+        shutil.rmtree(dest)
+    shutil.copytree(master, dest, symlinks=True)
+    for argv in warmup:
+        run_script(dest, argv)
+    return dest
+
+
+def run_bench(bench: Bench, master: Path, work: Path, repeat: int,
+              phases: bool) -> Dict[str, object]:
+    runs = [run_script(fresh_copy(master, work, bench.warmup), bench.argv)
+            for _ in range(repeat)]
+    best = min(runs, key=lambda r: r['wall_s'])
+    result: Dict[str, object] = {
+        'argv': list(bench.argv),
+        'wall_s': round(best['wall_s'], 4),
+        'cpu_s': round(best['cpu_s'], 4),
+        'max_rss_mb': round(max(r['max_rss_mb'] for r in runs), 1),
+        'wall_runs': [round(r['wall_s'], 4) for r in runs],
+        'exit': best['exit'],
+    }
+    if phases:
+        result['phases'] = {
+            k: round(v, 4) for k, v in sorted(
+                profile_phases(fresh_copy(master, work, bench.warmup), bench.argv)
+                .items(), key=lambda kv: -kv[1])}
+    return result
+
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    """Regression messages for benchmarks present in both result sets."""
+    problems = []
+    for name, cur in new['benchmarks'].items():
+        base = old.get('benchmarks', {}).get(name)
+        if base is None:
+            continue
+        for key, floor, unit in (('wall_s', MIN_WALL_DELTA, 's'),
+                                 ('max_rss_mb', MIN_RSS_DELTA, 'MB')):
+            a, b = base[key], cur[key]
+            if b > a * (1 + threshold) and b - a > floor:
+                problems.append(f"{name}: {key} {a:.3f} -> {b:.3f} {unit} "
+                                f"(+{(b / a - 1) * 100:.0f}%)")
+    return problems
+
+
+def print_table(results: dict, old: Optional[dict]) -> None:
+    print(f"{'benchmark':<16} {'wall s':>8} {'cpu s':>8} {'rss MB':>8}"
+          + (f" {'vs base':>8}" if old else ''))
+    for name, r in results['benchmarks'].items():
+        line = f"{name:<16} {r['wall_s']:8.3f} {r['cpu_s']:8.3f} {r['max_rss_mb']:8.1f}"
+        base = (old or {}).get('benchmarks', {}).get(name)
+        if base:
+            line += f" {(r['wall_s'] / base['wall_s'] - 1) * 100:+7.0f}%"
+        if r['exit']:
+            line += f"  (exit {r['exit']})"
+        print(line)
+        phases = [kv for kv in r.get('phases', {}).items() if kv[0] != '(total)']
+        for phase, secs in phases[:5]:
+            print(f"  {phase:<38} {secs:8.3f} s (profiled)")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_spec_args(ap)
+    ap.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark')
+    ap.add_argument('--only', nargs='+', metavar='NAME',
+                    choices=[b.name for b in BENCHMARKS], help='benchmarks to run')
+    ap.add_argument('--no-phases', action='store_true', help='skip the profiled run')
+    ap.add_argument('--out', type=Path, help='results file (default .cache/bench/<commit>.json)')
+    ap.add_argument('--compare', type=Path, metavar='OLD', help='earlier results file')
+    ap.add_argument('--threshold', type=float, default=0.15,
+                    help='allowed relative growth before a regression (default 0.15)')
+    args = ap.parse_args(argv)
+
+    old = json.loads(args.compare.read_text()) if args.compare else None
+    spec = spec_from_args(args)
+    benches = [b for b in BENCHMARKS if not args.only or b.name in args.only]
+    results = {
+        'commit': commit_id(),
+        'created': _dt.datetime.now(_dt.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'site': spec.as_dict(),
+        'repeat': args.repeat,
+        'benchmarks': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='shu-bench-') as tmp:
+        master = Path(tmp) / 'site'
+        t = time.perf_counter()
+        counts = generate_site(master, spec)
+        print(f"Synthetic site: {', '.join(f'{k}={v}' for k, v in counts.items())} "
+              f"({time.perf_counter() - t:.1f} s)")
+        results['site'].update(counts)
+        for bench in benches:
+            results['benchmarks'][bench.name] = run_bench(
+                bench, master, Path(tmp) / 'run', args.repeat, not args.no_phases)
+
+    out = args.out or RESULTS_DIR / f"{results['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+    print_table(results, old)
+    print(f"Results: {out}")
+    if old is None:
+        return 0
+    if old.get('site') != results['site']:
+        print('Note: the compared results used a different synthetic site.')
+    problems = compare(old, results, args.threshold)
+    if problems:
+        print(f"Regressions (> {args.threshold:.0%}):")
+        for p in problems:
+            print(' -', p)
+        return 1
+    print(f"No regressions (> {args.threshold:.0%}) against {args.compare}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Build the site and the deploy bundle as a dependency graph.
+- Each node runs one maintenance script; it only runs when the files it
+  reads (its inputs) changed since its last successful run, or --force
+- Nodes whose dependencies are done run in parallel (--jobs)
+- A failing node stops the build (dependents are not started)
+- The bundle step mirrors the tree into deploy_bundle/site/ with hardlinks
+  (reflinks or copies where hardlinks are impossible), touching only files
+  that changed and deleting files that are gone
+- --minify makes the bundle step minify HTML/CSS/JS, write .gz/.br
+  siblings of text assets and print a before/after size report
+- --fingerprint makes it add content-hashed copies of css/js and point
+  HTML, sw.js and manifest.json at them (asset map in deploy_bundle/)
+- --critical-css makes it inline each page's above-the-fold CSS and load
+  a purged css/style.purged.css async (see critical_css.py); the tree's
+  pages keep their plain <link rel="stylesheet">
+- With any of these flags the bundle's sw.js gets its precache list
+  rebuilt from the bundle's own pages and files, so it names what the
+  bundle serves and revisions match the served bytes
+State lives in .cache/build-state.json.
+"""
+from __future__ import annotations
+import argparse
+import errno
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from corpus_cache import CorpusCache
+from critical_css import PURGED_CSS, SOURCE_CSS, purged_href
+from critical_css import build as critical_build
+from fingerprint import (ASSET_MAP, TEXT_REFERRERS, hashed_name, is_asset,
+                         page_refs, rewrite_html, rewrite_text, save_asset_map)
+from fingerprint import resolve as fp_resolve
+from generate_sw_manifest import RE_BLOCK, build_entries, render_block
+from minify import COMPRESS_EXTS, brotli, compress, minify_bytes
+from minify import report as size_report
+from site_corpus import scan_tree
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE = ROOT / '.cache' / 'build-state.json'
+BUNDLE = ROOT / 'deploy_bundle' / 'site'
+BUNDLE_EXCLUDE = ('deploy_bundle/', '.git/', '.cache/', '.github/')
+BUNDLE_STATE = ROOT / '.cache' / 'bundle-outputs.json'
+SIZE_REPORT = ROOT / 'deploy_bundle' / 'size-report.json'
+SW_REL = 'sw.js'
+
+MANIFEST = 'js/news-manifest.json'
+
+
+@dataclass
+class Node:
+    name: str
+    command: List[str]
+    inputs: List[str]          # fnmatch patterns over repo-relative paths
+    deps: List[str] = field(default_factory=list)
+
+
+def script(name: str, *args: str) -> List[str]:
+    return [sys.executable, str(ROOT / 'scripts' / name), *args]
+
+
+NODES = [
+    # news/*.html: a deleted or hand-edited stub must re-trigger it
+    Node('stubs', script('generate_news_stubs.py'),
+         [MANIFEST, 'news/*.html', 'scripts/news-stubs.json',
+          'scripts/generate_news_stubs.py', 'scripts/news_store.py']),
+    Node('sitemaps', script('generate_sitemaps.py'),
+         [MANIFEST, 'index.html', 'pages/*.html', 'scripts/sitemap-lastmod.json',
+          'scripts/generate_sitemaps.py', 'scripts/news_store.py'],
+         deps=['stubs']),
+    Node('news_shards', script('generate_news_shards.py'),
+         [MANIFEST, 'scripts/generate_news_shards.py', 'scripts/news_store.py']),
+    Node('validate_news', script('validate_news.py'),
+         [MANIFEST, 'news/*', 'images/*', 'scripts/validate_news.py',
+          'scripts/generate_news_shards.py'],
+         deps=['stubs']),
+    Node('images', script('optimize_images.py'),
+         ['images/*', 'index.html', 'pages/*.html', 'news/*.html',
+          'scripts/image-variants.json', 'scripts/optimize_images.py'],
+         deps=['stubs']),
+    Node('sw_manifest', script('generate_sw_manifest.py'),
+         ['index.html', 'offline.html', 'pages/*.html', 'news/*.html',
+          'css/*', 'js/*', 'images/*', 'sw.js',
+          'scripts/generate_sw_manifest.py'],
+         deps=['images']),
+    Node('html_checks', script('run_all.py'),
+         ['*.html', 'images/*', 'css/*', 'js/*', 'scripts/*.py'],
+         deps=['images']),
+    Node('page_budget', script('page_budget.py'),
+         ['*.html', 'images/*', 'css/*', 'js/*', 'scripts/page-budgets.json',
+          'scripts/page_budget.py'],
+         deps=['html_checks']),
+    Node('sitemap_check', script('check_sitemap_urls.py', '--offline'),
+         ['sitemap*.xml', 'news-sitemap*.xml', '*.html',
+          'scripts/check_sitemap_urls.py'],
+         deps=['sitemaps']),
+]
+
+
+def fingerprint(node: Node, files: Set[str]) -> str:
+    """Hash of the node's command plus (path, size, mtime) of its inputs."""
+    h = hashlib.sha1(json.dumps(node.command[1:]).encode('utf-8'))
+    for rel in sorted(files):
+        if any(fnmatch.fnmatchcase(rel, pat) for pat in node.inputs):
+            st = os.stat(ROOT / rel)
+            h.update(f'{rel}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_state() -> Dict[str, str]:
+    try:
+        return json.loads(STATE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: Dict[str, str]) -> None:
+    STATE.parent.mkdir(parents=True, exist_ok=True)
+    STATE.write_text(json.dumps(state, indent=2, sort_keys=True) + '\n',
+                     encoding='utf-8')
+
+
+def run_node(node: Node) -> Tuple[int, str, float]:
+    t = time.perf_counter()
+    proc = subprocess.run(node.command, cwd=ROOT, capture_output=True,
+                          text=True)
+    return proc.returncode, proc.stdout + proc.stderr, time.perf_counter() - t
+
+
+def run_graph(nodes: Sequence[Node], jobs: int, force: bool) -> bool:
+    state = {} if force else load_state()
+    by_name = {n.name: n for n in nodes}
+    pending = dict(by_name)
+    done: Set[str] = set()
+    failed = False
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while pending or running:
+            if not failed:
+                for name, node in list(pending.items()):
+                    if not all(d in done for d in node.deps):
+                        continue
+                    del pending[name]
+                    # inputs are fingerprinted only once deps have finished,
+                    # so files a dependency just wrote count as changes
+                    fp = fingerprint(node, scan_tree(ROOT)[1])
+                    if state.get(name) == fp:
+                        print(f"[{name}] up to date, skipped")
+                        done.add(name)
+                        continue
+                    running[pool.submit(run_node, node)] = (node, fp)
+            if not running:
+                if failed or not pending:
+                    break
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                node, fp = running.pop(fut)
+                code, output, elapsed = fut.result()
+                print(f"[{node.name}] {'ok' if code == 0 else 'FAILED'} "
+                      f"in {elapsed:.2f}s")
+                for line in output.rstrip().splitlines():
+                    print(f"  {line}")
+                if code == 0:
+                    # record the inputs as they are *after* the run, so a node
+                    # that rewrites its own inputs is not stale next time
+                    state[node.name] = fingerprint(node, scan_tree(ROOT)[1])
+                    done.add(node.name)
+                else:
+                    failed = True
+                    state.pop(node.name, None)
+    save_state(state)
+    return not failed
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    try:
+        import fcntl
+        FICLONE = 0x40049409  # Linux; btrfs/xfs/... only
+        with open(src, 'rb') as s, open(dest, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        shutil.copystat(src, dest)
+        return True
+    except (ImportError, OSError):
+        dest.unlink(missing_ok=True)
+        return False
+
+
+def place(src: Path, dest: Path) -> str:
+    """Put src at dest by hardlink, else reflink, else copy."""
+    dest.unlink(missing_ok=True)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dest)
+        return 'link'
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK,
+                           errno.ENOTSUP):
+            raise
+    if _reflink(src, dest):
+        return 'reflink'
+    shutil.copy2(src, dest)
+    return 'copy'
+
+
+def same_file(src: os.stat_result, dest: os.stat_result) -> bool:
+    if (src.st_dev, src.st_ino) == (dest.st_dev, dest.st_ino):
+        return True
+    return (src.st_size == dest.st_size
+            and src.st_mtime_ns == dest.st_mtime_ns)
+
+
+def load_bundle_state() -> Dict[str, dict]:
+    try:
+        return json.loads(BUNDLE_STATE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_file(dest: Path, data: bytes) -> None:
+    """Write via rename: dest may be a hardlink into the source tree."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f'.{dest.name}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, dest)
+
+
+def stat_stamp(path: Path) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def emit(src: Path, record: Optional[dict], key: str,
+         produce: Callable[[bytes], Dict[str, bytes]], packed: bool) -> dict:
+    """Write produce(source bytes) -> {bundle path: bytes} (plus .gz/.br
+    siblings if packed), unless record shows those outputs were already
+    built from this exact source with the same key."""
+    stamp = stat_stamp(src)
+    if record is not None and record['src'] == stamp and record['key'] == key:
+        try:
+            if all(stat_stamp(BUNDLE / o) == s for o, s in record['out'].items()):
+                return dict(record, unchanged=True)
+        except FileNotFoundError:
+            pass
+    data = src.read_bytes()
+    outputs = produce(data)
+    sizes = [len(data)]
+    out: Dict[str, List[int]] = {}
+    for rel, body in outputs.items():
+        siblings = compress(body) if packed and rel.endswith(COMPRESS_EXTS) else {}
+        write_file(BUNDLE / rel, body)
+        out[rel] = stat_stamp(BUNDLE / rel)
+        for ext in ('.gz', '.br'):
+            if ext in siblings:
+                write_file(BUNDLE / (rel + ext), siblings[ext])
+                out[rel + ext] = stat_stamp(BUNDLE / (rel + ext))
+            else:
+                (BUNDLE / (rel + ext)).unlink(missing_ok=True)
+        if len(sizes) == 1:
+            sizes += [len(body), len(siblings.get('.gz', body)),
+                      len(siblings.get('.br', body))]
+    return {'src': stamp, 'key': key, 'out': out, 'sizes': sizes,
+            'unchanged': False}
+
+
+def fingerprint_assets(wanted: Set[str], minify: bool,
+                       generated: Dict[str, bytes]) -> Dict[str, str]:
+    """Asset path -> content-hashed path, hashing the bytes to be served
+    (generated: bundle-only files and their contents)."""
+    asset_map = {}
+    for rel in sorted(r for r in wanted | set(generated) if is_asset(r)):
+        data = generated[rel] if rel in generated else (ROOT / rel).read_bytes()
+        if minify:
+            data = minify_bytes(rel, data)
+        asset_map[rel] = hashed_name(rel, data)
+    return asset_map
+
+
+def prune_bundle(keep: Set[str], stats: Dict[str, int]) -> None:
+    """Delete bundle files not in keep, and directories left empty."""
+    if not BUNDLE.exists():
+        return
+    for base, dirs, names in os.walk(BUNDLE, topdown=False):
+        for fn in names:
+            path = Path(base) / fn
+            if path.relative_to(BUNDLE).as_posix() not in keep:
+                path.unlink()
+                stats['removed'] += 1
+        if base != str(BUNDLE) and not os.listdir(base):
+            os.rmdir(base)
+
+
+def sync_bundle(minify: bool = False, fingerprint: bool = False,
+                critical: bool = False) -> Dict[str, int]:
+    """Mirror the tree into deploy_bundle/site/, only touching changes.
+    minify: HTML/CSS/JS are minified and text assets get .gz/.br siblings
+    (see minify.py). fingerprint: css/js also get content-hashed names
+    and references to them are rewritten (see fingerprint.py). critical:
+    pages get their critical CSS inlined and the purged stylesheet is
+    added (see critical_css.py). Files no mode touches are linked as
+    usual."""
+    stats = {'link': 0, 'reflink': 0, 'copy': 0, 'written': 0,
+             'unchanged': 0, 'removed': 0}
+    _, files = scan_tree(ROOT)
+    wanted = {rel for rel in files
+              if not rel.startswith(BUNDLE_EXCLUDE) and '__pycache__/' not in rel}
+    inlined: Dict[str, str] = {}
+    generated: Dict[str, bytes] = {}  # bundle-only, written with SOURCE_CSS
+    if critical and SOURCE_CSS in wanted:
+        purged, inlined, _ = critical_build(ROOT)
+        generated[PURGED_CSS] = purged.encode('utf-8')
+    asset_map: Dict[str, str] = {}
+    refs: Dict[str, Set[str]] = {}
+    if fingerprint:
+        asset_map = fingerprint_assets(wanted, minify, generated)
+        # run_all (html_checks) has just refreshed the corpus cache, so
+        # this only unpickles the link/script lists of cached pages
+        pages = [p for p in CorpusCache().load_pages() if p.rel in wanted]
+        refs = page_refs(pages, set(asset_map))
+        for rel in inlined:
+            # the inlined page links the purged sheet instead
+            refs[rel] = refs.get(rel, set()) | {
+                purged_href(v) for v in refs.get(rel, ())
+                if fp_resolve(rel, v) == SOURCE_CSS}
+    map_key = json.dumps(asset_map, sort_keys=True)
+    old_records = load_bundle_state()
+    records: Dict[str, dict] = {}
+    keep = set(wanted)
+
+    def finish(data: bytes, rel: str) -> bytes:
+        return minify_bytes(rel, data) if minify else data
+
+    def page(data: bytes, rel: str) -> bytes:
+        text = inlined[rel] if rel in inlined else data.decode('utf-8')
+        if rel in refs:
+            text = rewrite_html(text, rel, refs[rel], asset_map)
+        return finish(text.encode('utf-8'), rel)
+
+    def sync(rel: str, key: str, produce) -> None:
+        src, dest = ROOT / rel, BUNDLE / rel
+        if produce is not None:
+            rec = records[rel] = emit(src, old_records.get(rel), key, produce,
+                                      minify)
+            stats['unchanged' if rec.pop('unchanged') else 'written'] += 1
+            keep.update(rec['out'])
+            return
+        try:
+            if same_file(os.stat(src), os.stat(dest)):
+                stats['unchanged'] += 1
+                return
+        except FileNotFoundError:
+            pass
+        stats[place(src, dest)] += 1
+
+    for rel in sorted(wanted - {SW_REL}):
+        produce = None
+        key = str(minify)
+        if rel in asset_map:
+            hashed = asset_map[rel]
+            key += ':' + hashed
+            produce = (lambda d, rel=rel, hashed=hashed:
+                       dict.fromkeys((rel, hashed), finish(d, rel)))
+        elif rel in refs or rel in inlined:
+            key += ':' + ','.join(sorted(asset_map[r] for r in asset_map
+                                         if any(fp_resolve(rel, v) == r
+                                                for v in refs.get(rel, ()))))
+            if rel in inlined:
+                key += ':' + hashlib.sha1(inlined[rel].encode('utf-8')).hexdigest()
+            produce = lambda d, rel=rel: {rel: page(d, rel)}
+        elif fingerprint and rel in TEXT_REFERRERS:
+            key += ':' + map_key
+            produce = (lambda d, rel=rel: {rel: finish(rewrite_text(
+                d.decode('utf-8'), asset_map).encode('utf-8'), rel)})
+        elif minify and rel.endswith(COMPRESS_EXTS):
+            produce = lambda d, rel=rel: {rel: finish(d, rel)}
+        if rel == SOURCE_CSS and generated:
+            # the purged sheet is derived from style.css: same record
+            extra: Dict[str, bytes] = {}
+            for gen, data in generated.items():
+                body = finish(data, gen)
+                extra.update(dict.fromkeys({gen, asset_map.get(gen, gen)}, body))
+                key += ':' + hashlib.sha1(data).hexdigest()
+            base = produce or (lambda d, rel=rel: {rel: d})
+            produce = lambda d, base=base, extra=extra: {**base(d), **extra}
+        sync(rel, key, produce)
+
+    # sw.js goes last, once stale files are gone: its precache list is
+    # read from the bundle's pages and its revisions hash the bundle's files
+    prune_bundle(keep | {SW_REL + '.gz', SW_REL + '.br'}, stats)
+    if SW_REL in wanted:
+        produce = None
+        key = str(minify)
+        if minify or fingerprint or critical:
+            block = render_block(build_entries(BUNDLE))
+            key += ':' + block
+            produce = (lambda d: {SW_REL: finish(RE_BLOCK.sub(
+                lambda m: block,
+                rewrite_text(d.decode('utf-8'), asset_map)).encode('utf-8'), SW_REL)})
+        else:
+            for ext in ('.gz', '.br'):
+                (BUNDLE / (SW_REL + ext)).unlink(missing_ok=True)
+        sync(SW_REL, key, produce)
+    BUNDLE_STATE.parent.mkdir(parents=True, exist_ok=True)
+    BUNDLE_STATE.write_text(json.dumps(records, indent=1, sort_keys=True),
+                            encoding='utf-8')
+    if fingerprint:
+        save_asset_map(asset_map)
+        print(f'[bundle] {len(asset_map)} fingerprinted assets, '
+              f'{len(refs)} pages rewritten; map in {ASSET_MAP.relative_to(ROOT)}')
+    else:
+        ASSET_MAP.unlink(missing_ok=True)
+    if minify:
+        rows = [(rel, *rec['sizes']) for rel, rec in records.items()
+                if rel.endswith(COMPRESS_EXTS)]
+        print(size_report(rows))
+        if brotli is None:
+            print('(brotli module not installed: no .br files)')
+        SIZE_REPORT.write_text(json.dumps(
+            {rel: dict(zip(('before', 'minified', 'gzip', 'brotli'), sizes))
+             for rel, *sizes in rows}, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8')
+    else:
+        SIZE_REPORT.unlink(missing_ok=True)
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--force', action='store_true',
+                    help='run every node even if its inputs are unchanged')
+    ap.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                    metavar='N', help='nodes to run at once')
+    ap.add_argument('--no-bundle', action='store_true',
+                    help='skip updating deploy_bundle/site/')
+    ap.add_argument('--minify', action='store_true',
+                    help='minify HTML/CSS/JS in the bundle and add .gz/.br '
+                         'copies (sources are left as they are)')
+    ap.add_argument('--fingerprint', action='store_true',
+                    help='give css/js in the bundle content-hashed names and '
+                         'rewrite references to them')
+    ap.add_argument('--critical-css', action='store_true',
+                    help='inline critical CSS into bundle pages and load the '
+                         'purged stylesheet async (sources are left as they are)')
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if not run_graph(NODES, max(1, args.jobs), args.force):
+        print('Build failed.')
+        return 1
+    if not args.no_bundle:
+        stats = sync_bundle(args.minify, args.fingerprint, args.critical_css)
+        print('[bundle] ' + ', '.join(f'{k} {v}' for k, v in stats.items()))
+    print(f'Build finished in {time.perf_counter() - t0:.2f}s.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
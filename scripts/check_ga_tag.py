@@ -4,29 +4,45 @@ Ensure GA4 gtag (G-QHYFHLDM6D) is present on index.html and
 all pages/*.html & news/*.html.
 """
 from __future__ import annotations
-from pathlib import Path
+import sys
 
-ROOT = Path(__file__).resolve().parents[1]
-FILES = [
-    ROOT / 'index.html',
-    *(ROOT / 'pages').glob('*.html'),
-    *(ROOT / 'news').glob('*.html'),
-]
+import instrument
+from site_corpus import Page, is_top_level_page, load_pages, run_check
+
+CHECK_NAME = 'ga_tag'
+VERSION = 2
+FATAL = True
 
 needle = 'https://www.googletagmanager.com/gtag/js?id=G-QHYFHLDM6D'
 
-missing = []
-for f in FILES:
-    if not f.exists():
-        continue
-    t = f.read_text(encoding='utf-8', errors='ignore')
-    if needle not in t:
-        missing.append(f.relative_to(ROOT))
-
-if missing:
-    print('GA tag check failed, missing on:')
-    for m in missing:
-        print(' -', m)
-    raise SystemExit(1)
-else:
+
+def select(rel: str) -> bool:
+    return is_top_level_page(rel)
+
+
+def check_page(page: Page) -> list[str]:
+    # a substring, like the original text search: an extra query
+    # parameter or an inline loader that builds the tag still counts
+    if any(needle in s.get('src', '') for s in page.scripts) or \
+            any(needle in body for body in page.inline_scripts):
+        return []
+    return [page.rel]
+
+
+def report(pages: list[Page], missing: list[str]) -> int:
+    if missing:
+        print('GA tag check failed, missing on:')
+        for m in missing:
+            print(' -', m)
+        return 1
     print('GA tag check OK: all target pages include GA4 tag.')
+    return 0
+
+
+def main() -> int:
+    pages = load_pages()
+    return report(pages, run_check(sys.modules[__name__], pages))
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
@@ -5,58 +5,55 @@ Check all images across HTML files for alt attributes:
 - Report missing or empty alt attributes
 - Flag decorative images that should have alt=""
 """
-import os
-import re
-
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-IMG_PATTERN = re.compile(r'<img\s+([^>]+)>', re.I)
-ALT_PATTERN = re.compile(r'alt=["\']([^"\']*)["\']', re.I)
-
-issues = []
-total_images = 0
-missing_alt = 0
-empty_alt = 0
-
-for base, _, files in os.walk(ROOT):
-    relbase = os.path.relpath(base, ROOT)
-    if relbase.startswith(('deploy_bundle', '.git', 'scripts')):
-        continue
-    
-    for fn in files:
-        if not fn.endswith('.html'):
-            continue
-        
-        path = os.path.join(base, fn)
-        rel = os.path.relpath(path, ROOT)
-        
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            html = f.read()
-        
-        for img_match in IMG_PATTERN.finditer(html):
-            total_images += 1
-            img_tag = img_match.group(0)
-            alt_match = ALT_PATTERN.search(img_tag)
-            
-            # Extract src for context
-            src_match = re.search(r'src=["\']([^"\']+)["\']', img_tag, re.I)
-            src = src_match.group(1) if src_match else 'unknown'
-            
-            if not alt_match:
-                missing_alt += 1
-                issues.append(f"{rel}: missing alt -> {src}")
-            elif not alt_match.group(1).strip():
-                empty_alt += 1
-                # Empty alt is OK for decorative images, just note it
-                issues.append(f"{rel}: empty alt (decorative?) -> {src}")
-
-print(f"Total images scanned: {total_images}")
-print(f"Missing alt: {missing_alt}")
-print(f"Empty alt: {empty_alt}")
-
-if issues:
-    print("\nImage alt issues:")
-    for issue in issues:
-        print(f"  - {issue}")
-else:
-    print("\n✓ All images have alt attributes")
+import sys
+from typing import List
+
+import instrument
+from site_corpus import Page, load_pages, run_check
+
+CHECK_NAME = 'image_alts'
+VERSION = 1
+FATAL = False
+
+
+def select(rel: str) -> bool:
+    return True
+
+
+def check_page(page: Page) -> List[str]:
+    issues: List[str] = []
+    for attrs in page.imgs:
+        src = attrs.get('src') or 'unknown'
+        alt = attrs.get('alt')
+        if alt is None:
+            issues.append(f"{page.rel}: missing alt -> {src}")
+        elif not alt.strip():
+            # Empty alt is OK for decorative images, just note it
+            issues.append(f"{page.rel}: empty alt (decorative?) -> {src}")
+    return issues
+
+
+def report(pages: List[Page], issues: List[str]) -> int:
+    total_images = sum(len(p.imgs) for p in pages if select(p.rel))
+    missing_alt = sum(1 for i in issues if ': missing alt -> ' in i)
+    empty_alt = sum(1 for i in issues if ': empty alt (decorative?) -> ' in i)
+    print(f"Total images scanned: {total_images}")
+    print(f"Missing alt: {missing_alt}")
+    print(f"Empty alt: {empty_alt}")
+
+    if issues:
+        print("\nImage alt issues:")
+        for issue in issues:
+            print(f"  - {issue}")
+    else:
+        print("\n✓ All images have alt attributes")
+    return 0
+
+
+def main() -> int:
+    pages = load_pages()
+    return report(pages, run_check(sys.modules[__name__], pages))
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
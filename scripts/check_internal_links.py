@@ -1,25 +1,22 @@
 #!/usr/bin/env python3
 import os
-import re
 import sys
+from typing import Dict, List, Optional, Sequence, Set
 
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SITE_ORIGIN = "https://shu-edu-tw.github.io"
+import instrument
+from link_graph import fragment_missing, page_edges
+from site_corpus import ROOT as _ROOT, SITE_ORIGIN, Page, load_pages, run_check, scan_tree
 
-RE_LINK = re.compile(r"<a[^>]+href=\"([^\"]+)\"", re.I)
-RE_IMG = re.compile(r"<img[^>]+src=\"([^\"]+)\"", re.I)
+ROOT = str(_ROOT)
 
-problems = []
-scanned = 0
+CHECK_NAME = 'links'
+VERSION = 3
+FATAL = True
 
-# Helpers
-
-def is_external(url: str) -> bool:
-    return (
-        url.startswith('http://') or url.startswith('https://') or
-        url.startswith('mailto:') or url.startswith('tel:')
-    )
+EXISTING: Optional[Set[str]] = None
+ID_INDEX: Dict[str, Set[str]] = {}  # page -> its ids, set by prepare()
 
+# Helpers
 
 def to_local_path(relpath: str, file_dir: str) -> str:
     # Map absolute site URLs to local
@@ -37,48 +34,64 @@ def to_local_path(relpath: str, file_dir: str) -> str:
     return os.path.normpath(os.path.join(file_dir, relpath))
 
 
-for base, _, files in os.walk(ROOT):
-    relbase = os.path.relpath(base, ROOT)
-    if relbase.startswith(('deploy_bundle', '.git', 'scripts')):
-        continue
-    for fn in files:
-        if not fn.endswith('.html'):
-            continue
-        path = os.path.join(base, fn)
-        file_dir = os.path.dirname(path)
-        rel = os.path.relpath(path, ROOT)
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            html = f.read()
-        scanned += 1
-
-        links = RE_LINK.findall(html)
-        imgs = RE_IMG.findall(html)
-
-        for href in links:
-            if is_external(href) or href.startswith('#'):
-                continue
-            if '#' in href:
-                href = href.split('#', 1)[0]
-            local = to_local_path(href, file_dir)
-            if not local:
-                continue
-            if not os.path.exists(local):
-                problems.append(f"{rel}: broken link -> {href}")
-
-        for src in imgs:
-            if is_external(src):
-                continue
-            local = to_local_path(src, file_dir)
-            if not local:
-                continue
-            if not os.path.exists(local):
-                problems.append(f"{rel}: missing image -> {src}")
-
-print(f"Scanned HTML files: {scanned}")
-if problems:
-    print("Broken internals:")
-    for p in problems:
-        print(" -", p)
-    sys.exit(1)
-else:
+def select(rel: str) -> bool:
+    return True
+
+
+def existing_paths() -> Set[str]:
+    """Every file in the tree, from one walk per process; link targets are
+    looked up here instead of one os.path.exists per href."""
+    global EXISTING
+    if EXISTING is None:
+        EXISTING = scan_tree(_ROOT)[1]
+    return EXISTING
+
+
+def prepare(pages: Sequence[Page]) -> None:
+    """Index every page's id/name attributes (cached with the page, so
+    this never re-reads a target file)."""
+    global ID_INDEX
+    ID_INDEX = {page.rel: page.ids for page in pages}
+
+
+def page_deps(page: Page) -> List[str]:
+    """Repo-relative targets whose existence (and, for pages, ids) decide
+    this page's result."""
+    return sorted({edge.target for edge in page_edges(page)} - {page.rel})
+
+
+def check_page(page: Page) -> List[str]:
+    problems: List[str] = []
+    exists = existing_paths()
+    edges = page_edges(page)
+    instrument.count('path_lookups', len(edges))
+    for edge in edges:
+        if edge.target not in exists:
+            if edge.kind == 'link':
+                problems.append(f"{page.rel}: broken link -> {edge.url.split('#', 1)[0]}")
+            else:
+                problems.append(f"{page.rel}: missing image -> {edge.url}")
+        elif fragment_missing(edge, page.ids if edge.target == page.rel
+                              else ID_INDEX.get(edge.target)):
+            problems.append(f"{page.rel}: missing anchor -> {edge.url}")
+    return problems
+
+
+def report(pages: List[Page], problems: List[str]) -> int:
+    print(f"Scanned HTML files: {len(pages)}")
+    if problems:
+        print("Broken internals:")
+        for p in problems:
+            print(" -", p)
+        return 1
     print("All internal links and images OK.")
+    return 0
+
+
+def main() -> int:
+    pages = load_pages()
+    return report(pages, run_check(sys.modules[__name__], pages))
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
@@ -4,30 +4,46 @@ Validate sitemap.xml and news-sitemap.xml URLs:
 - Parse XML sitemaps
 - Check that each <loc> URL returns HTTP 200
 - Report any broken/404 URLs
+
+URLs are checked concurrently over asyncio with keep-alive connections
+reused per host (HEAD first, GET if the server refuses HEAD), retries with
+backoff, and a latency histogram at the end.
+--base-url swaps the site origin for another one (e.g. a local server);
+--serve starts a local http.server on the repo and checks against it, so
+the whole path can be exercised without network access.
+--offline skips HTTP entirely: every <loc> is mapped to a file in the
+working tree (check_internal_links.to_local_path) and looked up in one
+prebuilt set of existing paths.
 """
+from __future__ import annotations
+import argparse
+import asyncio
+import functools
+import http.server
 import os
+import ssl
 import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from check_internal_links import to_local_path
+from site_corpus import scan_tree
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SITEMAP = os.path.join(ROOT, 'sitemap.xml')
 NEWS_SITEMAP = os.path.join(ROOT, 'news-sitemap.xml')
+SITEMAP_INDEX = os.path.join(ROOT, 'sitemap_index.xml')
+SITE_ORIGIN = 'https://shu-edu-tw.github.io'
 
-
-def check_url(url: str) -> tuple[int, str]:
-    """Returns (status_code, message)"""
-    try:
-        req = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urlopen(req, timeout=10) as resp:
-            return resp.status, 'OK'
-    except HTTPError as e:
-        return e.code, str(e)
-    except URLError as e:
-        return 0, str(e)
-    except Exception as e:
-        return -1, str(e)
+USER_AGENT = 'Mozilla/5.0'
+TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HEAD_REFUSED = {403, 405, 501}
+HISTOGRAM_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
 
 
 def parse_sitemap(path: str) -> list[str]:
@@ -38,28 +54,299 @@ def parse_sitemap(path: str) -> list[str]:
     return [loc.text for loc in root.findall('.//ns:loc', ns) if loc.text]
 
 
-issues = []
-checked = 0
-
-for sitemap_path in [SITEMAP, NEWS_SITEMAP]:
-    if not os.path.exists(sitemap_path):
-        print(f"Warning: {sitemap_path} not found, skipping")
-        continue
-    
-    urls = parse_sitemap(sitemap_path)
-    sitemap_name = os.path.basename(sitemap_path)
-    
-    for url in urls:
-        checked += 1
-        status, msg = check_url(url)
-        if status != 200:
-            issues.append(f"{sitemap_name}: {url} -> HTTP {status} ({msg})")
-
-print(f"Checked URLs: {checked}")
-if issues:
-    print("Sitemap issues found:")
-    for i in issues:
-        print(" -", i)
-    sys.exit(1)
-else:
+def sitemap_files() -> List[str]:
+    """Every shard listed in sitemap_index.xml, else the two defaults."""
+    if not os.path.exists(SITEMAP_INDEX):
+        return [SITEMAP, NEWS_SITEMAP]
+    prefix = SITE_ORIGIN + '/'
+    return [
+        os.path.join(ROOT, *loc[len(prefix):].split('/'))
+        for loc in parse_sitemap(SITEMAP_INDEX) if loc.startswith(prefix)
+    ]
+
+
+def check_offline(sitemaps: List[str]) -> Tuple[int, List[str]]:
+    """Resolve every <loc> against the working tree; no network."""
+    _, files = scan_tree()
+    prefix = len(os.path.join(ROOT, ''))
+    checked = 0
+    issues: List[str] = []
+    for sitemap_path in sitemaps:
+        if not os.path.exists(sitemap_path):
+            print(f"Warning: {sitemap_path} not found, skipping")
+            continue
+        sitemap_name = os.path.basename(sitemap_path)
+        for url in parse_sitemap(sitemap_path):
+            checked += 1
+            if not url.startswith(SITE_ORIGIN + '/'):
+                issues.append(f"{sitemap_name}: {url} -> not on {SITE_ORIGIN}")
+                continue
+            target = url.split('#', 1)[0].split('?', 1)[0]
+            if '%' in target:
+                target = unquote(target)
+            if target.endswith('/'):
+                target += 'index.html'
+            rel = to_local_path(target, ROOT)[prefix:].replace(os.sep, '/')
+            if rel not in files:
+                issues.append(f"{sitemap_name}: {url} -> no file {rel}")
+    return checked, issues
+
+
+def rebase(url: str, base_url: Optional[str]) -> str:
+    """Point a SITE_ORIGIN URL at base_url instead (no-op when unset)."""
+    if base_url and url.startswith(SITE_ORIGIN):
+        return base_url.rstrip('/') + url[len(SITE_ORIGIN):]
+    return url
+
+
+class HostPool:
+    """Idle keep-alive connections for one scheme://host:port."""
+
+    def __init__(self, scheme: str, host: str, port: int):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.opened = 0
+
+    async def acquire(self):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+        ctx = ssl.create_default_context() if self.scheme == 'https' else None
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=ctx)
+
+    def release(self, conn, reusable: bool) -> None:
+        if reusable:
+            self.idle.append(conn)
+        else:
+            conn[1].close()
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class Checker:
+    def __init__(self, concurrency: int, retries: int, timeout: float):
+        self.sem = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.timeout = timeout
+        self.pools: Dict[Tuple[str, str, int], HostPool] = {}
+        self.latencies: List[float] = []
+
+    def pool(self, url: str) -> Tuple[HostPool, str]:
+        u = urlsplit(url)
+        port = u.port or (443 if u.scheme == 'https' else 80)
+        key = (u.scheme, u.hostname or '', port)
+        if key not in self.pools:
+            self.pools[key] = HostPool(*key)
+        path = u.path or '/'
+        if u.query:
+            path += '?' + u.query
+        return self.pools[key], path
+
+    async def request(self, method: str, url: str) -> Tuple[int, Dict[str, str]]:
+        """One HTTP/1.1 exchange on a pooled connection."""
+        pool, path = self.pool(url)
+        conn = await pool.acquire()
+        reader, writer = conn
+        reusable = False
+        try:
+            host = pool.host if pool.port in (80, 443) else f"{pool.host}:{pool.port}"
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                f"User-Agent: {USER_AGENT}\r\n"
+                "Accept-Encoding: identity\r\n"
+                "Connection: keep-alive\r\n\r\n".encode('latin-1')
+            )
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode('latin-1').split('\r\n')
+            version, status = lines[0].split(' ', 2)[:2]
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    k, v = line.split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+            reusable = await self.skip_body(reader, method, int(status), headers)
+            conn_hdr = headers.get('connection', '').lower()
+            if conn_hdr == 'close' or (version == 'HTTP/1.0' and conn_hdr != 'keep-alive'):
+                reusable = False
+            return int(status), headers
+        finally:
+            pool.release(conn, reusable)
+
+    @staticmethod
+    async def skip_body(reader, method: str, status: int,
+                        headers: Dict[str, str]) -> bool:
+        """Drain the body; returns False if the connection can't be reused."""
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return True
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    return True
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+            return True
+        await reader.read()
+        return False
+
+    async def fetch(self, url: str) -> Tuple[int, str]:
+        """HEAD (then GET if refused), following redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers = await self.request('HEAD', url)
+            if status in HEAD_REFUSED:
+                status, headers = await self.request('GET', url)
+            if 300 <= status < 400 and 'location' in headers:
+                url = urljoin(url, headers['location'])
+                continue
+            return status, 'OK' if status == 200 else f'HTTP Error {status}'
+        return 0, 'too many redirects'
+
+    async def check_url(self, url: str) -> Tuple[int, str]:
+        """Returns (status_code, message)"""
+        async with self.sem:
+            start = time.perf_counter()
+            try:
+                for attempt in range(self.retries + 1):
+                    if attempt:
+                        await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                    try:
+                        status, msg = await asyncio.wait_for(
+                            self.fetch(url), self.timeout)
+                    except (OSError, asyncio.TimeoutError,
+                            asyncio.IncompleteReadError, ValueError) as e:
+                        status, msg = 0, str(e) or type(e).__name__
+                        continue
+                    if status not in RETRY_STATUSES:
+                        break
+                return status, msg
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.close()
+
+
+def print_histogram(latencies: List[float]) -> None:
+    if not latencies:
+        return
+    counts = [0] * (len(HISTOGRAM_MS) + 1)
+    for sec in latencies:
+        ms = sec * 1000
+        i = next((i for i, edge in enumerate(HISTOGRAM_MS) if ms <= edge),
+                 len(HISTOGRAM_MS))
+        counts[i] += 1
+    widest = max(counts)
+    print("Latency histogram (ms):")
+    labels = [f"<= {e}" for e in HISTOGRAM_MS] + [f"> {HISTOGRAM_MS[-1]}"]
+    for label, n in zip(labels, counts):
+        bar = '#' * round(40 * n / widest) if n else ''
+        print(f"  {label:>9} {n:6d} {bar}")
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+    print(f"  p50 {p50:.0f} ms, p95 {p95:.0f} ms, max {ordered[-1] * 1000:.0f} ms")
+
+
+async def check_sitemaps(sitemaps: List[str], base_url: Optional[str],
+                         concurrency: int, retries: int,
+                         timeout: float) -> Tuple[int, List[str], Checker]:
+    checker = Checker(concurrency, retries, timeout)
+    jobs = []
+    for sitemap_path in sitemaps:
+        if not os.path.exists(sitemap_path):
+            print(f"Warning: {sitemap_path} not found, skipping")
+            continue
+        sitemap_name = os.path.basename(sitemap_path)
+        for url in parse_sitemap(sitemap_path):
+            jobs.append((sitemap_name, url, rebase(url, base_url)))
+    try:
+        results = await asyncio.gather(
+            *(checker.check_url(target) for _, _, target in jobs))
+    finally:
+        checker.close()
+    issues = [
+        f"{name}: {url} -> HTTP {status} ({msg})"
+        for (name, url, _), (status, msg) in zip(jobs, results)
+        if status != 200
+    ]
+    return len(jobs), issues, checker
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like GitHub Pages
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_repo() -> Tuple[http.server.ThreadingHTTPServer, str]:
+    """Serve ROOT on an ephemeral localhost port in a background thread."""
+    handler = functools.partial(_QuietHandler, directory=ROOT)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--base-url', help=f'check against this origin instead '
+                                       f'of {SITE_ORIGIN}')
+    ap.add_argument('--serve', action='store_true',
+                    help='serve the repo locally and check against it')
+    ap.add_argument('--offline', action='store_true',
+                    help='resolve URLs against the working tree, no HTTP')
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--retries', type=int, default=2)
+    ap.add_argument('--timeout', type=float, default=TIMEOUT)
+    args = ap.parse_args(argv)
+
+    if args.offline:
+        checked, issues = check_offline(sitemap_files())
+        print(f"Checked URLs: {checked}")
+        if issues:
+            print("Sitemap issues found:")
+            for i in issues:
+                print(" -", i)
+            return 1
+        print("All sitemap URLs map to files in the working tree.")
+        return 0
+
+    server = None
+    base_url = args.base_url
+    if args.serve:
+        server, base_url = serve_repo()
+        print(f"Serving {ROOT} at {base_url}")
+    try:
+        checked, issues, checker = asyncio.run(check_sitemaps(
+            sitemap_files(), base_url,
+            args.concurrency, args.retries, args.timeout))
+    finally:
+        if server:
+            server.shutdown()
+
+    print(f"Checked URLs: {checked}")
+    opened = sum(p.opened for p in checker.pools.values())
+    print(f"Connections opened: {opened} across {len(checker.pools)} host(s)")
+    print_histogram(checker.latencies)
+    if issues:
+        print("Sitemap issues found:")
+        for i in issues:
+            print(" -", i)
+        return 1
     print("All sitemap URLs return HTTP 200.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Persistent incremental cache for the site_corpus checks.
+- Pages are keyed by path + content hash (+ CORPUS_VERSION); a file whose
+  size/mtime are unchanged is not even re-read
+- Findings are keyed by page hash + check CHECK_NAME/VERSION
+- Checks that look at other files declare page_deps(page); their cached
+  findings are dropped when any dependency was added, removed or (for a
+  page) re-parsed
+Stored as a pickle under .cache/ (local only, never deployed). Page
+records are kept as per-page blobs and only unpickled when a check has to
+look at the page again, so an unchanged 10k-page tree loads in a blink.
+"""
+from __future__ import annotations
+from pathlib import Path
+import gc
+import hashlib
+import os
+import pickle
+import sys
+from typing import Dict, List, Sequence, Set
+
+from site_corpus import ROOT, Page, analyze_files, is_corpus_check, scan_tree
+import instrument
+
+CORPUS_VERSION = 6
+CACHE_PATH = ROOT / '.cache' / 'site-checks.pickle'
+
+
+class LazyPage:
+    """
+    Stand-in for a cached Page: rel, imgs (needed by reports) and ids
+    (the fragment index) are loaded eagerly, everything else on first
+    attribute access.
+    """
+    __slots__ = ('rel', 'imgs', 'ids', 'blob', 'page')
+
+    def __init__(self, rel: str, imgs: list, ids: set, blob: bytes):
+        self.rel = rel
+        self.imgs = imgs
+        self.ids = ids
+        self.blob = blob
+        self.page = None
+
+    def __getattr__(self, name):
+        if self.page is None:
+            self.page = pickle.loads(self.blob)
+        return getattr(self.page, name)
+
+
+class CorpusCache:
+    def __init__(self, path: Path = CACHE_PATH, root: Path = ROOT):
+        self.path = path
+        self.root = root
+        self.files: Dict[str, dict] = {}
+        self.checks: Dict[str, dict] = {}
+        self.tree: Set[str] = set()
+        self.tree_changes: Set[str] = set()
+        self.changed: Set[str] = set()  # tree_changes + re-parsed pages
+        self.reparsed: List[str] = []
+        self.fresh: Dict[str, Dict[str, List[str]]] = {}
+        self.timings: Dict[str, float] = {}
+        gc.disable()  # many small objects; collections would dominate
+        try:
+            with instrument.span('load cache', 'read'), open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+        finally:
+            gc.enable()
+        if data.get('version') != CORPUS_VERSION:
+            return
+        self.files = data['files']
+        self.checks = data['checks']
+        self.tree = data['tree']
+
+    def load_pages(self, checks: Sequence = (), jobs: int = 1) -> List[Page]:
+        """
+        Like site_corpus.load_pages, but only parses changed files.
+        Changed files also go through `checks` right away (in `jobs`
+        processes); run_check() picks those findings up.
+        """
+        html, tree = scan_tree(self.root)
+        # set() re-sizes the table: an empty result of ^ on two big sets
+        # keeps their capacity and makes every isdisjoint() a full scan
+        self.tree_changes = set(tree ^ self.tree) if self.tree else set()
+        self.tree = tree
+        files: Dict[str, dict] = {}
+        stale: List[str] = []
+        root = str(self.root)
+        for rel in html:
+            path = os.path.join(root, rel)
+            st = os.stat(path)
+            stamp = (st.st_size, st.st_mtime_ns)
+            entry = self.files.get(rel)
+            if entry is not None and entry['stamp'] != stamp:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                instrument.count('files_read')
+                instrument.count('bytes_read', len(raw))
+                sha = hashlib.sha1(raw).hexdigest()
+                entry = dict(entry, stamp=stamp) if entry['sha'] == sha else None
+            if entry is None:
+                stale.append(rel)
+                entry = {'stamp': stamp}
+            files[rel] = entry
+
+        fresh: Dict[str, Page] = {}
+        for sha, page, findings, timings in analyze_files(
+                stale, checks, self.root, jobs):
+            files[page.rel].update(
+                sha=sha,
+                imgs=page.imgs,
+                ids=page.ids,
+                blob=pickle.dumps(page, pickle.HIGHEST_PROTOCOL),
+            )
+            fresh[page.rel] = page
+            for name, issues in findings.items():
+                self.fresh.setdefault(name, {})[page.rel] = issues
+            for name, elapsed in timings.items():
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+        self.reparsed = stale
+        self.changed = self.tree_changes.union(stale)
+        self.files = files
+        return [
+            fresh.get(rel) or LazyPage(rel, e['imgs'], e['ids'], e['blob'])
+            for rel, e in files.items()
+        ]
+
+    def run_check(self, check, pages: List[Page]) -> List[str]:
+        """Like site_corpus.run_check, reusing findings that still hold."""
+        with instrument.span(check.CHECK_NAME, 'check'):
+            return self._run_check(check, pages)
+
+    def _run_check(self, check, pages: List[Page]) -> List[str]:
+        if is_corpus_check(check):
+            check.prepare(pages)
+        version = getattr(check, 'VERSION', 0)
+        old = self.checks.get(check.CHECK_NAME)
+        if old is None or old['version'] != version:
+            old = {'pages': {}}
+        results: Dict[str, dict] = {}
+        page_deps = getattr(check, 'page_deps', None)
+        fresh = self.fresh.get(check.CHECK_NAME, {})
+        issues: List[str] = []
+        for page in pages:
+            if not check.select(page.rel):
+                continue
+            sha = self.files[page.rel]['sha']
+            hit = old['pages'].get(page.rel)
+            if (hit is None or hit['sha'] != sha
+                    or not self.changed.isdisjoint(hit['deps'])):
+                deps = page_deps(page) if page_deps else ()
+                found = fresh.get(page.rel)
+                if found is None:
+                    found = check.check_page(page)
+                hit = {
+                    'sha': sha,
+                    'issues': found,
+                    'deps': frozenset(sys.intern(d) for d in deps),
+                }
+            results[page.rel] = hit
+            issues.extend(hit['issues'])
+        self.checks[check.CHECK_NAME] = {'version': version, 'pages': results}
+        return issues
+
+    def save(self) -> None:
+        data = {
+            'version': CORPUS_VERSION,
+            'files': self.files,
+            'checks': self.checks,
+            'tree': self.tree,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        gc.disable()
+        try:
+            with instrument.span('save cache', 'write'), open(tmp, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                instrument.count('bytes_written', f.tell())
+        finally:
+            gc.enable()
+        os.replace(tmp, self.path)
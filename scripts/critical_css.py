@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Inline above-the-fold CSS and load the rest of css/style.css async.
+- Parses style.css into rules (inside @media blocks too) and each page
+  into elements (tag, id, classes, attribute names)
+- A rule is used when every compound of one of its selectors matches some
+  element, or a class that js/*.js adds at runtime; rules no page uses are
+  dropped from PURGED_CSS, which every page then loads asynchronously
+- A rule is critical for a page when its subject matches an element above
+  the fold: the header plus the first FOLD_BLOCKS <section>/<article>
+  blocks of <main>. An empty <header> (news stubs, filled in at runtime)
+  counts as holding index.html's site header. Critical rules are inlined
+  into <head> with url()s rebased to the page; :hover/:focus rules are
+  left to the async sheet
+- Nothing in the tree is rewritten: build() returns the purged sheet and
+  the rewritten pages, which build.py --critical-css writes to
+  deploy_bundle/site/ only
+Run directly for a per-page report of inline/async bytes against the
+render-blocking original, without writing.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+import argparse
+import posixpath
+import re
+import sys
+from typing import (Dict, FrozenSet, Iterable, List, Optional, Sequence, Set,
+                    Tuple, Union)
+
+from html_events import ATTRS, parse_attrs
+from site_corpus import ROOT, is_top_level_page, iter_html_files
+
+SOURCE_CSS = 'css/style.css'
+PURGED_CSS = 'css/style.purged.css'
+SITE_HEADER_PAGE = 'index.html'
+FOLD_BLOCKS = 2
+
+RE_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+RE_LINK = re.compile(r'<link(?=[\s/>])(%s)>' % ATTRS, re.I)
+RE_HEADER = re.compile(r'(<header\b%s>)(.*?)(</header\s*>)' % ATTRS, re.I | re.S)
+RE_CSS_URL = re.compile(r'''url\(\s*(["']?)([^"')]*)\1\s*\)''')
+RE_SCHEME = re.compile(r'[A-Za-z][\w+.-]*:')
+RE_KEYFRAMES_NAME = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)')
+RE_INTERACTIVE = re.compile(r':(?:hover|focus|focus-visible|focus-within|active|visited)\b')
+RE_PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+RE_SIMPLE = re.compile(r'([.#]?)([\w-]+|\*)|\[\s*([\w-]+)[^\]]*\]')
+RE_COMBINATOR = re.compile(r'\s*[>+~]\s*|\s+')
+RE_JS_CLASS = re.compile(
+    r'classList\.\w+\(\s*[\'"]([\w-]+)|class(?:Name)?\s*=\s*\\?[\'"`]([^\'"`$]+)')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+             'link', 'meta', 'source', 'track', 'wbr'}
+
+
+# -- CSS -------------------------------------------------------------------
+
+@dataclass
+class Rule:
+    selectors: List[str]
+    body: str
+
+    def css(self, selectors: Optional[Sequence[str]] = None) -> str:
+        return f"{','.join(selectors or self.selectors)}{{{self.body}}}"
+
+
+@dataclass
+class Group:
+    """@media/@supports block holding nested rules."""
+    prelude: str
+    children: List['Node'] = field(default_factory=list)
+
+
+@dataclass
+class Raw:
+    """At-rule kept verbatim (@font-face, @keyframes, @import, ...)."""
+    text: str
+
+
+Node = Union[Rule, Group, Raw]
+
+
+def _squeeze(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def split_selectors(prelude: str) -> List[str]:
+    out, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            out.append(_squeeze(prelude[start:i]))
+            start = i + 1
+    out.append(_squeeze(prelude[start:]))
+    return [s for s in out if s]
+
+
+def _block_end(css: str, i: int) -> int:
+    """Index just past the } matching the { at css[i]."""
+    depth, quote = 0, ''
+    while i < len(css):
+        ch = css[i]
+        if quote:
+            if ch == '\\':
+                i += 1
+            elif ch == quote:
+                quote = ''
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return len(css)
+
+
+def parse_css(css: str) -> List[Node]:
+    css = RE_COMMENT.sub('', css)
+    nodes: List[Node] = []
+    i = 0
+    while i < len(css):
+        brace, semi = css.find('{', i), css.find(';', i)
+        if brace < 0 and semi < 0:
+            break
+        if semi >= 0 and (brace < 0 or semi < brace):
+            stmt = css[i:semi].strip()
+            if stmt.startswith('@'):
+                nodes.append(Raw(_squeeze(stmt) + ';'))
+            i = semi + 1
+            continue
+        prelude = css[i:brace].strip()
+        end = _block_end(css, brace)
+        inner = css[brace + 1:end - 1]
+        if prelude.startswith(('@media', '@supports')):
+            nodes.append(Group(_squeeze(prelude), parse_css(inner)))
+        elif prelude.startswith('@'):
+            nodes.append(Raw(_squeeze(css[i:end])))
+        elif prelude:
+            nodes.append(Rule(split_selectors(prelude), _squeeze(inner)))
+        i = end
+    return nodes
+
+
+def serialize(nodes: Iterable[Node]) -> str:
+    out = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            out.append(node.css())
+        elif isinstance(node, Group):
+            if node.children:
+                out.append(f"{node.prelude}{{\n{serialize(node.children)}\n}}")
+        else:
+            out.append(node.text)
+    return '\n'.join(out)
+
+
+# -- selectors -------------------------------------------------------------
+
+Compound = Tuple[str, FrozenSet[str], FrozenSet[str], FrozenSet[str]]
+
+
+def parse_selector(selector: str) -> List[Compound]:
+    """'nav a.btn:hover' -> [(tag, ids, classes, attrs), ...] per compound.
+    Pseudo-classes/elements are ignored, so matching errs on 'used'."""
+    compounds = []
+    for part in RE_COMBINATOR.split(RE_PSEUDO.sub('', selector).strip()):
+        tag, ids, classes, attrs = '', set(), set(), set()
+        for m in RE_SIMPLE.finditer(part):
+            if m.group(3):
+                attrs.add(m.group(3).lower())
+            elif m.group(1) == '.':
+                classes.add(m.group(2))
+            elif m.group(1) == '#':
+                ids.add(m.group(2))
+            elif m.group(2) != '*':
+                tag = m.group(2).lower()
+        compounds.append((tag, frozenset(ids), frozenset(classes),
+                          frozenset(attrs)))
+    return compounds or [('', frozenset(), frozenset(), frozenset())]
+
+
+@dataclass(frozen=True)
+class Element:
+    tag: str
+    id: str
+    classes: FrozenSet[str]
+    attrs: FrozenSet[str]
+
+
+def compound_matches(c: Compound, el: Element, extra: Set[str]) -> bool:
+    tag, ids, classes, attrs = c
+    return ((not tag or tag == el.tag)
+            and (not ids or ids == {el.id})
+            and classes <= (el.classes | extra)
+            and attrs <= el.attrs)
+
+
+# -- HTML ------------------------------------------------------------------
+
+class PageScanner(HTMLParser):
+    """Collects elements, flagging those above the fold."""
+
+    def __init__(self, fold_blocks: int = FOLD_BLOCKS):
+        super().__init__(convert_charrefs=True)
+        self.elements: Set[Element] = set()
+        self.fold: Set[Element] = set()
+        self.fold_blocks = fold_blocks
+        self.stack: List[str] = []
+        self.blocks = 0
+        self.in_fold = True
+        self.container_depth: Optional[int] = None
+        self.has_main = False
+
+    def handle_starttag(self, tag, attrs):
+        names = {k.lower() for k, _ in attrs}
+        values = dict(attrs)
+        el = Element(tag, values.get('id') or '',
+                     frozenset((values.get('class') or '').split()),
+                     frozenset(names))
+        self.elements.add(el)
+        if self.in_fold:
+            self.fold.add(el)
+        if tag == 'main' and not self.has_main:
+            self.has_main = True
+            self.container_depth = len(self.stack) + 1
+        elif (tag in ('section', 'article') and self.container_depth is not None
+              and len(self.stack) == self.container_depth):
+            self.blocks += 1
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        while self.stack and self.stack.pop() != tag:
+            pass
+        if (tag in ('section', 'article') and self.container_depth is not None
+                and len(self.stack) == self.container_depth
+                and self.blocks >= self.fold_blocks):
+            self.in_fold = False
+
+
+def scan_page(html: str, fold_blocks: int = FOLD_BLOCKS) -> PageScanner:
+    scanner = PageScanner(fold_blocks)
+    scanner.feed(html)
+    scanner.close()
+    return scanner
+
+
+def site_header(html: str) -> str:
+    """Inner markup of the first non-empty <header> in html."""
+    for m in RE_HEADER.finditer(html):
+        if m.group(2).strip():
+            return m.group(2)
+    return ''
+
+
+def with_site_header(html: str, header: str) -> str:
+    """html with an empty <header> (filled in at runtime) holding header,
+    so the nav rules count as above the fold; only used for scanning."""
+    return RE_HEADER.sub(
+        lambda m: m.group(0) if m.group(2).strip()
+        else m.group(1) + header + m.group(3), html)
+
+
+def js_classes(root: Path = ROOT) -> Set[str]:
+    """Class names js/*.js may add at runtime (classList / class="...")."""
+    found: Set[str] = set()
+    for path in sorted((root / 'js').glob('*.js')):
+        for m in RE_JS_CLASS.finditer(path.read_text(encoding='utf-8')):
+            found.update((m.group(1) or m.group(2)).split())
+    return found
+
+
+# -- matching --------------------------------------------------------------
+
+class Matcher:
+    def __init__(self, elements: Set[Element], extra: Set[str]):
+        self.elements = elements
+        self.extra = extra
+        self._cache: Dict[Compound, bool] = {}
+
+    def any_match(self, c: Compound) -> bool:
+        hit = self._cache.get(c)
+        if hit is None:
+            hit = self._cache[c] = any(
+                compound_matches(c, el, self.extra) for el in self.elements)
+        return hit
+
+    def used(self, selector: str) -> bool:
+        return all(self.any_match(c) for c in parse_selector(selector))
+
+
+def filter_nodes(nodes: Sequence[Node], keep,
+                 keep_raw=lambda raw: False) -> List[Node]:
+    """Rules pruned to the selectors that pass keep(selector); groups keep
+    their surviving children; Raw at-rules stay if keep_raw(raw)."""
+    out: List[Node] = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            sels = [s for s in node.selectors if keep(s)]
+            if sels:
+                out.append(Rule(sels, node.body))
+        elif isinstance(node, Group):
+            children = filter_nodes(node.children, keep, keep_raw)
+            if children:
+                out.append(Group(node.prelude, children))
+        elif keep_raw(node):
+            out.append(node)
+    return out
+
+
+def keyframes_filter(rules: Sequence[Node]):
+    """keep_raw for filter_nodes: @keyframes only if rules animate with
+    them; other at-rules (@font-face, ...) always."""
+    rules_css = serialize(rules)
+
+    def keep_raw(raw: Raw) -> bool:
+        m = RE_KEYFRAMES_NAME.match(raw.text)
+        return m is None or re.search(
+            r'\b%s\b' % re.escape(m.group(1)), rules_css) is not None
+    return keep_raw
+
+
+def purge(nodes: Sequence[Node], matcher: Matcher) -> List[Node]:
+    """style.css minus the rules no page uses."""
+    rules = filter_nodes(nodes, matcher.used)
+    return filter_nodes(nodes, matcher.used, keyframes_filter(rules))
+
+
+def critical(nodes: Sequence[Node], page: Matcher, fold: Matcher) -> List[Node]:
+    """Rules whose subject is above the fold (ancestors anywhere on page)."""
+    def keep(selector: str) -> bool:
+        if RE_INTERACTIVE.search(selector):
+            return False
+        *context, subject = parse_selector(selector)
+        return fold.any_match(subject) and all(map(page.any_match, context))
+    rules = filter_nodes(nodes, keep)
+    return filter_nodes(nodes, keep, lambda raw: (
+        raw.text.startswith(('@keyframes', '@-webkit-keyframes'))
+        and keyframes_filter(rules)(raw)))
+
+
+# -- pages -----------------------------------------------------------------
+
+def rebase_urls(css: str, page_rel: str) -> str:
+    """Relative url()s in SOURCE_CSS rules, made relative to page_rel."""
+    css_dir = posixpath.dirname(SOURCE_CSS)
+    page_dir = posixpath.dirname(page_rel) or '.'
+
+    def sub(m: re.Match) -> str:
+        quote, url = m.groups()
+        if not url or url.startswith(('/', '#')) or RE_SCHEME.match(url):
+            return m.group(0)
+        target = posixpath.normpath(posixpath.join(css_dir, url))
+        return f"url({quote}{posixpath.relpath(target, page_dir)}{quote})"
+    return RE_CSS_URL.sub(sub, css)
+
+
+def purged_href(href: str) -> str:
+    """The PURGED_CSS reference that replaces a SOURCE_CSS href."""
+    path = href.split('#', 1)[0].split('?', 1)[0]
+    return posixpath.join(posixpath.dirname(path), posixpath.basename(PURGED_CSS))
+
+
+def stylesheet_link(html: str, page_rel: str) -> Optional[re.Match]:
+    """The <link rel="stylesheet"> pointing at SOURCE_CSS, if any."""
+    for m in RE_LINK.finditer(html):
+        attrs = parse_attrs(m.group(1))
+        href = attrs.get('href', '').split('#', 1)[0].split('?', 1)[0]
+        if ('stylesheet' in attrs.get('rel', '').lower().split()
+                and posixpath.normpath(posixpath.join(
+                    posixpath.dirname(page_rel), href)) == SOURCE_CSS):
+            return m
+    return None
+
+
+def inline_critical(html: str, page_rel: str, css: str) -> str:
+    """Replace the style.css <link> with inline css + async PURGED_CSS."""
+    m = stylesheet_link(html, page_rel)
+    if m is None:
+        return html
+    indent = html[html.rfind('\n', 0, m.start()) + 1:m.start()]
+    if indent.strip():
+        indent = ''
+    href = purged_href(parse_attrs(m.group(1))['href'])
+    block = '\n'.join([
+        f'<style>\n{css}\n</style>',
+        f'<link rel="preload" href="{href}" as="style" '
+        f'onload="this.onload=null;this.rel=\'stylesheet\'">',
+        f'<noscript><link rel="stylesheet" href="{href}"></noscript>',
+    ]).replace('\n', '\n' + indent)
+    return html[:m.start()] + block + html[m.end():]
+
+
+def build(root: Path = ROOT, fold_blocks: int = FOLD_BLOCKS
+          ) -> Tuple[str, Dict[str, str], Dict[str, int]]:
+    """(PURGED_CSS text, {page rel: html with critical CSS inlined},
+    {page rel: inline bytes}) for every page linking SOURCE_CSS. Nothing
+    is written."""
+    nodes = parse_css((root / SOURCE_CSS).read_text(encoding='utf-8'))
+    pages = {}
+    for rel in iter_html_files(root):
+        if is_top_level_page(rel):
+            html = (root / rel).read_text(encoding='utf-8')
+            if stylesheet_link(html, rel) is not None:
+                pages[rel] = html
+    try:
+        header = site_header((root / SITE_HEADER_PAGE).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        header = ''
+
+    extra = js_classes(root)
+    scans = {rel: scan_page(with_site_header(html, header), fold_blocks)
+             for rel, html in pages.items()}
+    every = set().union(*(s.elements for s in scans.values())) if scans else set()
+    purged = serialize(purge(nodes, Matcher(every, extra))) + '\n'
+
+    out: Dict[str, str] = {}
+    sizes: Dict[str, int] = {}
+    for rel, html in pages.items():
+        scan = scans[rel]
+        css = rebase_urls(serialize(critical(nodes, Matcher(scan.elements, set()),
+                                             Matcher(scan.fold, set()))), rel)
+        out[rel] = inline_critical(html, rel, css)
+        sizes[rel] = len(css.encode('utf-8'))
+    return purged, out, sizes
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--fold', type=int, default=FOLD_BLOCKS, metavar='N',
+                    help='<section>/<article> blocks of <main> counted as '
+                         f'above the fold (default {FOLD_BLOCKS})')
+    args = ap.parse_args(argv)
+
+    source = len((ROOT / SOURCE_CSS).read_bytes())
+    purged, _, sizes = build(ROOT, args.fold)
+    purged_bytes = len(purged.encode('utf-8'))
+    print(f"{SOURCE_CSS}: {source} B; {PURGED_CSS} (used rules only, "
+          f"loaded async): {purged_bytes} B, {source - purged_bytes} B stripped")
+    print(f"{'page':<50} {'inline':>8} {'saved':>8}  (render-blocking CSS)")
+    for rel, inline in sorted(sizes.items()):
+        print(f"{rel:<50} {inline:>7}B {source - inline:>7}B")
+    print("Report only; build.py --critical-css applies it to deploy_bundle/site/.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
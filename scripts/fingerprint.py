@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Content-hashed asset names for the deploy bundle.
+- css/*.css and js/*.js get a copy named after a hash of the bytes that
+  are served (style.css -> style.3f9a1c0b.css), so they can be cached as
+  immutable; the plain names stay too, for pages already in caches
+- HTML references are found from the parsed pages run_all already keeps in
+  the corpus cache (<link href>, <script src>), not by scanning files again;
+  they are rewritten in place through html_events.attr_spans, so quoting
+  and spacing of the attribute do not matter
+- sw.js and manifest.json are rewritten by their quoted '/path' strings
+- ASSET_MAP (deploy_bundle/asset-map.json) maps original -> hashed paths;
+  other scripts use load_asset_map() / asset_url()
+Used by build.py --fingerprint. Run directly to print the current map.
+"""
+from __future__ import annotations
+import fnmatch
+import hashlib
+from html import escape
+import json
+import posixpath
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+
+from html_events import ATTRS, attr_spans
+from site_corpus import ROOT
+
+ASSET_MAP = ROOT / 'deploy_bundle' / 'asset-map.json'
+ASSET_PATTERNS = ('css/*.css', 'js/*.js')
+TEXT_REFERRERS = ('sw.js', 'manifest.json')
+HASH_LEN = 8
+REF_ATTRS = ('href', 'src')
+RE_REF_TAG = re.compile(r'<(?:link|script)(?=[\s/>])(%s)>' % ATTRS, re.I)
+
+
+def is_asset(rel: str) -> bool:
+    return '/' in rel and rel.count('/') == 1 and any(
+        fnmatch.fnmatchcase(rel, pat) for pat in ASSET_PATTERNS)
+
+
+def hashed_name(rel: str, data: bytes) -> str:
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{hashlib.sha1(data).hexdigest()[:HASH_LEN]}{ext}"
+
+
+def resolve(page_rel: str, url: str) -> Optional[str]:
+    if not url or url.startswith(('http:', 'https:', '//', 'data:', '#')):
+        return None
+    url = url.split('#', 1)[0].split('?', 1)[0]
+    if url.startswith('/'):
+        return url.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page_rel), url))
+
+
+def page_refs(pages: Iterable, assets: Set[str]) -> Dict[str, Set[str]]:
+    """page rel -> attribute values on it that point at an asset."""
+    out: Dict[str, Set[str]] = {}
+    for page in pages:
+        values = [link.get('href', '') for link in page.links]
+        values += [script.get('src', '') for script in page.scripts]
+        hits = {v for v in values if resolve(page.rel, v) in assets}
+        if hits:
+            out[page.rel] = hits
+    return out
+
+
+def rewrite_html(text: str, page_rel: str, values: Iterable[str],
+                 asset_map: Dict[str, str]) -> str:
+    """Swap each href/src value on <link>/<script> for the hashed file,
+    keeping its style (relative, ../ or /-rooted)."""
+    swaps: Dict[str, str] = {}
+    for value in values:
+        target = asset_map.get(resolve(page_rel, value) or '')
+        if target is not None:
+            path = value.split('#', 1)[0].split('?', 1)[0]
+            swaps[value] = posixpath.join(posixpath.dirname(path),
+                                          posixpath.basename(target)) + value[len(path):]
+    if not swaps:
+        return text
+
+    def tag(m: re.Match) -> str:
+        raw = m.group(1)
+        out: List[str] = []
+        pos = 0
+        for name, start, end, value in attr_spans(raw):
+            new = swaps.get(value) if name in REF_ATTRS else None
+            if new is None:
+                continue
+            # an entity-encoded value (&amp;) is written back encoded
+            out += [raw[pos:start], new if raw[start:end] == value
+                    else escape(new, quote=False)]
+            pos = end
+        if not out:
+            return m.group(0)
+        head = m.group(0)[:m.start(1) - m.start()]  # '<link' / '<script'
+        return head + ''.join(out) + raw[pos:] + '>'
+
+    return RE_REF_TAG.sub(tag, text)
+
+
+def rewrite_text(text: str, asset_map: Dict[str, str]) -> str:
+    """Rewrite quoted root-relative paths ("/css/style.css")."""
+    for rel, target in asset_map.items():
+        for q in '"\'':
+            text = text.replace(f'{q}/{rel}{q}', f'{q}/{target}{q}')
+    return text
+
+
+def save_asset_map(asset_map: Dict[str, str]) -> None:
+    ASSET_MAP.parent.mkdir(parents=True, exist_ok=True)
+    ASSET_MAP.write_text(json.dumps(asset_map, indent=2, sort_keys=True) + '\n',
+                         encoding='utf-8')
+
+
+def load_asset_map() -> Dict[str, str]:
+    """Original -> hashed path from the last --fingerprint build ({} if
+    the bundle was built without it)."""
+    try:
+        return json.loads(ASSET_MAP.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(rel: str, asset_map: Optional[Dict[str, str]] = None) -> str:
+    """'/css/style.css' -> '/css/style.<hash>.css' when fingerprinted."""
+    if asset_map is None:
+        asset_map = load_asset_map()
+    path = rel.lstrip('/')
+    return '/' + asset_map.get(path, path)
+
+
+def hashed_paths(asset_map: Optional[Dict[str, str]] = None) -> List[str]:
+    """Bundle paths that are content-addressed (safe to cache forever)."""
+    if asset_map is None:
+        asset_map = load_asset_map()
+    return sorted(asset_map.values())
+
+
+def main() -> int:
+    asset_map = load_asset_map()
+    if not asset_map:
+        print("No asset map; run: python3 scripts/build.py --fingerprint")
+        return 1
+    for rel, target in sorted(asset_map.items()):
+        print(f"{rel} -> {target}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Split js/news-manifest.json into per-category, per-page JSON shards for
+js/news-loader.js, so pages/news.html only downloads the items it shows.
+- js/news-shards/index.json: page size plus item/page counts per category
+- js/news-shards/<category>/<page>.json: that page's items, newest first
+  ("all" holds every item)
+- A category becomes a directory name, so it must be a lower-case slug
+  (letters, digits, '-', '_') and not "all"; items in any other category
+  only appear under "all" (validate_news reports them)
+Files are only rewritten when their contents change; shards that no longer
+exist are removed. js/news-manifest.json itself is left as is.
+"""
+from __future__ import annotations
+import json
+import math
+import re
+from pathlib import Path
+from typing import Dict, List
+
+import instrument
+from news_store import MANIFEST, NewsStore
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / 'js' / 'news-shards'
+NEWS_PER_PAGE = 9  # keep in sync with js/news-loader.js
+ALL = 'all'
+RE_CATEGORY = re.compile(r'[a-z0-9][a-z0-9_-]*\Z')
+
+
+def dump(data) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2) + '\n'
+
+
+def valid_category(name: str) -> bool:
+    """Safe as a shard directory and distinct from the "all" group."""
+    return name != ALL and RE_CATEGORY.match(name) is not None
+
+
+def bad_categories(store: NewsStore) -> List[str]:
+    return [name for name in store.categories() if not valid_category(name)]
+
+
+def build_shards(store: NewsStore) -> Dict[str, str]:
+    """Relative shard path -> file contents."""
+    files: Dict[str, str] = {}
+    counts = {}
+    groups: Dict[str, List[dict]] = {ALL: store.items}
+    for name in store.categories():
+        if valid_category(name):
+            groups[name] = store.category(name).items
+    for name, items in groups.items():
+        pages = max(1, math.ceil(len(items) / NEWS_PER_PAGE))
+        counts[name] = {'count': len(items), 'pages': pages}
+        for page in range(1, pages + 1):
+            start = (page - 1) * NEWS_PER_PAGE
+            files[f'{name}/{page}.json'] = dump(
+                items[start:start + NEWS_PER_PAGE])
+    files['index.json'] = dump({
+        'per_page': NEWS_PER_PAGE,
+        'total': len(store),
+        'categories': counts,
+    })
+    return files
+
+
+def write_shards(files: Dict[str, str]) -> List[str]:
+    changed = []
+    for rel, text in files.items():
+        path = OUT_DIR / rel
+        if path.exists() and path.read_text(encoding='utf-8') == text:
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with instrument.span('write shard', 'write', rel=rel):
+            path.write_text(text, encoding='utf-8')
+        instrument.count('bytes_written', len(text.encode('utf-8')))
+        changed.append(rel)
+    if OUT_DIR.exists():
+        for path in sorted(OUT_DIR.rglob('*.json')):
+            rel = path.relative_to(OUT_DIR).as_posix()
+            if rel not in files:
+                path.unlink()
+                changed.append(rel)
+        for d in sorted(OUT_DIR.iterdir()):
+            if d.is_dir() and not any(d.iterdir()):
+                d.rmdir()
+    return changed
+
+
+def main() -> None:
+    store = NewsStore.load(MANIFEST)
+    files = build_shards(store)
+    for name in bad_categories(store):
+        print(f"Skipped category {name!r}: not a shard name (only under {ALL!r})")
+    changed = write_shards(files)
+    where = OUT_DIR.relative_to(ROOT).as_posix()
+    if changed:
+        print(f"Updated {len(changed)} of {len(files)} files in {where}/")
+    else:
+        print(f"News shards unchanged ({len(files)} files in {where}/).")
+
+
+if __name__ == '__main__':
+    instrument.run(main)
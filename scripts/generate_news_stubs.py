@@ -5,20 +5,41 @@ Generate missing news/*.html stubs from js/news-manifest.json.
 - Writes minimal SEO page with canonical, OG/Twitter,
   and JSON-LD NewsArticle
 - Skips files that already exist
+
+TEMPLATE is compiled once into literal/field pairs; items are rendered in
+batches across --jobs worker processes and each file is written atomically
+(temp file + rename). STUB_LEDGER records, per generated stub, the hash of
+its manifest entry (plus template) and of the HTML written, so:
+- --only-changed re-renders stubs whose entry or the template changed,
+  but never a stub that has since been edited by hand
+- --force re-renders every stub this script generated
+Pages this script did not generate are never overwritten.
 """
 from __future__ import annotations
 from pathlib import Path
+import argparse
+import hashlib
 import json
+import os
+import string
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import instrument
+from news_store import NewsStore
 
 ROOT = Path(__file__).resolve().parents[1]
 BASE = 'https://shu-edu-tw.github.io'
 
 manifest_path = ROOT / 'js' / 'news-manifest.json'
 news_dir = ROOT / 'news'
-news_dir.mkdir(parents=True, exist_ok=True)
-
-manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+STUB_LEDGER = ROOT / 'scripts' / 'news-stubs.json'
+# what open() would create under the current umask (mkstemp uses 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
 
 TZ8 = timezone(timedelta(hours=8))
 
@@ -133,14 +154,28 @@ TEMPLATE = """<!DOCTYPE html>
 </html>
 """
 
-for item in manifest:
-    url = item.get('url', '')
-    if not url:
-        continue
-    out_path = to_rel_path(url)
-    if out_path.exists():
-        continue
 
+def compile_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """Split a str.format template into (literal, field name) pairs once."""
+    return [(literal, field)
+            for literal, field, _, _ in string.Formatter().parse(template)]
+
+
+COMPILED = compile_template(TEMPLATE)
+TEMPLATE_HASH = hashlib.sha1(TEMPLATE.encode('utf-8')).hexdigest()
+
+
+def render(context: Dict[str, str]) -> str:
+    parts = []
+    for literal, field in COMPILED:
+        parts.append(literal)
+        if field is not None:
+            parts.append(context[field])
+    return ''.join(parts)
+
+
+def stub_context(item: dict) -> Dict[str, str]:
+    url = item['url']
     title = item.get('title', '世新大學新聞')
     desc = item.get('excerpt', '世新大學新聞稿。')
     date = item.get('date', '2025-01-01')
@@ -161,7 +196,7 @@ for item in manifest:
     else:
         image_abs = f"{BASE}/news/{image_rel}"
 
-    html = TEMPLATE.format(
+    return dict(
         title=title,
         desc=desc,
         canonical=canonical,
@@ -176,8 +211,127 @@ for item in manifest:
         json_canonical=json.dumps(canonical, ensure_ascii=False),
     )
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(html, encoding='utf-8')
-    print(f"Created stub: {out_path.relative_to(ROOT)}")
 
-print('News stubs generation completed.')
+def entry_hash(item: dict) -> str:
+    data = json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1((TEMPLATE_HASH + data).encode('utf-8')).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        instrument.count('bytes_written', len(data))
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def render_batch(items: Sequence[dict]) -> List[Tuple[str, str, str]]:
+    """Render and write a batch; returns (rel, entry hash, html hash)."""
+    done = []
+    for item in items:
+        data = render(stub_context(item)).encode('utf-8')
+        out_path = to_rel_path(item['url'])
+        write_atomic(out_path, data)
+        done.append((out_path.relative_to(ROOT).as_posix(), entry_hash(item),
+                     hashlib.sha1(data).hexdigest()))
+    return done
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def select_items(store: NewsStore, ledger: Dict[str, dict], force: bool,
+                 only_changed: bool) -> Tuple[List[dict], List[str]]:
+    """Items to (re)render, plus hand-edited stubs that were skipped."""
+    todo: List[dict] = []
+    edited: List[str] = []
+    for item in store:
+        if not item.get('url'):
+            continue
+        out_path = to_rel_path(item['url'])
+        if not out_path.exists():
+            todo.append(item)
+            continue
+        rel = out_path.relative_to(ROOT).as_posix()
+        known = ledger.get(rel)
+        if known is None or not (force or only_changed):
+            continue  # not ours, or default mode: never touch existing
+        if not force and known['entry'] == entry_hash(item):
+            continue
+        if not force and known['html'] != file_hash(out_path):
+            edited.append(rel)
+            continue
+        todo.append(item)
+    return todo, edited
+
+
+def load_ledger() -> Dict[str, dict]:
+    if STUB_LEDGER.exists():
+        return json.loads(STUB_LEDGER.read_text(encoding='utf-8'))
+    return {}
+
+
+def save_ledger(ledger: Dict[str, dict]) -> None:
+    text = json.dumps(ledger, indent=2, sort_keys=True) + '\n'
+    write_atomic(STUB_LEDGER, text.encode('utf-8'))
+
+
+def positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument('--only-changed', action='store_true',
+                      help='also re-render generated stubs whose manifest '
+                           'entry changed (hand-edited stubs are skipped)')
+    mode.add_argument('--force', action='store_true',
+                      help='re-render every stub this script generated')
+    ap.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                    help='worker processes (0 = one per CPU)')
+    ap.add_argument('--batch', type=positive_int, default=200,
+                    help='items per worker task')
+    args = ap.parse_args(argv)
+    jobs = args.jobs or os.cpu_count() or 1
+
+    news_dir.mkdir(parents=True, exist_ok=True)
+    ledger = load_ledger()
+    store = NewsStore.load(manifest_path)
+    todo, edited = select_items(store, ledger, args.force, args.only_changed)
+    existed = {to_rel_path(item['url']).relative_to(ROOT).as_posix()
+               for item in todo if to_rel_path(item['url']).exists()}
+
+    batches = [todo[i:i + args.batch]
+               for i in range(0, len(todo), args.batch)]
+    if jobs > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(render_batch, batches))
+    else:
+        results = [render_batch(b) for b in batches]
+
+    for batch in results:
+        for rel, entry, html in batch:
+            ledger[rel] = {'entry': entry, 'html': html}
+            verb = 'Updated' if rel in existed else 'Created'
+            print(f"{verb} stub: {rel}")
+    if todo:
+        save_ledger(ledger)
+    for rel in edited:
+        print(f"Skipped (edited by hand since generated): {rel}")
+
+    print('News stubs generation completed.')
+
+
+if __name__ == '__main__':
+    instrument.run(main)
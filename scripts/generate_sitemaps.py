@@ -1,17 +1,41 @@
 #!/usr/bin/env python3
-"""Generate standard and Google News sitemaps from repo content."""
+"""Generate standard and Google News sitemaps from repo content.
+
+Entries are streamed to disk one <url> block at a time. A sitemap that
+outgrows the protocol limits (50,000 URLs / 50 MB uncompressed) rolls over
+into numbered shards (sitemap.xml, sitemap-2.xml, ...), and
+sitemap_index.xml lists every shard. --gzip also writes .xml.gz copies.
+
+<lastmod> for static pages comes from LASTMOD_LEDGER, which maps each page
+to the hash of its content and the date that content first appeared;
+checkouts and touches therefore do not move it. Pages missing from the
+ledger take their last commit date from git when the working copy matches
+HEAD, otherwise today's date. Files whose rendered bytes already match
+what is on disk are left alone, so an unchanged build writes nothing.
+"""
 from __future__ import annotations
 
+import argparse
 import datetime as _dt
+import filecmp
+import gzip
+import hashlib
 import json
+import subprocess
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import instrument
+from news_store import NewsStore, abs_url
 
 BASE_URL = "https://shu-edu-tw.github.io"
 ROOT = Path(__file__).resolve().parents[1]
 OUTPUT_MAIN = ROOT / "sitemap.xml"
 OUTPUT_NEWS = ROOT / "news-sitemap.xml"
+OUTPUT_INDEX = ROOT / "sitemap_index.xml"
 NEWS_MANIFEST = ROOT / "js" / "news-manifest.json"
+LASTMOD_LEDGER = ROOT / "scripts" / "sitemap-lastmod.json"
 
 STATIC_PAGES: List[Tuple[str, str, float]] = [
     ("index.html", "weekly", 1.0),
@@ -29,85 +53,124 @@ STATIC_PAGES: List[Tuple[str, str, float]] = [
 PUBLISHER_NAME = "世新大學"
 LANGUAGE = "zh-tw"
 
+MAX_URLS = 50_000           # sitemaps.org per-file limit
+MAX_NEWS_URLS = 1_000       # Google News per-file limit
+MAX_BYTES = 50 * 1024 * 1024
+
+URLSET_OPEN = (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n\n"
+)
+NEWS_URLSET_OPEN = (
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+    "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\" \n"
+    "        xmlns:news=\"http://www.google.com/schemas/"
+    "sitemap-news/0.9\">\n\n"
+)
+URLSET_CLOSE = "\n\n</urlset>\n"
+
+# (entry block, lastmod) pairs as produced by the build_* generators
+Entry = Tuple[str, str]
+
+
+class LastmodLedger:
+    """rel path -> {"sha1": content hash, "lastmod": YYYY-MM-DD}."""
+
+    def __init__(self, path: Path = LASTMOD_LEDGER):
+        self.path = path
+        self.entries = {}
+        if path.exists():
+            self.entries = json.loads(path.read_text(encoding="utf-8"))
+        self.dirty = False
+
+    def lastmod(self, rel_path: str) -> str:
+        sha = hashlib.sha1((ROOT / rel_path).read_bytes()).hexdigest()
+        entry = self.entries.get(rel_path)
+        if entry and entry["sha1"] == sha:
+            return entry["lastmod"]
+        lastmod = _git_lastmod(rel_path) or _today()
+        self.entries[rel_path] = {"sha1": sha, "lastmod": lastmod}
+        self.dirty = True
+        return lastmod
+
+    def save(self) -> bool:
+        if not self.dirty:
+            return False
+        text = json.dumps(self.entries, indent=2, sort_keys=True,
+                          ensure_ascii=False) + "\n"
+        self.path.write_text(text, encoding="utf-8")
+        self.dirty = False
+        return True
+
+
+def _today() -> str:
+    return _dt.datetime.now(_dt.timezone.utc).strftime("%Y-%m-%d")
 
-def _file_lastmod(path: Path) -> str:
-    timestamp = path.stat().st_mtime
-    dt_utc = _dt.datetime.fromtimestamp(timestamp, _dt.timezone.utc)
-    return dt_utc.strftime("%Y-%m-%d")
 
+def _git_lastmod(rel_path: str) -> Optional[str]:
+    """Commit date of rel_path if the working copy matches HEAD."""
+    def git(*args: str) -> Optional[str]:
+        try:
+            out = subprocess.run(
+                ["git", "-C", str(ROOT), *args],
+                capture_output=True, text=True, check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return out.stdout.strip()
 
-def build_standard_entries() -> List[str]:
-    entries: List[str] = []
+    if git("status", "--porcelain", "--", rel_path) != "":
+        return None  # modified, untracked, or no git at all
+    return git("log", "-1", "--format=%cs", "--", rel_path) or None
+
+
+def _file_lastmod(path: Path, ledger: Optional[LastmodLedger] = None) -> str:
+    ledger = ledger or LastmodLedger()
+    return ledger.lastmod(path.relative_to(ROOT).as_posix())
+
+
+def build_standard_entries(
+        ledger: Optional[LastmodLedger] = None) -> Iterator[Entry]:
+    ledger = ledger or LastmodLedger()
     for rel_path, changefreq, priority in STATIC_PAGES:
         file_path = ROOT / rel_path
         if not file_path.exists():
             continue
-        lastmod = _file_lastmod(file_path)
+        lastmod = _file_lastmod(file_path, ledger)
         if rel_path == "index.html":
             url = f"{BASE_URL}/index.html"
         else:
             url = f"{BASE_URL}/{rel_path}"
-        entries.append(
+        yield (
             f"  <url>\n"
-            f"    <loc>{url}</loc>\n"
+            f"    <loc>{escape(url)}</loc>\n"
             f"    <lastmod>{lastmod}</lastmod>\n"
             f"    <changefreq>{changefreq}</changefreq>\n"
             f"    <priority>{priority:.1f}</priority>\n"
             f"  </url>"
-        )
+        ), lastmod
 
     # Include news articles as well
     for news in load_news_entries():
         lastmod = news["date"]
-        entries.append(
+        yield (
             f"  <url>\n"
-            f"    <loc>{news['url']}</loc>\n"
+            f"    <loc>{escape(news['url'])}</loc>\n"
             f"    <lastmod>{lastmod}</lastmod>\n"
             f"    <changefreq>monthly</changefreq>\n"
             f"    <priority>0.7</priority>\n"
             f"  </url>"
-        )
-    return entries
-
-
-def load_news_entries() -> List[dict]:
-    if not NEWS_MANIFEST.exists():
-        return []
-    data = json.loads(NEWS_MANIFEST.read_text(encoding="utf-8"))
-    formatted = []
-    for entry in data:
-        url = entry.get("url", "").replace("../", "/")
-        formatted.append(
-            {
-                "title": entry.get("title", ""),
-                "date": entry.get("date", ""),
-                "url": f"{BASE_URL}{url}",
-            }
-        )
-    # sort by date desc
-    formatted.sort(key=lambda item: item["date"], reverse=True)
-    return formatted
-
-
-def write_standard_sitemap(entries: Iterable[str]) -> None:
-    body = "\n".join(entries)
-    contents = (
-        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
-        "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n\n"
-        f"{body}\n\n"
-        "</urlset>\n"
-    )
-    OUTPUT_MAIN.write_text(contents, encoding="utf-8")
+        ), lastmod
 
 
-def write_news_sitemap(news_entries: List[dict]) -> None:
-    news_entries = news_entries[:100]  # per Google News guidelines
-    blocks: List[str] = []
-    for entry in news_entries:
+def build_news_entries(news_entries: Iterable[dict]) -> Iterator[Entry]:
+    for i, entry in enumerate(news_entries):
+        if i == 100:  # per Google News guidelines
+            break
         publication_date = entry["date"]
-        blocks.append(
+        yield (
             "  <url>\n"
-            f"    <loc>{entry['url']}</loc>\n"
+            f"    <loc>{escape(entry['url'])}</loc>\n"
             f"    <news:news>\n"
             f"      <news:publication>\n"
             f"        <news:name>{PUBLISHER_NAME}</news:name>\n"
@@ -116,30 +179,207 @@ def write_news_sitemap(news_entries: List[dict]) -> None:
             f"      <news:publication_date>"
             f"{publication_date}"
             f"</news:publication_date>\n"
-            f"      <news:title>{entry['title']}</news:title>\n"
+            f"      <news:title>{escape(entry['title'])}</news:title>\n"
             f"    </news:news>\n"
             "  </url>"
-        )
+        ), publication_date
+
+
+def load_news_entries() -> List[dict]:
+    # NewsStore keeps the manifest sorted by date desc already
+    return [
+        {
+            "title": entry.get("title", ""),
+            "date": entry.get("date", ""),
+            "url": abs_url(entry.get("url", "")),
+        }
+        for entry in NewsStore.load(NEWS_MANIFEST)
+    ]
+
+
+def shard_path(first: Path, n: int) -> Path:
+    """sitemap.xml -> sitemap.xml, sitemap-2.xml, sitemap-3.xml, ..."""
+    if n == 1:
+        return first
+    return first.with_name(f"{first.stem}-{n}{first.suffix}")
+
+
+class ShardedSitemapWriter:
+    """
+    Streams <url> blocks into first, first-2, ... rolling over before a
+    shard would exceed max_urls or max_bytes. Each shard is written to a
+    .tmp file and renamed into place when it is complete, unless the file
+    on disk already has the same bytes (then it is left untouched).
+    """
+
+    def __init__(self, first: Path, opening: str, max_urls: int,
+                 max_bytes: int = MAX_BYTES, gzip_copy: bool = False):
+        self.first = first
+        self.opening = opening.encode("utf-8")
+        self.closing = URLSET_CLOSE.encode("utf-8")
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.gzip_copy = gzip_copy
+        self.shards: List[Tuple[Path, str]] = []  # (path, max lastmod)
+        self.changed: List[Path] = []
+        self._out: Optional[IO[bytes]] = None
+        self._gz: Optional[IO[bytes]] = None
+        self._count = 0
+        self._size = 0
+        self._lastmod = ""
+
+    def _open(self) -> None:
+        path = shard_path(self.first, len(self.shards) + 1)
+        self._path = path
+        self._out = open(path.with_name(path.name + ".tmp"), "wb")
+        if self.gzip_copy:
+            gz_tmp = path.with_name(path.name + ".gz.tmp")
+            # mtime=0 keeps the .gz bytes stable across identical builds
+            self._gz = gzip.GzipFile(gz_tmp, "wb", mtime=0)
+        self._count = 0
+        self._size = 0
+        self._lastmod = ""
+        self._emit(self.opening)
+
+    def _emit(self, data: bytes) -> None:
+        instrument.count('bytes_written', len(data))
+        self._out.write(data)
+        if self._gz:
+            self._gz.write(data)
+        self._size += len(data)
+
+    def _finish(self) -> None:
+        self._emit(self.closing)
+        self._out.close()
+        self._commit(Path(self._out.name), self._path)
+        if self._gz:
+            self._gz.close()
+            self._commit(Path(self._gz.name),
+                         self._path.with_name(self._path.name + ".gz"))
+            self._gz = None
+        self.shards.append((self._path, self._lastmod))
+        self._out = None
+
+    def _commit(self, tmp: Path, dest: Path) -> None:
+        if dest.exists() and filecmp.cmp(tmp, dest, shallow=False):
+            tmp.unlink()
+        else:
+            tmp.replace(dest)
+            self.changed.append(dest)
+
+    def write(self, block: str, lastmod: str = "") -> None:
+        data = block.encode("utf-8")
+        if self._out is not None:
+            extra = len(data) + 1 + len(self.closing)
+            if (self._count >= self.max_urls
+                    or self._size + extra > self.max_bytes):
+                self._finish()
+        if self._out is None:
+            self._open()
+        elif self._count:
+            self._emit(b"\n")
+        self._emit(data)
+        self._count += 1
+        self._lastmod = max(self._lastmod, lastmod)
+
+    def close(self) -> List[Tuple[Path, str]]:
+        if self._out is None and not self.shards:
+            self._open()  # an empty sitemap is still a valid sitemap
+        if self._out is not None:
+            self._finish()
+        self._remove_stale()
+        return self.shards
+
+    def _remove_stale(self) -> None:
+        n = len(self.shards) + 1
+        while True:
+            stale = shard_path(self.first, n)
+            gz = stale.with_name(stale.name + ".gz")
+            if not stale.exists() and not gz.exists():
+                break
+            for path in (stale, gz):
+                if path.exists():
+                    path.unlink()
+                    self.changed.append(path)
+            n += 1
+        if not self.gzip_copy:
+            for path, _ in self.shards:
+                gz = path.with_name(path.name + ".gz")
+                if gz.exists():
+                    gz.unlink()
+                    self.changed.append(gz)
+
+
+def write_sitemap(first: Path, opening: str, entries: Iterable[Entry],
+                  max_urls: int, gzip_copy: bool) -> ShardedSitemapWriter:
+    writer = ShardedSitemapWriter(first, opening, max_urls,
+                                  gzip_copy=gzip_copy)
+    for block, lastmod in entries:
+        writer.write(block, lastmod)
+    writer.close()
+    return writer
+
+
+def write_standard_sitemap(entries: Iterable[Entry],
+                           gzip_copy: bool = False) -> ShardedSitemapWriter:
+    return write_sitemap(OUTPUT_MAIN, URLSET_OPEN, entries, MAX_URLS,
+                         gzip_copy)
+
+
+def write_news_sitemap(news_entries: Iterable[dict],
+                       gzip_copy: bool = False) -> ShardedSitemapWriter:
+    return write_sitemap(OUTPUT_NEWS, NEWS_URLSET_OPEN,
+                         build_news_entries(news_entries), MAX_NEWS_URLS,
+                         gzip_copy)
+
+
+def write_sitemap_index(shards: Iterable[Tuple[Path, str]]) -> bool:
+    """Write sitemap_index.xml; returns False if it was already current."""
+    blocks = []
+    for path, lastmod in shards:
+        rel = path.relative_to(ROOT).as_posix()
+        block = f"  <sitemap>\n    <loc>{BASE_URL}/{rel}</loc>\n"
+        if lastmod:
+            block += f"    <lastmod>{lastmod}</lastmod>\n"
+        blocks.append(block + "  </sitemap>")
     body = "\n".join(blocks)
     contents = (
         "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
-        "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\" \n"
-        "        xmlns:news=\"http://www.google.com/schemas/"
-        "sitemap-news/0.9\">\n\n"
+        "<sitemapindex xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n\n"
         f"{body}\n\n"
-        "</urlset>\n"
+        "</sitemapindex>\n"
     )
-    OUTPUT_NEWS.write_text(contents, encoding="utf-8")
+    data = contents.encode("utf-8")
+    if OUTPUT_INDEX.exists() and OUTPUT_INDEX.read_bytes() == data:
+        return False
+    with instrument.span('write index', 'write'):
+        OUTPUT_INDEX.write_bytes(data)
+    instrument.count('bytes_written', len(data))
+    return True
+
 
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--gzip", action="store_true",
+                    help="also write .xml.gz next to every sitemap file")
+    args = ap.parse_args(argv)
 
-def main() -> None:
-    news_entries = load_news_entries()
-    write_standard_sitemap(build_standard_entries())
-    write_news_sitemap(news_entries)
-    main_path = OUTPUT_MAIN.relative_to(ROOT)
-    news_path = OUTPUT_NEWS.relative_to(ROOT)
-    print(f"Wrote {main_path} and {news_path}")
+    ledger = LastmodLedger()
+    main_writer = write_standard_sitemap(build_standard_entries(ledger),
+                                         args.gzip)
+    news_writer = write_news_sitemap(load_news_entries(), args.gzip)
+    shards = main_writer.shards + news_writer.shards
+    changed = [p.relative_to(ROOT).as_posix()
+               for p in main_writer.changed + news_writer.changed]
+    if write_sitemap_index(shards):
+        changed.append(OUTPUT_INDEX.relative_to(ROOT).as_posix())
+    if ledger.save():
+        changed.append(LASTMOD_LEDGER.relative_to(ROOT).as_posix())
+    if changed:
+        print(f"Updated {', '.join(changed)}")
+    else:
+        print("Sitemaps unchanged; nothing written.")
 
 
 if __name__ == "__main__":
-    main()
+    instrument.run(main)
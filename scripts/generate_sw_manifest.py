@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Generate the service worker's precache list from the site.
+- Pages: /, index.html, offline.html, pages/*.html and the latest
+  --news entries of js/news-manifest.json that exist on disk
+- Assets: same-origin stylesheets, scripts and <link rel="preload"
+  as="image"> images those pages reference
+- Every entry gets a revision (content hash), written into sw.js between
+  PRECACHE_START/PRECACHE_END; sw.js only re-downloads entries whose
+  revision changed, so there is no cache version to bump by hand
+- PRECACHE_VERSION (a hash of the list) names sw.js's runtime cache, so
+  files cached at runtime are dropped whenever the list changes
+sw.js is rewritten only when the list actually changes. build.py regenerates
+the list inside the bundle's sw.js with build_entries(bundle), so --minify,
+--fingerprint and --critical-css bundles list the files their pages
+actually load, with revisions of the bytes they serve.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import posixpath
+import re
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from news_store import MANIFEST, NewsStore, site_path
+from site_corpus import ROOT, parse_page, read_html
+
+SW_PATH = ROOT / 'sw.js'
+LATEST_NEWS = 8
+PRECACHE_START = '// precache-manifest:start (generated by scripts/generate_sw_manifest.py)'
+PRECACHE_END = '// precache-manifest:end'
+RE_BLOCK = re.compile(re.escape(PRECACHE_START) + r'.*?' + re.escape(PRECACHE_END),
+                      re.S)
+
+
+def local_ref(page_rel: str, url: str) -> Optional[str]:
+    """href/src on page_rel -> repo-relative path, if same-origin."""
+    if not url or url.startswith(('http:', 'https:', '//', 'data:', '#')):
+        return None
+    url = url.split('#', 1)[0].split('?', 1)[0]
+    if url.startswith('/'):
+        return url.lstrip('/') or 'index.html'
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page_rel), url))
+
+
+def page_assets(rel: str, root: Path = ROOT) -> List[str]:
+    page = parse_page(rel, read_html(rel, root))
+    refs = []
+    for link in page.links:
+        rels = link.get('rel', '').lower().split()
+        if 'stylesheet' in rels or ('preload' in rels
+                                    and link.get('as') in ('style', 'image')):
+            refs.append(local_ref(rel, link.get('href', '')))
+    refs.extend(local_ref(rel, s.get('src', '')) for s in page.scripts)
+    return [r for r in refs if r]
+
+
+def precache_paths(root: Path, latest: int) -> List[str]:
+    pages = ['index.html', 'offline.html',
+             *sorted(p.relative_to(root).as_posix()
+                     for p in (root / 'pages').glob('*.html'))]
+    store = NewsStore.load(root / MANIFEST.relative_to(ROOT))
+    for item in store.latest(latest):
+        rel = site_path(item.get('url', ''))
+        if rel and (root / rel).exists():
+            pages.append(rel)
+    paths = list(pages)
+    for rel in pages:
+        paths.extend(page_assets(rel, root))
+    seen = set()
+    return [p for p in paths
+            if (root / p).is_file() and not (p in seen or seen.add(p))]
+
+
+def revision(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+
+
+def build_entries(root: Path = ROOT, latest: int = LATEST_NEWS) -> List[Dict[str, str]]:
+    entries = []
+    for rel in precache_paths(root, latest):
+        rev = revision(root / rel)
+        if rel == 'index.html':
+            entries.append({'url': '/', 'revision': rev})
+        entries.append({'url': '/' + rel, 'revision': rev})
+    return entries
+
+
+def render_block(entries: Sequence[Dict[str, str]]) -> str:
+    # names the runtime cache, so anything cached at runtime is dropped
+    # whenever a precached file changes
+    version = hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest()[:12]
+    lines = [PRECACHE_START, 'const PRECACHE_MANIFEST = [']
+    lines += [f"    {json.dumps(e, ensure_ascii=False)}," for e in entries]
+    lines += ['];', f"const PRECACHE_VERSION = '{version}';", PRECACHE_END]
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--news', type=int, default=LATEST_NEWS, metavar='N',
+                    help=f'latest news pages to precache (default {LATEST_NEWS})')
+    args = ap.parse_args(argv)
+
+    entries = build_entries(ROOT, args.news)
+    sw = SW_PATH.read_text(encoding='utf-8')
+    if not RE_BLOCK.search(sw):
+        print(f"{SW_PATH.name}: no precache-manifest markers found")
+        return 1
+    new = RE_BLOCK.sub(lambda m: render_block(entries), sw)
+    if new == sw:
+        print(f"Precache manifest unchanged ({len(entries)} entries).")
+        return 0
+    SW_PATH.write_text(new, encoding='utf-8')
+    print(f"Updated {SW_PATH.name}: {len(entries)} precache entries.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+One-pass HTML tokenizer emitting typed events.
+- iter_events(html) yields Event(kind, tag, attrs, data) in document
+  order: START (attrs dict, first value wins), END, TEXT, COMMENT
+- Tags are matched by one compiled pattern that understands quoted
+  attribute values (so '>' inside alt="a > b" is fine); text is the gap
+  between matches. No match attempt runs past the next '<' (a '<' ends
+  a tag and is not allowed in quoted values), so unclosed tags keep the
+  pass linear: they come out as text instead of rescanning the document
+- <script>, <style>, <textarea> and <title> are raw text: their content
+  is a single TEXT event and markup inside it is not tokenized
+- Entities are decoded in text and attribute values; tag and attribute
+  names are lower-cased
+- iter_events(html, tags={...}) only emits START/END for those tags (raw
+  text tags are always handled); other markup is skipped inside the regex
+  engine and stripped from TEXT, which is what keeps extraction fast.
+  A start tag of any other element still comes through when it carries
+  an id attribute, so fragment targets are never lost
+Used by site_corpus.parse_page; see bench_extract.py for the comparison
+with the old per-field regexes.
+"""
+from __future__ import annotations
+from html import unescape
+import re
+from typing import (Dict, FrozenSet, Iterable, Iterator, NamedTuple, Optional,
+                    Tuple)
+
+import instrument
+
+START, END, TEXT, COMMENT = 'start', 'end', 'text', 'comment'
+RAW_TEXT = {'script', 'style', 'textarea', 'title'}
+
+# the inside of a tag after its name: quoted values may hold '>' but no '<'
+ATTRS = r'''(?:[^<>"']|"[^<"]*"|'[^<']*')*'''
+TOKEN = r'''
+    <!--(.*?)(?:-->|\Z)                                 # 1: comment
+  | <(/?)(%s)(''' + ATTRS + r''')>                     # 2,3,4: tag
+  | <[!?][^<>]*>                                        # doctype, PI
+'''
+RE_TOKEN = re.compile(TOKEN % r'[A-Za-z][^\s/<>]*', re.S | re.X)
+RE_TAGS = re.compile('<' + ATTRS + '>')
+RE_ATTR = re.compile(
+    r'([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+_RAW_END: Dict[str, re.Pattern] = {
+    tag: re.compile(r'</%s\s*>' % tag, re.I) for tag in RAW_TEXT}
+# any other start tag, but only if one of its attributes is id=
+ID_TAG = r'[A-Za-z][^\s/<>]*(?=(?:[^<>"\']|"[^<"]*"|\'[^<\']*\')*?\sid\s*=)'
+_FILTERED: Dict[FrozenSet[str], re.Pattern] = {}
+
+
+class Event(NamedTuple):
+    kind: str
+    tag: str = ''
+    attrs: Optional[Dict[str, str]] = None
+    data: str = ''
+
+
+def parse_attrs(raw: str) -> Dict[str, str]:
+    attrs: Dict[str, str] = {}
+    # a valueless attribute and an empty value both come out as ''
+    for name, dq, sq, bare in RE_ATTR.findall(raw):
+        name = name.lower()
+        if name not in attrs:
+            value = dq or sq or bare
+            attrs[name] = unescape(value) if '&' in value else value
+    return attrs
+
+
+def attr_spans(raw: str) -> Iterator[Tuple[str, int, int, str]]:
+    """(name, start, end, value) for every attribute in raw, in source
+    order: raw[start:end] is the value as written (without quotes; empty
+    at the name's end when valueless), value is decoded as in
+    parse_attrs. For rewriting a value in place."""
+    for m in RE_ATTR.finditer(raw):
+        group = next((g for g in (2, 3, 4) if m.group(g) is not None), None)
+        start, end = m.span(group) if group else (m.end(), m.end())
+        value = raw[start:end]
+        yield m.group(1).lower(), start, end, unescape(value) if '&' in value else value
+
+
+def _token_re(tags: Optional[Iterable[str]]) -> re.Pattern:
+    if tags is None:
+        return RE_TOKEN
+    key = frozenset(tags) | RAW_TEXT
+    pattern = _FILTERED.get(key)
+    if pattern is None:
+        names = '|'.join(sorted(key, key=len, reverse=True))
+        pattern = _FILTERED[key] = re.compile(
+            TOKEN % r'(?:%s)(?=[\s/>])|%s' % (names, ID_TAG), re.S | re.X | re.I)
+    return pattern
+
+
+def iter_events(html: str, tags: Optional[Iterable[str]] = None) -> Iterator[Event]:
+    """Events in document order; see the module docstring for tags."""
+    search = _token_re(tags).search
+    strip = tags is not None
+    new = tuple.__new__
+    pos = 0
+    n = len(html)
+    matches = 0  # tokens the pattern matched, for instrument counters
+    try:
+        while pos < n:
+            m = search(html, pos)
+            stop = n if m is None else m.start()
+            if stop > pos:
+                data = html[pos:stop]
+                if strip and '<' in data:
+                    data = RE_TAGS.sub('', data)
+                if '&' in data:
+                    data = unescape(data)
+                if data:
+                    yield new(Event, (TEXT, '', None, data))
+            if m is None:
+                return
+            pos = m.end()
+            matches += 1
+            comment, slash, name, raw = m.groups()
+            if comment is not None:
+                yield new(Event, (COMMENT, '', None, comment))
+                continue
+            if name is None:
+                continue  # doctype / processing instruction
+            tag = name.lower()
+            if slash:
+                yield new(Event, (END, tag, None, ''))
+                continue
+            yield new(Event, (START, tag, parse_attrs(raw), ''))
+            if tag in RAW_TEXT:
+                end = _RAW_END[tag].search(html, pos)
+                stop = end.start() if end else n
+                if stop > pos:
+                    data = html[pos:stop]
+                    # script/style content is never entity-decoded
+                    if tag not in ('script', 'style') and '&' in data:
+                        data = unescape(data)
+                    yield new(Event, (TEXT, '', None, data))
+                if end is None:
+                    return
+                yield new(Event, (END, tag, None, ''))
+                pos = end.end()
+    finally:
+        instrument.count('regex_matches', matches)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Index images/ and report duplicate and placeholder files.
+- Every source image gets a content hash (sha1) and, with Pillow, a 64-bit
+  perceptual dHash; both are cached in .cache/image-index.json by size/mtime
+- Reports byte-identical groups, perceptually near-identical groups
+  (Hamming distance <= --distance), and copies of the placeholder
+  (create_missing_image_placeholders.py copies shu-logo.webp) that pages,
+  CSS, JS or JSON still reference
+- --rewrite points <img src>/srcset in the HTML at one canonical file per
+  byte-identical group (the placeholder itself, else the most referenced
+  file); --prune then deletes duplicates nothing references any more
+Responsive variants (<name>-<w>w.webp) are derived files and not indexed.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from html_events import parse_attrs
+from optimize_images import (Image, RE_IMG_TAG, iter_sources, resolve_src,
+                             set_attr)
+from site_corpus import ROOT, iter_html_files, scan_tree
+
+INDEX_PATH = ROOT / '.cache' / 'image-index.json'
+PLACEHOLDER = 'images/shu-logo.webp'
+TEXT_EXTS = ('.html', '.css', '.js', '.json', '.xml', '.webmanifest')
+DISTANCE = 4
+RE_VARIANT_PATH = re.compile(r'(.*)(-\d+w\.webp)')
+
+
+def dhash(path: Path) -> Optional[str]:
+    """64-bit difference hash as 16 hex digits (None without Pillow)."""
+    if Image is None:
+        return None
+    with Image.open(path) as im:
+        px = list(im.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f'{bits:016x}'
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def build_index(root: Path = ROOT) -> Dict[str, dict]:
+    """rel -> {stamp, size, sha, phash}, rehashing only changed files."""
+    try:
+        old = json.loads(INDEX_PATH.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        old = {}
+    index = {}
+    for rel in iter_sources(root):
+        st = os.stat(root / rel)
+        stamp = [st.st_size, st.st_mtime_ns]
+        entry = old.get(rel)
+        if (entry is None or entry['stamp'] != stamp
+                or (entry['phash'] is None and Image is not None)):
+            data = (root / rel).read_bytes()
+            entry = {'stamp': stamp, 'size': len(data),
+                     'sha': hashlib.sha1(data).hexdigest(),
+                     'phash': dhash(root / rel)}
+        index[rel] = entry
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    INDEX_PATH.write_text(json.dumps(index, indent=1, sort_keys=True),
+                          encoding='utf-8')
+    return index
+
+
+def count_references(root: Path, rels: Sequence[str]) -> Dict[str, List[str]]:
+    """rel -> text files (html/css/js/json/xml) that mention its path."""
+    refs: Dict[str, List[str]] = {rel: [] for rel in rels}
+    _, files = scan_tree(root)
+    for doc in sorted(files):
+        if not doc.endswith(TEXT_EXTS) or doc.startswith('scripts/'):
+            continue
+        text = (root / doc).read_text(encoding='utf-8', errors='ignore')
+        if 'images/' not in text:
+            continue
+        for rel in rels:
+            if rel in text:
+                refs[rel].append(doc)
+    return refs
+
+
+def exact_groups(index: Dict[str, dict]) -> List[List[str]]:
+    by_sha: Dict[str, List[str]] = {}
+    for rel, entry in index.items():
+        by_sha.setdefault(entry['sha'], []).append(rel)
+    return sorted(g for g in by_sha.values() if len(g) > 1)
+
+
+def near_groups(index: Dict[str, dict], distance: int) -> List[List[str]]:
+    """Groups of distinct files whose dHashes are within distance."""
+    reps: Dict[str, str] = {}  # one file per content hash
+    for rel, entry in sorted(index.items()):
+        if entry['phash'] is not None:
+            reps.setdefault(entry['sha'], rel)
+    items = sorted(reps.values())
+    parent = {rel: rel for rel in items}
+
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, a in enumerate(items):
+        for b in items[i + 1:]:
+            if hamming(index[a]['phash'], index[b]['phash']) <= distance:
+                parent[find(b)] = find(a)
+    groups: Dict[str, List[str]] = {}
+    for rel in items:
+        groups.setdefault(find(rel), []).append(rel)
+    return sorted(g for g in groups.values() if len(g) > 1)
+
+
+def pick_canonical(group: Sequence[str], refs: Dict[str, List[str]]) -> str:
+    if PLACEHOLDER in group:
+        return PLACEHOLDER
+    return min(group, key=lambda rel: (-len(refs[rel]), len(rel), rel))
+
+
+def rewrite_references(root: Path, mapping: Dict[str, str]) -> List[str]:
+    """Point <img src>/srcset at mapping[dup] (and its variants)."""
+    # stem -> stem, so images/dup-480w.webp maps to images/canon-480w.webp
+    variants = {posixpath.splitext(dup)[0]: posixpath.splitext(canon)[0]
+                for dup, canon in mapping.items()}
+
+    def target(page_rel: str, url: str) -> Optional[str]:
+        path = resolve_src(page_rel, url)
+        if path is None:
+            return None
+        if path in mapping:
+            new = mapping[path]
+        else:
+            m = RE_VARIANT_PATH.fullmatch(path)
+            if not m or m.group(1) not in variants:
+                return None
+            new = variants[m.group(1)] + m.group(2)
+        if url.startswith('/'):
+            return '/' + new
+        return posixpath.relpath(new, posixpath.dirname(page_rel) or '.')
+
+    def fix_tag(tag: str, page_rel: str) -> str:
+        attrs = parse_attrs(tag[4:-1])
+        new = target(page_rel, attrs.get('src', ''))
+        if new:
+            tag = set_attr(tag, 'src', new)
+        if attrs.get('srcset'):
+            parts = []
+            for cand in attrs['srcset'].split(','):
+                url, _, desc = cand.strip().partition(' ')
+                parts.append(' '.join(filter(None, [target(page_rel, url) or url,
+                                                    desc])))
+            srcset = ', '.join(parts)
+            if srcset != attrs['srcset']:
+                tag = set_attr(tag, 'srcset', srcset)
+        return tag
+
+    changed = []
+    for rel in iter_html_files(root):
+        path = root / rel
+        html = path.read_text(encoding='utf-8')
+        new = RE_IMG_TAG.sub(lambda m: fix_tag(m.group(0), rel), html)
+        if new != html:
+            path.write_text(new, encoding='utf-8')
+            changed.append(rel)
+    return changed
+
+
+def prune(root: Path, dups: Sequence[str], refs: Dict[str, List[str]]) -> int:
+    removed = 0
+    for rel in dups:
+        if refs[rel]:
+            continue
+        path = root / rel
+        own = re.compile(re.escape(path.stem) + r'-\d+w\.webp')
+        for variant in path.parent.iterdir():
+            if own.fullmatch(variant.name):
+                variant.unlink()
+        path.unlink()
+        removed += 1
+    return removed
+
+
+def fmt_size(n: int) -> str:
+    return f'{n / 1024:.1f} KB'
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--distance', type=int, default=DISTANCE,
+                    help=f'max dHash bit difference for near-duplicates '
+                         f'(default {DISTANCE})')
+    ap.add_argument('--rewrite', action='store_true',
+                    help='point HTML <img> references at the canonical file')
+    ap.add_argument('--prune', action='store_true',
+                    help='with --rewrite: delete duplicates left unreferenced')
+    ap.add_argument('--json', action='store_true',
+                    help='print the index and groups as JSON')
+    args = ap.parse_args(argv)
+
+    index = build_index(ROOT)
+    refs = count_references(ROOT, list(index))
+    exact = exact_groups(index)
+    near = near_groups(index, args.distance) if Image is not None else []
+    placeholder_sha = index.get(PLACEHOLDER, {}).get('sha')
+    placeholders = sorted(rel for rel, e in index.items()
+                          if e['sha'] == placeholder_sha and rel != PLACEHOLDER)
+
+    if args.json:
+        print(json.dumps({'index': index, 'exact': exact, 'near': near,
+                          'placeholders': placeholders,
+                          'references': refs}, indent=2, sort_keys=True))
+        return 0
+
+    total = sum(e['size'] for e in index.values())
+    wasted = sum(index[rel]['size'] for g in exact for rel in g[1:])
+    print(f"Indexed {len(index)} images ({fmt_size(total)}); "
+          f"{len(exact)} byte-identical groups, {fmt_size(wasted)} duplicated")
+    for group in exact:
+        canon = pick_canonical(group, refs)
+        print(f"  = {canon} ({fmt_size(index[canon]['size'])}, "
+              f"{len(group)} copies)")
+        for rel in group:
+            if rel != canon:
+                print(f"      {rel}  [{len(refs[rel])} refs]")
+    if Image is None:
+        print("Perceptual hashes skipped: Pillow is not installed "
+              "(pip install Pillow).")
+    else:
+        print(f"{len(near)} near-identical groups (distance <= {args.distance})")
+        for group in near:
+            print('  ~ ' + ', '.join(group))
+    live = [rel for rel in placeholders if refs[rel]]
+    print(f"{len(placeholders)} placeholder copies of {PLACEHOLDER}, "
+          f"{len(live)} still referenced")
+    for rel in live:
+        print(f"  ! {rel}: {', '.join(refs[rel])}")
+
+    if args.rewrite:
+        mapping = {}
+        for group in exact:
+            canon = pick_canonical(group, refs)
+            mapping.update((rel, canon) for rel in group if rel != canon)
+        for rel in rewrite_references(ROOT, mapping):
+            print(f"Rewrote references: {rel}")
+        if args.prune:
+            refs = count_references(ROOT, list(mapping))
+            print(f"Removed {prune(ROOT, list(mapping), refs)} "
+                  f"unreferenced duplicates")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
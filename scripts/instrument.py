@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Shared instrumentation for the scripts/ tools.
+- count(name, n): named counters (files_scanned, files_read, bytes_read,
+  bytes_written, regex_matches, path_lookups, ...); always on, they are
+  plain dict updates
+- span(name, cat, **args): times a block (discovery, a file's parse, a
+  check, a write) as a Chrome trace event; free unless tracing
+- run(main) wraps a script's main() and adds three flags, stripped from
+  sys.argv before main() sees them:
+    --stats          print the counters (and os.path.exists/os.stat calls)
+    --profile        cProfile + tracemalloc: top functions, peak memory and
+                     top allocation sites; stats saved to .cache/profile/
+    --trace [FILE]   write a Chrome trace-event JSON (open it in
+                     chrome://tracing or ui.perfetto.dev); default
+                     .cache/trace/<script>.json
+Work done in --jobs worker processes is not captured; use --jobs 1.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+PROFILE_DIR = ROOT / '.cache' / 'profile'
+TRACE_DIR = ROOT / '.cache' / 'trace'
+
+COUNTERS: Dict[str, int] = {}
+EVENTS: List[dict] = []
+TRACING = False
+_T0 = time.perf_counter_ns()
+
+
+def count(name: str, n: int = 1) -> None:
+    COUNTERS[name] = COUNTERS.get(name, 0) + n
+
+
+@contextmanager
+def span(name: str, cat: str = 'phase', **args) -> Iterator[None]:
+    """Record the block as a complete ('X') trace event when tracing."""
+    if not TRACING:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        EVENTS.append({
+            'name': name, 'cat': cat, 'ph': 'X',
+            'ts': (start - _T0) / 1000, 'dur': (end - start) / 1000,
+            'pid': os.getpid(), 'tid': threading.get_ident(),
+            'args': args,
+        })
+
+
+def _count_calls(module, attr: str, counter: str) -> None:
+    """Wrap module.attr so every call bumps counter."""
+    original = getattr(module, attr)
+    COUNTERS.setdefault(counter, 0)
+
+    def wrapper(*args, **kwargs):
+        COUNTERS[counter] = COUNTERS.get(counter, 0) + 1
+        return original(*args, **kwargs)
+    setattr(module, attr, wrapper)
+
+
+def write_trace(path: Path, name: str) -> None:
+    now = (time.perf_counter_ns() - _T0) / 1000
+    events = [
+        {'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+         'args': {'name': name}},
+        *EVENTS,
+        {'name': 'counters', 'ph': 'C', 'ts': now, 'pid': os.getpid(),
+         'args': dict(COUNTERS)},
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}),
+                    encoding='utf-8')
+
+
+def print_counters() -> None:
+    print('Counters:')
+    for key in sorted(COUNTERS):
+        print(f"  {key:<18} {COUNTERS[key]:>12,}")
+
+
+def print_memory(snapshot, peak: int, limit: int = 10) -> None:
+    print(f"Peak traced memory: {peak / 2**20:.1f} MB; top allocation sites:")
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        where = os.path.relpath(frame.filename, ROOT) \
+            if frame.filename.startswith(str(ROOT)) else frame.filename
+        print(f"  {stat.size / 1024:10.1f} KB  {stat.count:>8} blocks  "
+              f"{where}:{frame.lineno}")
+
+
+def run(main: Callable[..., Optional[int]], name: Optional[str] = None) -> Optional[int]:
+    """Call main() with --stats/--profile/--trace handled around it."""
+    global TRACING
+    name = name or Path(sys.argv[0]).stem
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument('--stats', action='store_true')
+    ap.add_argument('--profile', action='store_true')
+    ap.add_argument('--trace', nargs='?', type=Path, const=TRACE_DIR / f'{name}.json')
+    opts, rest = ap.parse_known_args(sys.argv[1:])
+    sys.argv[1:] = rest
+    if not (opts.stats or opts.profile or opts.trace):
+        return main()
+
+    _count_calls(os.path, 'exists', 'os_path_exists')
+    _count_calls(os, 'stat', 'os_stat')
+    TRACING = opts.trace is not None
+    profiler = None
+    if opts.profile:
+        import cProfile
+        import tracemalloc
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    result = None
+    try:
+        with span(name, 'script'):
+            result = main()
+    except SystemExit as exc:
+        result = exc.code
+    finally:
+        print()
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            out = PROFILE_DIR / f'{name}.prof'
+            profiler.dump_stats(out)
+            print(f"Profile ({out.relative_to(ROOT)}), by cumulative time:")
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative') \
+                .print_stats(15)
+            print_memory(snapshot, peak)
+        print_counters()
+        if opts.trace is not None:
+            write_trace(opts.trace, name)
+            print(f"Trace: {opts.trace} ({len(EVENTS)} spans)")
+    return result
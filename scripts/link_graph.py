@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Site link graph: page -> outgoing links/images, plus the reverse index.
+- Built from the parsed pages in the corpus cache (only pages changed
+  since the last run are re-parsed) and one walk of the tree, kept as an
+  in-memory set of existing paths: no os.path.exists per href
+- Per-page edges and fragment ids are cached by content hash in
+  .cache/link-graph.pickle, so an unchanged tree rebuilds the graph
+  without touching page records
+- js/news-manifest.json counts as a referrer of every news page it lists
+  (those pages are only linked from JavaScript)
+- Queries: who links to X, what breaks if X is deleted (with redirect
+  candidates), orphan pages (not reachable from ENTRY_POINTS), broken
+  targets and #fragments that no id/name on the target page defines
+
+Usage: python3 scripts/link_graph.py [--who PATH] [--delete PATH]
+       [--orphans] [--broken] [--anchors] [--json]
+"""
+from __future__ import annotations
+import argparse
+import difflib
+import json
+import os
+import pickle
+import posixpath
+import sys
+import time
+from urllib.parse import unquote
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import instrument
+from corpus_cache import CorpusCache
+from news_store import MANIFEST, NewsStore, site_path
+from site_corpus import ROOT, SITE_ORIGIN, Page, is_top_level_page
+
+GRAPH_VERSION = 2
+GRAPH_CACHE = ROOT / '.cache' / 'link-graph.pickle'
+MANIFEST_REL = MANIFEST.relative_to(ROOT).as_posix()
+ENTRY_POINTS = ('index.html', '404.html', 'offline.html', MANIFEST_REL)
+# fragments browsers resolve without a matching id
+IMPLICIT_FRAGMENTS = {'', 'top'}
+EXTERNAL = ('http:', 'https:', '//', 'mailto:', 'tel:', 'javascript:', 'data:')
+
+
+class Edge(NamedTuple):
+    source: str    # repo-relative page (or the news manifest)
+    kind: str      # 'link', 'image' or 'manifest'
+    url: str       # as written
+    target: str    # repo-relative path it resolves to
+    fragment: str  # without '#', '' if none
+
+
+def resolve(page_rel: str, url: str) -> Optional[Tuple[str, str]]:
+    """href/src on page_rel -> (repo-relative target, fragment), or None
+    for external URLs. '#x' targets the page itself; 'dir/' means
+    dir/index.html."""
+    if url.startswith(SITE_ORIGIN):
+        url = url[len(SITE_ORIGIN):] or '/'
+    elif not url or url.startswith(EXTERNAL):
+        return None
+    url, _, fragment = url.partition('#')
+    url = url.split('?', 1)[0]
+    if not url:
+        return page_rel, fragment
+    if url.startswith('/'):
+        target = url.lstrip('/')
+    else:
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(page_rel), url))
+    if target in ('', '.'):
+        target = 'index.html'
+    elif url.endswith('/'):
+        target += '/index.html'
+    return target, fragment
+
+
+def fragment_missing(edge: Edge, ids: Optional[Set[str]]) -> bool:
+    """True if edge is a link whose #fragment is not among ids, the
+    target's id/name set (None: target is not a parsed page)."""
+    return (ids is not None and edge.kind == 'link'
+            and edge.fragment not in IMPLICIT_FRAGMENTS
+            and unquote(edge.fragment) not in ids)
+
+
+def page_edges(page: Page) -> List[Edge]:
+    """Internal <a href> and <img src> of one page, in document order."""
+    edges: List[Edge] = []
+    for attrs, _ in page.anchors:
+        href = attrs.get('href', '')
+        hit = resolve(page.rel, href)
+        if hit:
+            edges.append(Edge(page.rel, 'link', href, *hit))
+    for attrs in page.imgs:
+        src = attrs.get('src', '')
+        hit = resolve(page.rel, src)
+        if hit:
+            edges.append(Edge(page.rel, 'image', src, *hit))
+    return edges
+
+
+def manifest_edges(store: NewsStore) -> List[Edge]:
+    return [Edge(MANIFEST_REL, 'manifest', item['url'], site_path(item['url']), '')
+            for item in store if item.get('url')]
+
+
+class LinkGraph:
+    """Forward and reverse edges over a set of existing paths; pages can
+    be added, replaced and removed one at a time."""
+
+    def __init__(self, exists: Set[str]):
+        self.exists = exists
+        self.out: Dict[str, List[Edge]] = {}
+        self.ids: Dict[str, Set[str]] = {}
+        self.inbound: Dict[str, Dict[str, List[Edge]]] = {}
+
+    def set_page(self, rel: str, edges: List[Edge],
+                 ids: Optional[Iterable[str]] = None) -> None:
+        """ids: the page's id/name attributes (None for non-HTML sources)."""
+        self.remove_page(rel)
+        self.out[rel] = edges
+        if ids is not None:
+            self.ids[rel] = set(ids)
+        for edge in edges:
+            self.inbound.setdefault(edge.target, {}).setdefault(rel, []).append(edge)
+
+    def remove_page(self, rel: str) -> None:
+        for edge in self.out.pop(rel, ()):
+            sources = self.inbound.get(edge.target)
+            if sources is not None and sources.pop(rel, None) is not None \
+                    and not sources:
+                del self.inbound[edge.target]
+        self.ids.pop(rel, None)
+
+    # -- queries ---------------------------------------------------------
+
+    def links_to(self, target: str) -> List[Edge]:
+        """Every edge pointing at target, by source page."""
+        sources = self.inbound.get(target, {})
+        return [e for rel in sorted(sources) for e in sources[rel]]
+
+    def impact(self, target: str) -> List[Edge]:
+        """Edges that would break if target were deleted (links from the
+        page to itself do not count)."""
+        return [e for e in self.links_to(target) if e.source != target]
+
+    def broken(self) -> List[Edge]:
+        return [e for rel in sorted(self.out) for e in self.out[rel]
+                if e.target not in self.exists]
+
+    def bad_fragments(self) -> List[Edge]:
+        """Links whose #fragment is not an id/name on an existing target."""
+        return [e for rel in sorted(self.out) for e in self.out[rel]
+                if fragment_missing(e, self.ids.get(e.target))]
+
+    def reachable(self, entry: Sequence[str] = ENTRY_POINTS) -> Set[str]:
+        seen = {rel for rel in entry if rel in self.out}
+        todo = list(seen)
+        while todo:
+            for edge in self.out.get(todo.pop(), ()):
+                if edge.kind != 'image' and edge.target not in seen \
+                        and edge.target in self.out:
+                    seen.add(edge.target)
+                    todo.append(edge.target)
+        return seen
+
+    def orphans(self, entry: Sequence[str] = ENTRY_POINTS) -> List[str]:
+        """Site pages no link path from the entry points reaches."""
+        seen = self.reachable(entry)
+        return sorted(rel for rel in self.out
+                      if is_top_level_page(rel) and rel not in seen)
+
+    def redirect_candidates(self, target: str, limit: int = 3) -> List[str]:
+        """Existing pages a link to (missing or deleted) target could be
+        pointed at: same file name elsewhere first, then similar paths."""
+        ext = posixpath.splitext(target)[1]
+        pool = sorted(p for p in self.exists
+                      if p != target and posixpath.splitext(p)[1] == ext)
+        name = posixpath.basename(target)
+        same = [p for p in pool if posixpath.basename(p) == name]
+        close = difflib.get_close_matches(target, pool, n=limit, cutoff=0.6)
+        return list(dict.fromkeys(same + close))[:limit]
+
+
+# -- building and caching -------------------------------------------------
+
+def load_graph(jobs: int = 1) -> LinkGraph:
+    """Graph of the current tree, re-deriving edges only for pages whose
+    content hash changed since the last call."""
+    cache = CorpusCache()
+    pages = cache.load_pages(jobs=jobs)
+    try:
+        with open(GRAPH_CACHE, 'rb') as f:
+            stored = pickle.load(f)
+    except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+        stored = {}
+    if stored.get('version') != GRAPH_VERSION:
+        stored = {}
+    old: Dict[str, tuple] = stored.get('pages', {})
+    graph = LinkGraph(cache.tree)
+    entries: Dict[str, tuple] = {}
+    for page in pages:
+        sha = cache.files[page.rel]['sha']
+        hit = old.get(page.rel)
+        if hit is None or hit[0] != sha:
+            # plain tuples: Edge pickles as __main__.Edge when run as a script
+            hit = (sha, [tuple(e) for e in page_edges(page)], page.ids)
+        entries[page.rel] = hit
+        graph.set_page(page.rel, [Edge._make(e) for e in hit[1]], hit[2])
+    graph.set_page(MANIFEST_REL, manifest_edges(NewsStore.load()))
+    if entries != old:
+        GRAPH_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = GRAPH_CACHE.with_suffix('.tmp')
+        with instrument.span('save graph', 'write'), open(tmp, 'wb') as f:
+            pickle.dump({'version': GRAPH_VERSION, 'pages': entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            instrument.count('bytes_written', f.tell())
+        os.replace(tmp, GRAPH_CACHE)
+    return graph
+
+
+def describe(edge: Edge) -> str:
+    return f"{edge.source}: {edge.kind} -> {edge.url}"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--who', metavar='PATH', help='list what links to PATH')
+    ap.add_argument('--delete', metavar='PATH',
+                    help='what would break if PATH were deleted')
+    ap.add_argument('--orphans', action='store_true', help='list orphan pages')
+    ap.add_argument('--broken', action='store_true', help='list broken targets')
+    ap.add_argument('--anchors', action='store_true',
+                    help='list #fragments with no matching id/name')
+    ap.add_argument('--json', action='store_true', help='machine-readable output')
+    ap.add_argument('--jobs', type=int, default=1,
+                    help='processes for re-parsing changed pages')
+    args = ap.parse_args(argv)
+
+    t = time.perf_counter()
+    graph = load_graph(args.jobs)
+    built = time.perf_counter() - t
+    t = time.perf_counter()
+    result: Dict[str, object] = {}
+    if args.who:
+        result['links_to'] = graph.links_to(args.who.lstrip('/'))
+    if args.delete:
+        rel = args.delete.lstrip('/')
+        result['impact'] = graph.impact(rel)
+        result['redirect_candidates'] = graph.redirect_candidates(rel)
+    if args.orphans:
+        result['orphans'] = graph.orphans()
+    if args.broken:
+        result['broken'] = graph.broken()
+    if args.anchors:
+        result['bad_fragments'] = graph.bad_fragments()
+    queried = time.perf_counter() - t
+
+    if args.json:
+        print(json.dumps({k: [e._asdict() if isinstance(e, Edge) else e for e in v]
+                          for k, v in result.items()}, indent=2, ensure_ascii=False))
+        return 0
+    edges = sum(len(e) for e in graph.out.values())
+    print(f"Link graph: {len(graph.out)} sources, {edges} edges, "
+          f"{len(graph.inbound)} targets ({built * 1000:.1f} ms to load)")
+    titles = {
+        'links_to': f"Linking to {args.who}",
+        'impact': f"Would break if {args.delete} were deleted",
+        'redirect_candidates': 'Redirect candidates',
+        'orphans': f"Orphan pages (not reachable from {', '.join(ENTRY_POINTS)})",
+        'broken': 'Broken targets',
+        'bad_fragments': 'Fragments with no matching id/name',
+    }
+    for key, items in result.items():
+        print(f"{titles[key]}: {len(items)}")
+        for item in items:
+            print(' -', describe(item) if isinstance(item, Edge) else item)
+    if result:
+        print(f"Queries: {queried * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
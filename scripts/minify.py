@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Conservative HTML/CSS/JS minifiers and precompressed siblings.
+- HTML: drops comments, collapses whitespace in text (none at all next
+  to block-level tags, or between tags inside <head>; inline elements
+  such as <button> or <br> keep their one space), tidies the whitespace
+  between attributes and inside style="", minifies inline <style> and
+  classic <script>; other attribute values, <pre>, <textarea> and non-JS
+  scripts (JSON-LD) stay verbatim. Tags are split with the quote-aware
+  pattern html_events uses, so '>' inside alt="a > b" is fine
+- CSS: drops comments and the whitespace around { } ; , > and after : in
+  declarations
+- JS: drops comments, indentation and blank lines; line breaks are kept,
+  so automatic semicolon insertion behaves exactly as before
+- compress(): .gz (and .br with the optional brotli module) next to each
+  text asset, skipped when they would not be smaller
+Used by build.py --minify on deploy_bundle/site/ so sources stay readable.
+Run directly for a before/after report over the tree without writing.
+"""
+from __future__ import annotations
+from pathlib import Path
+import gzip
+import re
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from html_events import ATTRS, parse_attrs
+from site_corpus import ROOT, scan_tree
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped without it
+    brotli = None
+
+COMPRESS_EXTS = ('.html', '.css', '.js', '.json', '.xml', '.svg', '.txt',
+                 '.webmanifest')
+# whitespace next to these never renders (display: block and friends)
+BLOCK_TAGS = frozenset((
+    'html head body address article aside blockquote caption col colgroup '
+    'dd details dialog div dl dt fieldset figcaption figure footer form '
+    'h1 h2 h3 h4 h5 h6 header hr legend li main nav ol p pre section '
+    'summary table tbody td tfoot th thead tr ul !doctype').split())
+JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+RE_RAW = re.compile(r'(<(pre|textarea|script|style)\b%s>)(.*?)(</\2\s*>)' % ATTRS,
+                    re.I | re.S)
+RE_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+RE_TAG = re.compile(r'<(/?)([A-Za-z!][^\s/<>"\'\x00]*)%s>' % ATTRS)
+RE_SPACE = re.compile(r'[ \t\n\r\f]+')  # HTML whitespace; not U+00A0
+RE_QUOTED = re.compile(r'''("[^"]*"|'[^']*')''')
+RE_STYLE_NAME = re.compile(r'\sstyle\s*=\s*\Z', re.I)
+RE_TAG_END = re.compile(r' (/?>)\Z')
+RE_UNQUOTED_VALUE = re.compile(r'=[^\s"\'=<>`]+\Z')
+RE_PLACEHOLDER = re.compile('<[a-z]+\x00(\\d+)\x00>')
+
+RE_CSS_TOKEN = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+RE_CSS_PUNCT = re.compile(r'\s*([{};,>])\s*')
+RE_CSS_COLON = re.compile(r':\s+')
+RE_CSS_LAST_SEMI = re.compile(r';}')
+
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = ('return', 'typeof', 'instanceof', 'in', 'of', 'new',
+                  'delete', 'void', 'throw', 'case', 'do', 'else', 'yield',
+                  'await')
+
+
+# -- CSS -------------------------------------------------------------------
+
+def minify_css(css: str) -> str:
+    out: List[str] = []
+    depth = 0
+    pos = 0
+    for m in RE_CSS_TOKEN.finditer(css):
+        out.append(_css_chunk(css[pos:m.start()], depth))
+        depth += css.count('{', pos, m.start()) - css.count('}', pos, m.start())
+        if m.group(1):
+            out.append(m.group(1))
+        pos = m.end()
+    out.append(_css_chunk(css[pos:], depth))
+    text = ''.join(out)
+    return RE_CSS_LAST_SEMI.sub('}', text).strip()
+
+
+def _css_chunk(chunk: str, depth: int) -> str:
+    """Minify a string-free stretch of CSS starting at brace depth."""
+    chunk = re.sub(r'\s+', ' ', chunk)
+    chunk = RE_CSS_PUNCT.sub(r'\1', chunk)
+    # 'a :hover' != 'a:hover', so only tighten colons inside declarations;
+    # walk the braces to know where those are
+    parts = re.split(r'([{}])', chunk)
+    for i, part in enumerate(parts):
+        if part == '{':
+            depth += 1
+        elif part == '}':
+            depth -= 1
+        elif depth > 0 and ':' in part and '{' not in part:
+            # a nested rule's selector (in @media) is followed by '{'
+            following = parts[i + 1] if i + 1 < len(parts) else ''
+            if following != '{':
+                parts[i] = RE_CSS_COLON.sub(':', part)
+    return ''.join(parts)
+
+
+# -- JS --------------------------------------------------------------------
+
+def minify_js(js: str) -> str:
+    out: List[str] = []
+    i, n = 0, len(js)
+    last = ''  # last significant character emitted (for regex detection)
+    word = ''  # identifier that ends right before i
+    while i < n:
+        ch = js[i]
+        nxt = js[i + 1] if i + 1 < n else ''
+        if ch in '"\'`':
+            j = i + 1
+            while j < n and js[j] != ch:
+                j += 2 if js[j] == '\\' else 1
+            out.append(js[i:j + 1])
+            i, last, word = j + 1, ch, ''
+        elif ch == '/' and nxt == '/':
+            while i < n and js[i] != '\n':
+                i += 1
+        elif ch == '/' and nxt == '*':
+            end = js.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            if out and out[-1] not in (' ', '\n'):
+                out.append(' ')
+        elif ch == '/' and (not last or last in REGEX_PRECEDERS
+                            or word in REGEX_KEYWORDS):
+            j, in_class = i + 1, False
+            while j < n and js[j] != '\n':
+                c = js[j]
+                if c == '\\':
+                    j += 1
+                elif c == '[':
+                    in_class = True
+                elif c == ']':
+                    in_class = False
+                elif c == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and (js[j].isalnum() or js[j] == '_'):
+                j += 1  # flags
+            out.append(js[i:j])
+            i, last, word = j, '/', ''
+        elif ch.isspace():
+            j = i
+            while j < n and js[j].isspace():
+                j += 1
+            gap = '\n' if '\n' in js[i:j] else ' '
+            if out and out[-1] in (' ', '\n'):
+                # merge with the gap a dropped comment left behind
+                if gap == '\n':
+                    out[-1] = gap
+            else:
+                out.append(gap)
+            i = j
+        else:
+            j = i
+            while j < n and (js[j].isalnum() or js[j] in '_$'):
+                j += 1
+            if j > i:
+                word = js[i:j]
+                out.append(word)
+                last, i = js[j - 1], j
+            else:
+                out.append(ch)
+                last, word, i = ch, '', i + 1
+    return ''.join(out).strip()
+
+
+# -- HTML ------------------------------------------------------------------
+
+def _tidy_style(css: str) -> str:
+    css = RE_SPACE.sub(' ', css.strip())
+    return re.sub(r'\s*([;:,])\s*', r'\1', css).rstrip(';')
+
+
+def _tidy_tag(tag: str) -> str:
+    """Collapse whitespace between attributes and tidy style=""; every
+    other quoted value is left exactly as written."""
+    parts = RE_QUOTED.split(tag)  # odd items are quoted values
+    for i in range(0, len(parts), 2):
+        parts[i] = RE_SPACE.sub(' ', parts[i])
+    m = RE_TAG_END.search(parts[-1])
+    # <img src=a /> must keep its space: src=a/ would be the value
+    if m and not (m.group(1) == '/>'
+                  and RE_UNQUOTED_VALUE.search(parts[-1], 0, m.start())):
+        parts[-1] = parts[-1][:m.start()] + m.group(1)
+    for i in range(1, len(parts), 2):
+        if RE_STYLE_NAME.search(parts[i - 1]):
+            quote = parts[i][0]
+            parts[i] = quote + _tidy_style(parts[i][1:-1]) + quote
+    return ''.join(parts)
+
+
+def _raw_block(m: re.Match) -> str:
+    open_tag, name, body, close = m.groups()
+    name = name.lower()
+    if name == 'style':
+        body = minify_css(body)
+    elif name == 'script':
+        kind = parse_attrs(open_tag[len(name) + 1:-1]).get('type', '')
+        if kind.strip().lower() in JS_TYPES:
+            body = minify_js(body)
+    return _tidy_tag(open_tag) + body + close
+
+
+def minify_html(html: str) -> str:
+    raw: List[str] = []
+
+    def stash(m: re.Match) -> str:
+        # the placeholder keeps the tag name, so the whitespace rules
+        # below treat it like the element it stands for
+        raw.append(_raw_block(m))
+        return f'<{m.group(2).lower()}\x00{len(raw) - 1}\x00>'
+
+    html = RE_COMMENT.sub('', RE_RAW.sub(stash, html))
+    out: List[str] = []
+    after_block = True  # leading whitespace of the document goes
+    in_head = False
+    pos = 0
+    for m in RE_TAG.finditer(html):
+        slash, name = m.group(1), m.group(2).lower()
+        block = in_head or name in BLOCK_TAGS
+        text = RE_SPACE.sub(' ', html[pos:m.start()])
+        if after_block:
+            text = text.lstrip(' ')
+        if block:
+            text = text.rstrip(' ')
+        out.append(text)
+        out.append(_tidy_tag(m.group(0)))
+        after_block = block
+        if name in ('head', 'body'):
+            in_head = name == 'head' and not slash
+        pos = m.end()
+    out.append(RE_SPACE.sub(' ', html[pos:]))
+    html = RE_PLACEHOLDER.sub(lambda m: raw[int(m.group(1))], ''.join(out))
+    return html.strip() + '\n'
+
+
+MINIFIERS: Dict[str, Callable[[str], str]] = {
+    '.html': minify_html,
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+def minify_bytes(rel: str, data: bytes) -> bytes:
+    """Minified data for a .html/.css/.js path, else data unchanged."""
+    fn = MINIFIERS.get(Path(rel).suffix.lower())
+    if fn is None:
+        return data
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data
+    return fn(text).encode('utf-8')
+
+
+def compress(data: bytes) -> Dict[str, bytes]:
+    """{'.gz': ..., '.br': ...} for encodings that actually shrink data."""
+    out = {}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        out['.gz'] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            out['.br'] = br
+    return out
+
+
+def report(rows: List[Tuple[str, int, int, int, int]]) -> str:
+    """rows of (rel, before, minified, gz, br) -> per-type table."""
+    totals: Dict[str, List[int]] = {}
+    for rel, *sizes in rows:
+        t = totals.setdefault(Path(rel).suffix.lower() or rel, [0, 0, 0, 0, 0])
+        t[0] += 1
+        for k, v in enumerate(sizes):
+            t[k + 1] += v
+    lines = [f"{'type':<12} {'files':>5} {'before':>10} {'minified':>10} "
+             f"{'gzip':>10} {'brotli':>10}"]
+    for ext, (count, before, mini, gz, br) in sorted(totals.items()):
+        lines.append(
+            f"{ext:<12} {count:>5} {before:>10,} {mini:>10,} {gz:>10,} "
+            f"{br if brotli is not None else '-':>10}"
+            f"  ({100 * (before - mini) / max(before, 1):.0f}% smaller)")
+    return '\n'.join(lines)
+
+
+def main() -> int:
+    _, files = scan_tree(ROOT)
+    rows = []
+    for rel in sorted(files):
+        if (not rel.endswith(COMPRESS_EXTS) or rel.startswith('scripts/')
+                or '/' in rel and rel.split('/')[0] in ('.github',)):
+            continue
+        data = (ROOT / rel).read_bytes()
+        mini = minify_bytes(rel, data)
+        packed = compress(mini)
+        rows.append((rel, len(data), len(mini),
+                     len(packed.get('.gz', mini)), len(packed.get('.br', mini))))
+    print(report(rows))
+    if brotli is None:
+        print("brotli module not installed: no .br output (pip install brotli).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
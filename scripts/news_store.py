@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Indexed, date-sorted view of js/news-manifest.json.
+- Loads the manifest once per process (reloaded only if the file changes);
+  add() detaches a loaded store from that cache, so later load() calls
+  never see another caller's unsaved edits
+- Keeps items newest-first (ties keep manifest order) with indexes by URL
+  and category
+- Date queries (latest N, a month/year/day prefix, a date range) are
+  bisections over the sorted dates, O(log n) plus the slice returned
+"""
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+MANIFEST = ROOT / 'js' / 'news-manifest.json'
+BASE_URL = 'https://shu-edu-tw.github.io'
+
+
+def site_path(url: str) -> str:
+    """Manifest URL (../news/x.html) -> repo-relative path (news/x.html)."""
+    return url.replace('../', '').lstrip('/')
+
+
+def abs_url(url: str) -> str:
+    """Manifest URL (../news/x.html) -> https://.../news/x.html."""
+    return f"{BASE_URL}/{site_path(url)}"
+
+
+class NewsStore:
+    def __init__(self, items: Iterable[dict]):
+        self.items: List[dict] = []
+        self._dates: List[str] = []  # ascending mirror of items' dates
+        self.by_url: Dict[str, dict] = {}
+        self._categories: Dict[str, List[dict]] = {}
+        self._category_stores: Dict[str, NewsStore] = {}
+        self._source: Optional[Path] = None  # set while cached by load()
+        # sort() is stable, so same-day items keep their manifest order
+        for item in sorted(items, key=lambda i: i.get('date', ''),
+                           reverse=True):
+            self.items.append(item)
+            self._index(item)
+        self._dates = [i.get('date', '') for i in reversed(self.items)]
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST) -> 'NewsStore':
+        """Parse path once; later calls reuse it until the file changes."""
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return cls([])
+        key = (st.st_size, st.st_mtime_ns)
+        cached = _LOADED.get(path)
+        if cached is None or cached[0] != key:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            cached = _LOADED[path] = (key, cls(data))
+            cached[1]._source = path
+        return cached[1]
+
+    def _index(self, item: dict) -> None:
+        if item.get('url'):
+            self.by_url[item['url']] = item
+        self._categories.setdefault(item.get('category', ''), []).append(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.items)
+
+    def add(self, item: dict) -> None:
+        """Insert item at its date position (after same-day items)."""
+        if self._source is not None:
+            # no longer what the file says: the next load() re-parses
+            if _LOADED.get(self._source, (None, None))[1] is self:
+                del _LOADED[self._source]
+            self._source = None
+        date = item.get('date', '')
+        asc = bisect_left(self._dates, date)
+        self.items.insert(len(self.items) - asc, item)
+        self._dates.insert(asc, date)
+        if item.get('url'):
+            self.by_url[item['url']] = item
+        cat = item.get('category', '')
+        same = self._categories.setdefault(cat, [])
+        pos = next((k for k, other in enumerate(same)
+                    if other.get('date', '') < date), len(same))
+        same.insert(pos, item)
+        self._category_stores.pop(cat, None)
+
+    def latest(self, n: int) -> List[dict]:
+        return self.items[:n]
+
+    def _span(self, start: str, end: str) -> Tuple[int, int]:
+        n = len(self.items)
+        return (n - bisect_right(self._dates, end),
+                n - bisect_left(self._dates, start))
+
+    def between(self, start: str, end: str) -> List[dict]:
+        """Items dated start..end inclusive (YYYY-MM-DD), newest first."""
+        lo, hi = self._span(start, end)
+        return self.items[lo:hi]
+
+    def dated(self, prefix: str) -> List[dict]:
+        """Items whose date starts with prefix: '2024', '2024-10', ..."""
+        return self.between(prefix, prefix + '\uffff')
+
+    def categories(self) -> List[str]:
+        return sorted(c for c in self._categories if c)
+
+    def category(self, name: str) -> 'NewsStore':
+        """Sub-store for one category (same query API)."""
+        store = self._category_stores.get(name)
+        if store is None:
+            store = NewsStore(self._categories.get(name, []))
+            self._category_stores[name] = store
+        return store
+
+    def get(self, url: str) -> Optional[dict]:
+        return self.by_url.get(url)
+
+
+_LOADED: Dict[Path, Tuple[Tuple[int, int], NewsStore]] = {}
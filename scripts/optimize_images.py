@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Build responsive variants of images/ and point <img> tags at them.
+- For every source image, writes <name>-<w>w.webp next to it for each
+  width in WIDTHS that is smaller than the original (never upscales)
+- Rewrites <img> tags in index.html, pages/ and news/: adds width/height
+  (intrinsic size, so the browser reserves space before the image loads)
+  and srcset/sizes listing the variants plus the original; width/height
+  a tag carries from an earlier size of its source (the ledger keeps
+  those) are updated when the image is resized, other values are left
+- sizes comes from the image's layout, not a blanket 100vw (which makes
+  browsers fetch the largest candidate for a 40px logo): a fixed px width
+  from a single-class rule in css/style.css (.logo-img), then an inline
+  style width/max-width, else the image's own width as the cap
+  (img { max-width: 100% } never stretches it past 100vw); a sizes
+  attribute already on the tag is kept
+- IMAGE_LEDGER records each source's content hash, size and variants, so
+  reruns only re-encode new or changed images
+
+Encoding needs Pillow (pip install Pillow). Without it WebP sizes are read
+from the file header and tags still get width/height, but the script exits
+non-zero while any variant is missing, so build.py stops instead of
+deploying pages without their srcset.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import struct
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from html_events import ATTRS, attr_spans, parse_attrs
+from site_corpus import ROOT, iter_html_files
+
+try:
+    from PIL import Image
+except ImportError:  # optional: only needed to encode variants
+    Image = None
+
+IMAGE_DIR = 'images'
+IMAGE_LEDGER = ROOT / 'scripts' / 'image-variants.json'
+SOURCE_EXTS = ('.webp', '.jpg', '.jpeg', '.png')
+WIDTHS = (480, 960, 1600)
+STYLESHEET = ROOT / 'css' / 'style.css'
+QUALITY = 80
+
+RE_IMG_TAG = re.compile(r'<img(?=[\s/>])%s>' % ATTRS, re.I)
+RE_TAG_NAME = re.compile(r'<[^\s/>]+')
+RE_VARIANT = re.compile(r'-\d+w\.webp$')
+RE_CLASS_RULE = re.compile(r'(?:^|[}\s])\.([\w-]+)\s*\{([^}]*)\}')
+RE_PX_WIDTH = re.compile(r'(?<![-\w])width\s*:\s*(\d+)px')
+RE_PX_MAX_WIDTH = re.compile(r'(?<![-\w])max-width\s*:\s*(\d+)px')
+
+
+def is_variant(rel: str) -> bool:
+    return bool(RE_VARIANT.search(rel))
+
+
+def variant_path(rel: str, width: int) -> str:
+    """images/x.webp -> images/x-480w.webp"""
+    return f"{posixpath.splitext(rel)[0]}-{width}w.webp"
+
+
+def iter_sources(root: Path = ROOT) -> List[str]:
+    base = root / IMAGE_DIR
+    out = []
+    for dirpath, _, names in os.walk(base):
+        for fn in names:
+            rel = Path(dirpath, fn).relative_to(root).as_posix()
+            if fn.lower().endswith(SOURCE_EXTS) and not is_variant(rel):
+                out.append(rel)
+    return sorted(out)
+
+
+def webp_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from a WebP header, or None if not WebP."""
+    if len(data) < 30 or data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8X':
+        w = int.from_bytes(data[24:27], 'little') + 1
+        h = int.from_bytes(data[27:30], 'little') + 1
+        return w, h
+    if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a':
+        w, h = struct.unpack('<HH', data[26:30])
+        return w & 0x3fff, h & 0x3fff
+    if chunk == b'VP8L' and data[20] == 0x2f:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    return None
+
+
+def image_size(path: Path) -> Optional[Tuple[int, int]]:
+    with open(path, 'rb') as f:
+        size = webp_size(f.read(32))
+    if size is None and Image is not None:
+        with Image.open(path) as im:
+            size = im.size
+    return size
+
+
+def wanted_widths(width: int) -> List[int]:
+    return [w for w in WIDTHS if w < width]
+
+
+def encode_variants(root: Path, rel: str, widths: Sequence[int]) -> List[int]:
+    with Image.open(root / rel) as im:
+        im.load()
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'A' in im.getbands() else 'RGB')
+        for w in widths:
+            h = max(1, round(im.height * w / im.width))
+            out = root / variant_path(rel, w)
+            tmp = out.with_suffix('.tmp')
+            im.resize((w, h), Image.LANCZOS).save(
+                tmp, 'WEBP', quality=QUALITY, method=6)
+            os.replace(tmp, out)
+    return list(widths)
+
+
+def load_ledger() -> Dict[str, dict]:
+    try:
+        return json.loads(IMAGE_LEDGER.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_ledger(ledger: Dict[str, dict]) -> None:
+    text = json.dumps(ledger, ensure_ascii=False, indent=2, sort_keys=True) + '\n'
+    try:
+        if IMAGE_LEDGER.read_text(encoding='utf-8') == text:
+            return
+    except OSError:
+        pass
+    IMAGE_LEDGER.write_text(text, encoding='utf-8')
+
+
+def process_images(root: Path, ledger: Dict[str, dict],
+                   force: bool = False) -> Dict[str, int]:
+    """Bring ledger (and variant files) up to date with images/."""
+    stats = {'encoded': 0, 'unchanged': 0, 'pending': 0}
+    sources = iter_sources(root)
+    for rel in list(ledger):
+        if rel not in sources:
+            del ledger[rel]
+    for rel in sources:
+        sha = hashlib.sha1((root / rel).read_bytes()).hexdigest()
+        entry = ledger.get(rel)
+        if entry is None or entry['sha'] != sha:
+            size = image_size(root / rel)
+            if size is None:
+                continue
+            # earlier sizes: width/height written for them are refreshed
+            previous = [] if entry is None else entry.get('previous', [])
+            if entry is not None:
+                previous = previous + [[entry['width'], entry['height']]]
+            previous = [p for p in previous if p != list(size)]
+            entry = ledger[rel] = {'sha': sha, 'width': size[0],
+                                   'height': size[1], 'variants': []}
+            if previous:
+                entry['previous'] = previous
+        want = wanted_widths(entry['width'])
+        have = [w for w in entry['variants']
+                if (root / variant_path(rel, w)).exists()]
+        if not force and have == want:
+            stats['unchanged'] += 1
+            continue
+        if Image is None:
+            entry['variants'] = have
+            stats['pending'] += 1
+            continue
+        entry['variants'] = encode_variants(root, rel, want)
+        stats['encoded'] += 1
+    return stats
+
+
+def resolve_src(page_rel: str, src: str) -> Optional[str]:
+    """<img src> as written on page_rel -> repo-relative path, if local."""
+    if not src or src.startswith(('http:', 'https:', '//', 'data:')):
+        return None
+    src = src.split('#', 1)[0].split('?', 1)[0]
+    if src.startswith('/'):
+        return src.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page_rel), src))
+
+
+def set_attr(tag: str, name: str, value: str) -> str:
+    """Replace attribute name in tag, or add it before the closing >."""
+    head = RE_TAG_NAME.match(tag).end()
+    for attr, start, end, _ in attr_spans(tag[head:-1]):
+        if attr != name:
+            continue
+        start, end = start + head, end + head
+        if tag[start - 1:start] in ('"', "'"):  # keep its quotes
+            return tag[:start] + value + tag[end:]
+        if start == end:  # valueless
+            return f'{tag[:end]}="{value}"{tag[end:]}'
+        return f'{tag[:start]}"{value}"{tag[end:]}'
+    end = len(tag) - (2 if tag.endswith('/>') else 1)
+    return f'{tag[:end].rstrip()} {name}="{value}"{tag[end:]}'
+
+
+def class_widths(css_path: Path = STYLESHEET) -> Dict[str, int]:
+    """Class -> fixed px width, from rules whose selector is that single
+    class (.logo-img { width: 40px })."""
+    try:
+        css = css_path.read_text(encoding='utf-8')
+    except OSError:
+        return {}
+    widths = {}
+    for name, body in RE_CLASS_RULE.findall(css):
+        m = RE_PX_WIDTH.search(body)
+        if m:
+            widths[name] = int(m.group(1))
+    return widths
+
+
+def image_sizes(attrs: Dict[str, str], width: int, widths: Dict[str, int],
+                default: Optional[str] = None) -> str:
+    """sizes for an <img>: the px width its class or inline style fixes,
+    a max-width cap, else default or the intrinsic width as the cap."""
+    for name in attrs.get('class', '').split():
+        if name in widths:
+            return f"{widths[name]}px"
+    style = attrs.get('style', '')
+    m = RE_PX_WIDTH.search(style)
+    if m:
+        return f"{m.group(1)}px"
+    cap = RE_PX_MAX_WIDTH.search(style)
+    cap = int(cap.group(1)) if cap else None
+    if cap is None and default:
+        return default
+    cap = min(cap or width, width)
+    return f"(max-width: {cap}px) 100vw, {cap}px"
+
+
+def rewrite_tag(tag: str, page_rel: str, ledger: Dict[str, dict],
+                sizes: Optional[str], widths: Dict[str, int]) -> str:
+    attrs = parse_attrs(tag[4:-1])
+    src = attrs.get('src', '')
+    entry = ledger.get(resolve_src(page_rel, src) or '')
+    if entry is None:
+        return tag
+    size = [attrs.get('width'), attrs.get('height')]
+    stale = [[str(w), str(h)] for w, h in entry.get('previous', ())]
+    if size == [None, None] or size in stale:
+        tag = set_attr(tag, 'width', str(entry['width']))
+        tag = set_attr(tag, 'height', str(entry['height']))
+    if entry['variants']:
+        stem = posixpath.splitext(src)[0]
+        srcset = [f"{stem}-{w}w.webp {w}w" for w in entry['variants']]
+        srcset.append(f"{src} {entry['width']}w")
+        tag = set_attr(tag, 'srcset', ', '.join(srcset))
+        if 'sizes' not in attrs:
+            tag = set_attr(tag, 'sizes',
+                           image_sizes(attrs, entry['width'], widths, sizes))
+    return tag
+
+
+def rewrite_pages(root: Path, ledger: Dict[str, dict],
+                  sizes: Optional[str] = None) -> List[str]:
+    changed = []
+    widths = class_widths(root / STYLESHEET.relative_to(ROOT))
+    for rel in iter_html_files(root):
+        if not (rel == 'index.html' or rel.startswith(('pages/', 'news/'))):
+            continue
+        path = root / rel
+        html = path.read_text(encoding='utf-8')
+        new = RE_IMG_TAG.sub(
+            lambda m: rewrite_tag(m.group(0), rel, ledger, sizes, widths), html)
+        if new != html:
+            path.write_text(new, encoding='utf-8')
+            changed.append(rel)
+    return changed
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--force', action='store_true',
+                    help='re-encode every variant even if cached')
+    ap.add_argument('--sizes',
+                    help='sizes for images without a px width in their class '
+                         'or style (default: capped at the image width)')
+    ap.add_argument('--no-rewrite', action='store_true',
+                    help='only build variants, leave HTML alone')
+    args = ap.parse_args(argv)
+
+    ledger = load_ledger()
+    stats = process_images(ROOT, ledger, args.force)
+    save_ledger(ledger)
+    print(f"Images: {stats['encoded']} encoded, "
+          f"{stats['unchanged']} unchanged, {stats['pending']} pending")
+    if not args.no_rewrite:
+        for rel in rewrite_pages(ROOT, ledger, args.sizes):
+            print(f"Updated <img> tags: {rel}")
+    if stats['pending']:
+        print(f"Pillow is not installed: {stats['pending']} images have no "
+              f"variants yet (pip install Pillow).")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
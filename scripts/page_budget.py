@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Page-weight and request-count budgets, checked offline.
+- Resolves each page's resources statically from the parsed pages in the
+  corpus cache: stylesheets, preloads, icons and the manifest (<link>),
+  <script src>, <img src>, plus @import and url() inside local CSS; a URL
+  used twice (preload, then stylesheet) is one request
+- Transfer size is the page or file compressed the way it would be sent
+  (the smallest of raw, gzip and, with the optional brotli module, br)
+- Third-party URLs (fonts, Font Awesome, gtag) cannot be measured
+  offline: their bytes and requests come from the "external" estimates
+  in the config, by URL prefix ("external_default" otherwise)
+- Budgets are per page type in scripts/page-budgets.json: the first type
+  whose "pages" patterns match a page applies; limits are requests and
+  total_kb / html_kb / css_kb / js_kb / img_kb / font_kb / other_kb
+- Exits non-zero listing every page over budget, metric by metric, with
+  its largest resources; --report prints every page, --json the raw data
+Resources requested only from JavaScript (news shards, lazy-loaded
+scripts) are not counted.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import fnmatch
+import json
+import posixpath
+import re
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import instrument
+from corpus_cache import CorpusCache
+from link_graph import resolve
+from minify import COMPRESS_EXTS, compress
+from site_corpus import ROOT, Page
+
+CONFIG = ROOT / 'scripts' / 'page-budgets.json'
+METRICS = ('requests', 'total_kb', 'html_kb', 'css_kb', 'js_kb', 'img_kb',
+           'font_kb', 'other_kb')
+LINK_RELS = {'stylesheet', 'preload', 'modulepreload', 'icon', 'manifest'}
+PRELOAD_KINDS = {'style': 'css', 'script': 'js', 'image': 'img', 'font': 'font'}
+EXT_KINDS = {'.css': 'css', '.js': 'js', '.mjs': 'js',
+             '.woff2': 'font', '.woff': 'font', '.ttf': 'font', '.otf': 'font',
+             '.webp': 'img', '.avif': 'img', '.png': 'img', '.jpg': 'img',
+             '.jpeg': 'img', '.gif': 'img', '.svg': 'img', '.ico': 'img'}
+RE_CSS_URL = re.compile(r'''@import\s+(?:url\()?\s*["']?([^"')\s;]+)|url\(\s*["']?([^"')]+)["']?\s*\)''')
+TOP_RESOURCES = 3
+
+
+class Resource(NamedTuple):
+    url: str       # repo-relative path, or the absolute URL if external
+    kind: str      # 'html', 'css', 'js', 'img', 'font' or 'other'
+    bytes: int     # transfer size (estimated for external URLs)
+    requests: int  # 1, or the config estimate for external URLs
+    external: bool
+
+
+def kind_of(url: str, default: str = 'other') -> str:
+    path = url.split('?', 1)[0].split('#', 1)[0]
+    return EXT_KINDS.get(posixpath.splitext(path)[1].lower(), default)
+
+
+class Sizer:
+    """Transfer sizes of local files and external estimates, memoized
+    across pages (every page shares the same CSS and JS)."""
+
+    def __init__(self, config: dict, root: Path = ROOT):
+        self.root = root
+        self.external: Dict[str, dict] = config.get('external', {})
+        self.default = config.get('external_default', {'bytes': 0, 'requests': 1})
+        self.sizes: Dict[str, int] = {}
+        self.css_refs: Dict[str, List[str]] = {}
+
+    def local(self, rel: str) -> int:
+        size = self.sizes.get(rel)
+        if size is None:
+            try:
+                data = (self.root / rel).read_bytes()
+            except OSError:
+                data = b''  # missing: check_internal_links reports it
+            instrument.count('files_read')
+            size = len(data)
+            if rel.endswith(COMPRESS_EXTS):
+                size = min([size] + [len(body) for body in compress(data).values()])
+            self.sizes[rel] = size
+        return size
+
+    def estimate(self, url: str, kind: str) -> Tuple[int, int, str]:
+        """(bytes, requests, kind) for an external URL, longest prefix
+        first; an entry's "kind" overrides the referencing tag's (a font
+        stylesheet mostly downloads fonts)."""
+        best = ''
+        for prefix in self.external:
+            if url.startswith(prefix) and len(prefix) > len(best):
+                best = prefix
+        hit = self.external[best] if best else self.default
+        return hit.get('bytes', 0), hit.get('requests', 1), hit.get('kind', kind)
+
+    def css_imports(self, rel: str) -> List[str]:
+        """Local files a stylesheet pulls in (@import, url())."""
+        refs = self.css_refs.get(rel)
+        if refs is None:
+            try:
+                css = (self.root / rel).read_text(encoding='utf-8', errors='ignore')
+            except OSError:
+                css = ''
+            refs = []
+            for m in RE_CSS_URL.finditer(css):
+                hit = resolve(rel, m.group(1) or m.group(2))
+                if hit:
+                    refs.append(hit[0])
+            self.css_refs[rel] = refs
+        return refs
+
+
+def page_urls(page: Page) -> List[Tuple[str, str]]:
+    """(url as written, kind) for every resource the HTML references."""
+    urls: List[Tuple[str, str]] = []
+    for link in page.links:
+        rels = set(link.get('rel', '').lower().split())
+        href = link.get('href', '')
+        if not href or not rels & LINK_RELS:
+            continue
+        if 'stylesheet' in rels:
+            kind = 'css'
+        elif rels & {'preload', 'modulepreload'}:
+            kind = PRELOAD_KINDS.get(link.get('as', '').lower(), kind_of(href))
+        elif 'icon' in rels:
+            kind = 'img'
+        else:
+            kind = 'other'
+        urls.append((href, kind))
+    urls += [(s['src'], 'js') for s in page.scripts if s.get('src')]
+    urls += [(i['src'], 'img') for i in page.imgs if i.get('src')]
+    return urls
+
+
+def page_resources(page: Page, sizer: Sizer) -> List[Resource]:
+    """The page itself first, then each distinct resource once."""
+    out = [Resource(page.rel, 'html', sizer.local(page.rel), 1, False)]
+    seen = {page.rel}
+    todo = page_urls(page)
+    while todo:
+        url, kind = todo.pop(0)
+        if url.startswith('data:'):
+            continue
+        hit = resolve(page.rel, url)
+        if hit is None:
+            if url.startswith('//'):
+                url = 'https:' + url
+            if not url.startswith(('http:', 'https:')) or url in seen:
+                continue
+            seen.add(url)
+            size, requests, kind = sizer.estimate(url, kind)
+            out.append(Resource(url, kind, size, requests, True))
+            continue
+        rel = hit[0]
+        if rel in seen:
+            continue
+        seen.add(rel)
+        out.append(Resource(rel, kind, sizer.local(rel), 1, False))
+        if kind == 'css':
+            todo += [('/' + ref, kind_of(ref)) for ref in sizer.css_imports(rel)]
+    return out
+
+
+def totals(resources: Iterable[Resource]) -> Dict[str, float]:
+    sums = dict.fromkeys(METRICS, 0.0)
+    for res in resources:
+        sums['requests'] += res.requests
+        sums['total_kb'] += res.bytes / 1024
+        sums[f'{res.kind}_kb'] += res.bytes / 1024
+    return {k: round(v, 1) for k, v in sums.items()}
+
+
+def page_type(rel: str, budgets: Dict[str, dict]) -> Optional[str]:
+    for name, budget in budgets.items():
+        if any(fnmatch.fnmatchcase(rel, pat) for pat in budget.get('pages', ())):
+            return name
+    return None
+
+
+def over_budget(measured: Dict[str, float], budget: dict) -> List[Tuple[str, float, float]]:
+    """(metric, value, limit) for each limit the page exceeds."""
+    return [(m, measured[m], budget[m]) for m in METRICS
+            if m in budget and measured[m] > budget[m]]
+
+
+def fmt_metric(metric: str, value: float) -> str:
+    return f"{value:.0f}" if metric == 'requests' else f"{value:.1f} KB"
+
+
+def describe_excess(metric: str, value: float, limit: float) -> str:
+    delta = value - limit
+    pct = f", +{delta / limit * 100:.0f}%" if limit else ''
+    return (f"{metric:<9} {fmt_metric(metric, value):>10} > {fmt_metric(metric, limit)} "
+            f"(+{fmt_metric(metric, delta)}{pct})")
+
+
+def load_config(path: Path = CONFIG) -> dict:
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--config', type=Path, default=CONFIG,
+                    help='budget file (default scripts/page-budgets.json)')
+    ap.add_argument('--report', action='store_true',
+                    help='print every page against its budget')
+    ap.add_argument('--json', action='store_true', help='machine-readable output')
+    args = ap.parse_args(argv)
+
+    config = load_config(args.config)
+    budgets: Dict[str, dict] = config['budgets']
+    sizer = Sizer(config)
+    results = []
+    for page in sorted(CorpusCache().load_pages(), key=lambda p: p.rel):
+        kind = page_type(page.rel, budgets)
+        if kind is None:
+            continue
+        with instrument.span('budget', 'file', rel=page.rel):
+            resources = page_resources(page, sizer)
+        measured = totals(resources)
+        results.append((page.rel, kind, measured, resources,
+                        over_budget(measured, budgets[kind])))
+
+    failures = [r for r in results if r[4]]
+    if args.json:
+        print(json.dumps([{
+            'page': rel, 'type': kind, **measured,
+            'over': {m: [v, limit] for m, v, limit in over},
+            'resources': [res._asdict() for res in resources],
+        } for rel, kind, measured, resources, over in results],
+            indent=2, ensure_ascii=False))
+        return 1 if failures else 0
+
+    if args.report:
+        width = max(len(r[0]) for r in results)
+        print(f"{'page':<{width}} {'type':<6} {'req':>4} {'total KB':>9} {'html':>6} "
+              f"{'css':>6} {'js':>6} {'img':>7} {'font':>6}")
+        for rel, kind, m, _, over in results:
+            print(f"{rel:<{width}} {kind:<6} {m['requests']:>4.0f} {m['total_kb']:>9.1f} "
+                  f"{m['html_kb']:>6.1f} {m['css_kb']:>6.1f} {m['js_kb']:>6.1f} "
+                  f"{m['img_kb']:>7.1f} {m['font_kb']:>6.1f}{'  OVER' if over else ''}")
+    for rel, kind, _, resources, over in failures:
+        print(f"{rel} [{kind}] over budget:")
+        for metric, value, limit in over:
+            print(f"  {describe_excess(metric, value, limit)}")
+        # the largest resources of the kinds over budget (any kind for
+        # total_kb / requests)
+        kinds = {m[:-3] for m, _, _ in over if m not in ('requests', 'total_kb')}
+        pool = [r for r in resources if r.kind in kinds] \
+            if len(kinds) == len(over) else resources
+        largest = sorted(pool, key=lambda r: -r.bytes)[:TOP_RESOURCES]
+        print('  largest: ' + ', '.join(
+            f"{r.url} {r.bytes / 1024:.1f} KB{' (est.)' if r.external else ''}"
+            for r in largest))
+    if failures:
+        print(f"{len(failures)} of {len(results)} pages over budget "
+              f"({args.config.relative_to(ROOT) if args.config.is_relative_to(ROOT) else args.config}).")
+        return 1
+    print(f"All {len(results)} pages within budget.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Local preview server with production-like caching and compression.
+- Serves the repo, or deploy_bundle/site/ with --bundle (build it with
+  build.py --minify [--fingerprint] first)
+- ETag and Last-Modified on every file, answering If-None-Match /
+  If-Modified-Since with 304
+- Accept-Encoding negotiation: a precompressed .br/.gz sibling is sent
+  when it is at least as new as the file; other text types are gzipped
+  on the fly (kept in memory per file version); Vary: Accept-Encoding
+- Cache-Control: immutable for fingerprinted assets (fingerprint.
+  hashed_paths()), no-cache for everything else, so edits show up on the
+  next revalidation; sw.js gets Service-Worker-Allowed: /
+- Single byte ranges (Range / If-Range) with 206 / 416, for images and
+  media
+- Logs method, path, status, encoding, bytes and handling time per
+  request; --log FILE also appends them as JSON lines (start offset from
+  server start, duration) to rebuild page-load waterfalls offline
+
+Usage: python3 scripts/preview_server.py [--bundle] [--port 8000] [--log FILE]
+"""
+from __future__ import annotations
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from pathlib import Path
+import argparse
+import gzip
+import http.server
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from build import BUNDLE
+from fingerprint import hashed_paths, load_asset_map
+from minify import COMPRESS_EXTS
+from site_corpus import ROOT
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# precompressed sibling suffix per content coding, in preference order
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ON_THE_FLY_LIMIT = 8 * 2**20  # larger files are sent uncompressed
+RE_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+EXTRA_TYPES = {'.webp': 'image/webp', '.avif': 'image/avif',
+               '.webmanifest': 'application/manifest+json', '.mjs': 'text/javascript',
+               '.js': 'text/javascript', '.json': 'application/json'}
+
+
+def accepted(header: str) -> Set[str]:
+    """Content codings with q > 0 in an Accept-Encoding header."""
+    codings = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            codings.add(name.lower())
+    if '*' in codings:
+        codings.update(coding for coding, _ in ENCODINGS)
+    return codings
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) inclusive for a single 'bytes=' range; None if the
+    header is not one we honour (the full body is sent); (-1, -1) if it
+    cannot be satisfied."""
+    m = RE_RANGE.match(header.strip())
+    if not m or m.group(1) == m.group(2) == '':
+        return None
+    if m.group(1) == '':  # suffix: the last N bytes
+        n = int(m.group(2))
+        return (max(size - n, 0), size - 1) if n and size else (-1, -1)
+    first = int(m.group(1))
+    last = int(m.group(2)) if m.group(2) else size - 1
+    if first >= size or last < first:
+        return (-1, -1)
+    return first, min(last, size - 1)
+
+
+class PreviewHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like GitHub Pages
+    server_version = 'shu-preview'
+    # set by serve()
+    root: Path = ROOT
+    immutable: Set[str] = set()
+    started = time.perf_counter()
+    log_file = None
+    gz_cache: Dict[Tuple[str, int, int], bytes] = {}
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        self.handle_file(head=False)
+
+    def do_HEAD(self) -> None:
+        self.handle_file(head=True)
+
+    def log_request(self, code='-', size='-') -> None:
+        pass  # handle_file logs with timing instead
+
+    # -- request handling ------------------------------------------------
+
+    def locate(self, url_path: str) -> Tuple[Optional[Path], str]:
+        """(file, repo-relative path) for a URL path; file is None if
+        missing or outside the served root."""
+        rel = posixpath.normpath(unquote(url_path)).lstrip('/')
+        if url_path.endswith('/') or (self.root / rel).is_dir():
+            rel = posixpath.join(rel, 'index.html')
+        path = self.root / rel
+        if rel.startswith('..') or not path.is_file():
+            return None, rel
+        return path, rel
+
+    def handle_file(self, head: bool) -> None:
+        t = time.perf_counter()
+        url_path = urlsplit(self.path).path
+        path, rel = self.locate(url_path)
+        status, sent, coding = HTTPStatus.OK, 0, ''
+        try:
+            if path is None:
+                status = HTTPStatus.NOT_FOUND
+                path = self.root / '404.html'
+                rel = '404.html'
+                if not path.is_file():
+                    self.send_error(status)
+                    return
+            status, sent, coding = self.send_file(path, rel, status, head)
+        except (BrokenPipeError, ConnectionResetError):
+            status = 499  # client went away mid-response
+        finally:
+            self.log_timing(t, url_path, int(status), sent, coding)
+
+    def send_file(self, path: Path, rel: str, status: HTTPStatus,
+                  head: bool) -> Tuple[HTTPStatus, int, str]:
+        st = path.stat()
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        ctype = self.content_type(rel)
+        compressible = rel.endswith(COMPRESS_EXTS)
+
+        headers = [('Cache-Control', IMMUTABLE if rel in self.immutable else REVALIDATE),
+                   ('Last-Modified', last_modified)]
+        if rel == 'sw.js':
+            headers.append(('Service-Worker-Allowed', '/'))
+        if compressible:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if status == HTTPStatus.OK and self.not_modified(etag, st.st_mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for key, value in headers + [('ETag', etag)]:
+                self.send_header(key, value)
+            self.end_headers()
+            return HTTPStatus.NOT_MODIFIED, 0, ''
+
+        coding, body = self.encoded_body(path, st, compressible) \
+            if status == HTTPStatus.OK else ('', None)
+        if coding:
+            etag = etag[:-1] + f'-{coding}"'
+            headers.append(('Content-Encoding', coding))
+        else:
+            headers.append(('Accept-Ranges', 'bytes'))
+        headers.append(('ETag', etag))
+
+        size = len(body) if body is not None else st.st_size
+        first, last = 0, size - 1
+        if not coding and status == HTTPStatus.OK and self.headers.get('Range') \
+                and self.range_applies(etag, last_modified):
+            span = parse_range(self.headers['Range'], size)
+            if span == (-1, -1):
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, 0, ''
+            if span is not None:
+                first, last = span
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers.append(('Content-Range', f'bytes {first}-{last}/{size}'))
+
+        length = last - first + 1 if size else 0
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(length))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        if head:
+            return status, 0, coding
+        if body is not None:
+            self.wfile.write(body[first:first + length])
+        else:
+            with open(path, 'rb') as f:
+                f.seek(first)
+                remaining = length
+                while remaining:
+                    chunk = f.read(min(remaining, 256 * 1024))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        return status, length, coding
+
+    # -- helpers ---------------------------------------------------------
+
+    @staticmethod
+    def content_type(rel: str) -> str:
+        ext = posixpath.splitext(rel)[1].lower()
+        ctype = EXTRA_TYPES.get(ext) or mimetypes.guess_type(rel)[0] \
+            or 'application/octet-stream'
+        if ctype.startswith('text/') or ctype in ('application/json',
+                                                  'application/manifest+json',
+                                                  'image/svg+xml'):
+            ctype += '; charset=utf-8'
+        return ctype
+
+    def not_modified(self, etag: str, mtime: float) -> bool:
+        match = self.headers.get('If-None-Match')
+        if match is not None:
+            base = etag.strip('"')
+            # a compressed variant's tag still validates the same file
+            valid = {base, '*'} | {f'{base}-{coding}' for coding, _ in ENCODINGS}
+            tags = {tag.strip().removeprefix('W/').strip('"') for tag in match.split(',')}
+            return not tags.isdisjoint(valid)
+        since = self.headers.get('If-Modified-Since')
+        if since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def range_applies(self, etag: str, last_modified: str) -> bool:
+        """If-Range: only a matching (strong) validator keeps the range."""
+        cond = self.headers.get('If-Range')
+        return cond is None or cond.strip() in (etag, last_modified)
+
+    def encoded_body(self, path: Path, st: os.stat_result,
+                     compressible: bool) -> Tuple[str, Optional[bytes]]:
+        """(content coding, body) for the request; body None means send
+        the file itself unencoded."""
+        if not compressible:
+            return '', None
+        wanted = accepted(self.headers.get('Accept-Encoding', ''))
+        for coding, suffix in ENCODINGS:
+            sibling = path.with_name(path.name + suffix)
+            if coding in wanted and sibling.is_file() \
+                    and sibling.stat().st_mtime_ns >= st.st_mtime_ns:
+                return coding, sibling.read_bytes()
+        if 'gzip' not in wanted or st.st_size > ON_THE_FLY_LIMIT:
+            return '', None
+        key = (str(path), st.st_size, st.st_mtime_ns)
+        with self.lock:
+            body = self.gz_cache.get(key)
+        if body is None:
+            data = path.read_bytes()
+            body = gzip.compress(data, compresslevel=6, mtime=0)
+            if len(body) >= len(data):
+                body = data
+            with self.lock:
+                self.gz_cache[key] = body
+        return ('gzip', body) if len(body) < st.st_size else ('', None)
+
+    def log_timing(self, t: float, url_path: str, status: int, sent: int,
+                   coding: str) -> None:
+        now = time.perf_counter()
+        ms = (now - t) * 1000
+        print(f"{t - self.started:9.3f}s {self.command:<4} {status} {url_path} "
+              f"{sent:,} B{' ' + coding if coding else ''} {ms:.1f} ms", flush=True)
+        if self.log_file is not None:
+            record = {
+                'start': round(t - self.started, 6), 'ms': round(ms, 3),
+                'method': self.command, 'path': url_path, 'status': status,
+                'bytes': sent, 'encoding': coding,
+                'range': self.headers.get('Range', ''),
+                'referer': self.headers.get('Referer', ''),
+                'client': self.client_address[0],
+            }
+            with self.lock:
+                self.log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self.log_file.flush()
+
+
+def serve(root: Path, host: str, port: int, log: Optional[Path] = None,
+          immutable: Sequence[str] = ()) -> http.server.ThreadingHTTPServer:
+    """Server for root (not started); run serve_forever() on it."""
+    attrs = {'root': root, 'immutable': set(immutable), 'started': time.perf_counter(),
+             'gz_cache': {}, 'lock': threading.Lock(),
+             'log_file': open(log, 'a', encoding='utf-8') if log else None}
+    handler = type('Handler', (PreviewHandler,), attrs)
+    return http.server.ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--bundle', action='store_true',
+                    help='serve deploy_bundle/site/ instead of the repo')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8000)
+    ap.add_argument('--log', type=Path, metavar='FILE',
+                    help='append per-request timings as JSON lines')
+    args = ap.parse_args(argv)
+
+    root = BUNDLE if args.bundle else ROOT
+    if not (root / 'index.html').is_file():
+        print(f"{root} has no index.html; run: python3 scripts/build.py --minify")
+        return 1
+    immutable: List[str] = hashed_paths(load_asset_map()) if args.bundle else []
+    server = serve(root, args.host, args.port, args.log, immutable)
+    host, port = server.server_address[:2]
+    print(f"Serving {root} on http://{host}:{port}/ "
+          f"({len(immutable)} immutable assets). Ctrl-C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
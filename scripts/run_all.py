@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Run every HTML validator against one shared parse of the tree.
+- Walks and parses each HTML file once (site_corpus.load_pages)
+- Runs each check and prints its usual report; checks that look across
+  pages (prepare(pages)) run once everything is parsed
+- Prints per-check timing; exits non-zero if a fatal check failed
+- Reuses the .cache/ results for unchanged pages (see corpus_cache);
+  pass --no-cache for a full rescan
+- --jobs N parses and checks files in N processes; findings are merged
+  in page order, so the report is identical to a serial run
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+import check_anchor_text
+import check_ga_tag
+import check_heading_hierarchy
+import check_image_alts
+import check_internal_links
+import instrument
+import validate_a11y
+import validate_seo
+from corpus_cache import CorpusCache
+from site_corpus import analyze_files, is_corpus_check, iter_html_files, run_check
+
+CHECKS = [
+    validate_seo,
+    check_internal_links,
+    validate_a11y,
+    check_ga_tag,
+    check_heading_hierarchy,
+    check_anchor_text,
+    check_image_alts,
+]
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--no-cache', action='store_true',
+                    help='ignore and do not update .cache/site-checks.pickle')
+    ap.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                    help='worker processes for parsing and checks '
+                         '(0 = one per CPU)')
+    args = ap.parse_args(argv)
+    jobs = args.jobs or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    if args.no_cache:
+        cache = None
+        pages = []
+        findings: dict[str, list[str]] = {c.CHECK_NAME: [] for c in CHECKS}
+        cpu: dict[str, float] = {}
+        for _, page, found, timings in analyze_files(
+                iter_html_files(), CHECKS, jobs=jobs):
+            pages.append(page)
+            for name, issues in found.items():
+                findings[name].extend(issues)
+            for name, elapsed in timings.items():
+                cpu[name] = cpu.get(name, 0.0) + elapsed
+        parsed = len(pages)
+    else:
+        cache = CorpusCache()
+        pages = cache.load_pages(CHECKS, jobs)
+        cpu = cache.timings
+        parsed = len(cache.reparsed)
+    wall = time.perf_counter() - t0
+
+    failed = []
+    counts = {}
+    for check in CHECKS:
+        print(f"== {check.CHECK_NAME}")
+        if cache or is_corpus_check(check):
+            t = time.perf_counter()
+            issues = (cache.run_check(check, pages) if cache
+                      else run_check(check, pages))
+            cpu[check.CHECK_NAME] = (cpu.get(check.CHECK_NAME, 0.0)
+                                     + time.perf_counter() - t)
+        else:
+            issues = findings[check.CHECK_NAME]
+        if check.report(pages, issues) and check.FATAL:
+            failed.append(check.CHECK_NAME)
+        counts[check.CHECK_NAME] = len(issues)
+        print()
+
+    if cache:
+        cache.save()
+
+    print(f'Timing (jobs={jobs}; per-phase times summed over files):')
+    print(f"  {'parse':<12} {cpu.get('parse', 0.0) * 1000:8.1f} ms  "
+          f"({parsed}/{len(pages)} pages)")
+    for check in CHECKS:
+        name = check.CHECK_NAME
+        print(f"  {name:<12} {cpu.get(name, 0.0) * 1000:8.1f} ms  "
+              f"({counts[name]} issues)")
+    print(f"  {'scan wall':<12} {wall * 1000:8.1f} ms")
+    print(f"  {'total':<12} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+    if failed:
+        print('Failed checks:', ', '.join(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Shared HTML corpus for the scripts/ validators.
+- Walks the repo once and reads each HTML file once
+- Extracts a compact per-page record (title, metas, links, imgs,
+  headings, anchors, scripts, fragment ids) that every check works from,
+  in one pass over html_events.iter_events
+- Checks expose select(rel) and check_page(page) -> list[str]; checks
+  that need facts from other pages also define prepare(pages), which
+  run_check calls first, so they run after every page is parsed
+- analyze_files() parses and checks files in a process pool (--jobs N);
+  results come back in input order, so output matches a serial run
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import importlib
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from html_events import END, START, TEXT, iter_events
+import instrument
+
+ROOT = Path(__file__).resolve().parents[1]
+SITE_ORIGIN = 'https://shu-edu-tw.github.io'
+SKIP_DIRS = ('deploy_bundle', '.git', 'scripts')
+
+Attrs = Dict[str, str]
+
+
+@dataclass
+class Page:
+    """Facts extracted from one HTML file (paths are repo-relative)."""
+    rel: str
+    title: Optional[str] = None
+    metas: List[Attrs] = field(default_factory=list)
+    links: List[Attrs] = field(default_factory=list)
+    scripts: List[Attrs] = field(default_factory=list)
+    inline_scripts: List[str] = field(default_factory=list)  # <script> bodies
+    imgs: List[Attrs] = field(default_factory=list)
+    anchors: List[Tuple[Attrs, str]] = field(default_factory=list)
+    headings: List[Tuple[int, str]] = field(default_factory=list)
+    ids: Set[str] = field(default_factory=set)  # id= / <a name=>: fragment targets
+
+    @property
+    def dir(self) -> str:
+        """Absolute directory of the page, for resolving relative URLs."""
+        return os.path.dirname(os.path.join(str(ROOT), self.rel))
+
+    def meta(self, key: str, value: str) -> Optional[str]:
+        """content= of the first <meta key="value">, or None."""
+        for m in self.metas:
+            if m.get(key, '').lower() == value and 'content' in m:
+                return m['content']
+        return None
+
+    def link_href(self, rel: str) -> Optional[str]:
+        """href= of the first <link rel="..."> matching rel, or None."""
+        for l in self.links:
+            if rel in l.get('rel', '').lower().split() and 'href' in l:
+                return l['href']
+        return None
+
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+PAGE_TAGS = {'a', 'meta', 'link', 'script', 'img', 'title', *HEADING_TAGS}
+
+
+def parse_page(rel: str, html: str) -> Page:
+    """Build the Page record from one pass over html_events.iter_events."""
+    page = Page(rel=rel)
+    anchor: Optional[Tuple[int, Attrs, List[str]]] = None
+    heading: Optional[Tuple[str, List[str]]] = None
+    in_title = in_script = False
+    title: List[str] = []
+    for kind, tag, attrs, data in iter_events(html, PAGE_TAGS):
+        if kind == TEXT:
+            if in_script:
+                page.inline_scripts.append(data)
+            if anchor is not None:
+                anchor[2].append(data)
+            if heading is not None:
+                heading[1].append(data)
+            if in_title:
+                title.append(data)
+        elif kind == START:
+            if 'id' in attrs:
+                page.ids.add(attrs['id'])
+            if tag == 'a':
+                if 'name' in attrs:
+                    page.ids.add(attrs['name'])
+                if anchor is not None:  # <a> cannot nest; the old one ends
+                    page.anchors[anchor[0]] = (anchor[1], ''.join(anchor[2]).strip())
+                anchor = (len(page.anchors), attrs, [])
+                page.anchors.append((attrs, ''))
+            elif tag in HEADING_TAGS:
+                if heading is not None:
+                    page.headings.append((HEADING_TAGS[heading[0]],
+                                          ''.join(heading[1]).strip()[:60]))
+                heading = (tag, [])
+            elif tag == 'meta':
+                page.metas.append(attrs)
+            elif tag == 'link':
+                page.links.append(attrs)
+            elif tag == 'script':
+                page.scripts.append(attrs)
+                in_script = True
+            elif tag == 'img':
+                page.imgs.append(attrs)
+            elif tag == 'title' and page.title is None:
+                in_title = True
+        elif kind == END:
+            in_script = False
+            if tag == 'a' and anchor is not None:
+                page.anchors[anchor[0]] = (anchor[1], ''.join(anchor[2]).strip())
+                anchor = None
+            elif heading is not None and tag == heading[0]:
+                page.headings.append((HEADING_TAGS[tag],
+                                      ''.join(heading[1]).strip()[:60]))
+                heading = None
+            elif tag == 'title' and in_title:
+                page.title = ''.join(title).strip()
+                in_title = False
+    if anchor is not None:
+        page.anchors[anchor[0]] = (anchor[1], ''.join(anchor[2]).strip())
+    return page
+
+
+def scan_tree(root: Path = ROOT) -> Tuple[List[str], Set[str]]:
+    """
+    One walk of the tree: (sorted HTML pages to check, every file).
+    Both are repo-relative POSIX paths; the file set skips only
+    deploy_bundle/.git/.cache so link targets under scripts/ still count.
+    """
+    html: List[str] = []
+    files: Set[str] = set()
+    with instrument.span('discover'):
+        for base, dirs, names in os.walk(root):
+            relbase = os.path.relpath(base, root)
+            if relbase.startswith(('deploy_bundle', '.git', '.cache')):
+                dirs[:] = []
+                continue
+            prefix = '' if relbase == '.' else relbase.replace(os.sep, '/') + '/'
+            checked = not relbase.startswith(SKIP_DIRS)
+            for fn in names:
+                files.add(prefix + fn)
+                if checked and fn.endswith('.html'):
+                    html.append(prefix + fn)
+    instrument.count('files_scanned', len(files))
+    return sorted(html), files
+
+
+def iter_html_files(root: Path = ROOT) -> List[str]:
+    """Repo-relative POSIX paths of every HTML file, sorted."""
+    return scan_tree(root)[0]
+
+
+def read_html(rel: str, root: Path = ROOT) -> str:
+    with open(root / rel, 'r', encoding='utf-8', errors='ignore') as f:
+        instrument.count('files_read')
+        instrument.count('bytes_read', os.fstat(f.fileno()).st_size)
+        return f.read()
+
+
+def load_pages(root: Path = ROOT) -> List[Page]:
+    """Parse every HTML file in the tree exactly once."""
+    pages = []
+    for rel in iter_html_files(root):
+        html = read_html(rel, root)
+        with instrument.span('parse', 'file', rel=rel):
+            pages.append(parse_page(rel, html))
+    return pages
+
+
+def is_top_level_page(rel: str) -> bool:
+    """index.html, pages/*.html or news/*.html."""
+    if rel == 'index.html':
+        return True
+    head, _, tail = rel.partition('/')
+    return head in ('pages', 'news') and '/' not in tail
+
+
+def is_corpus_check(check) -> bool:
+    """True if the check needs the whole corpus (defines prepare)."""
+    return hasattr(check, 'prepare')
+
+
+def run_check(check, pages: Sequence[Page]) -> List[str]:
+    """Run a check module's check_page over the pages it selects."""
+    with instrument.span(check.CHECK_NAME, 'check'):
+        if is_corpus_check(check):
+            check.prepare(pages)
+        issues: List[str] = []
+        for page in pages:
+            if check.select(page.rel):
+                issues.extend(check.check_page(page))
+    return issues
+
+
+Analysis = Tuple[str, Page, Dict[str, List[str]], Dict[str, float]]
+
+
+def analyze_file(task: Tuple[str, str, Sequence[str]]) -> Analysis:
+    """
+    Read, hash, parse and check one file.
+    task is (root, rel, check module names); returns
+    (sha1, page, {CHECK_NAME: issues}, {phase: seconds}).
+    """
+    root, rel, check_modules = task
+    t = time.perf_counter()
+    with open(os.path.join(root, rel), 'rb') as f:
+        raw = f.read()
+    instrument.count('files_read')
+    instrument.count('bytes_read', len(raw))
+    with instrument.span('parse', 'file', rel=rel):
+        page = parse_page(rel, raw.decode('utf-8', 'ignore'))
+    now = time.perf_counter()
+    timings = {'parse': now - t}
+    findings: Dict[str, List[str]] = {}
+    for name in check_modules:
+        check = importlib.import_module(name)
+        if check.select(rel):
+            with instrument.span(check.CHECK_NAME, 'check', rel=rel):
+                findings[check.CHECK_NAME] = check.check_page(page)
+        t, now = now, time.perf_counter()
+        timings[check.CHECK_NAME] = now - t
+    return hashlib.sha1(raw).hexdigest(), page, findings, timings
+
+
+def analyze_files(rels: Sequence[str], checks: Sequence = (),
+                  root: Path = ROOT, jobs: int = 1) -> Iterator[Analysis]:
+    """analyze_file over rels, across `jobs` processes, in rels order."""
+    # corpus checks cannot run until every page is parsed
+    names = [c.__name__ for c in checks if not is_corpus_check(c)]
+    tasks = [(str(root), rel, names) for rel in rels]
+    if jobs <= 1 or len(tasks) < 2:
+        yield from map(analyze_file, tasks)
+        return
+    chunk = max(1, len(tasks) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(analyze_file, tasks, chunksize=chunk)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic large site for benchmarking the scripts/ toolchain.
+- Starts from a copy of the real tree (pages, css, js, images, scripts and
+  their ledgers), so every script runs unmodified against the copy:
+  they all locate the site from their own path
+- Adds --news entries to js/news-manifest.json, with a news/*.html page
+  for each (a --missing fraction is left for generate_news_stubs.py)
+  and --pages extra pages/section-NNNNN.html
+- Synthetic pages reuse a real page's head, header and footer; <main> is
+  replaced by --headings sections (with ids), --links links (other pages,
+  some with #fragments to those ids) and --imgs images from images/
+Output is deterministic for a given --seed.
+
+Usage: python3 scripts/synth_site.py DEST [--news 5000] [--pages 100]
+       [--links 40] [--imgs 6] [--headings 10] [--missing 0.1]
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+import argparse
+import datetime as _dt
+import json
+import random
+import re
+import shutil
+import sys
+from typing import Dict, List, Optional, Sequence
+
+from news_store import MANIFEST, site_path
+from site_corpus import ROOT
+
+COPY_DIRS = ('css', 'js', 'images', 'pages', 'news', 'scripts')
+COPY_SKIP = ('__pycache__', 'news-shards')
+NEWS_SHELL = 'news/2024-10-25-lvs-upgrade.html'
+PAGE_SHELL = 'pages/about.html'
+RE_MAIN = re.compile(r'(<main\b[^>]*>).*?(</main>)', re.S)
+RE_SELF_LINK = re.compile(r'href="#(?!main-content")[^"]+"')
+RE_TITLE = re.compile(r'<title>.*?</title>', re.S)
+REAL_PAGES = 3  # real pages/*.html mixed into the link targets
+WORDS = ('世新 傳播 新聞 校園 學生 研究 課程 國際 產學 媒體 設計 數位 '
+         '影音 報導 活動 交流 獎項 實習 講座 展覽').split()
+
+
+@dataclass
+class SiteSpec:
+    news: int = 5000
+    pages: int = 100
+    links: int = 40
+    imgs: int = 6
+    headings: int = 10
+    missing: float = 0.1
+    seed: int = 1
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(self.__dict__)
+
+
+def copy_tree(dest: Path) -> None:
+    """The real site minus generated and local-only files."""
+    ignore = shutil.ignore_patterns(*COPY_SKIP)
+    for name in COPY_DIRS:
+        shutil.copytree(ROOT / name, dest / name, ignore=ignore)
+    for path in ROOT.iterdir():
+        if path.is_file() and path.suffix in ('.html', '.json', '.js', '.txt', '.xml'):
+            shutil.copy2(path, dest / path.name)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ''.join(rng.choice(WORDS) for _ in range(words))
+
+
+def render_body(rng: random.Random, spec: SiteSpec, title: str,
+                targets: Sequence[str], images: Sequence[str], prefix: str) -> str:
+    """<main> content: an h1, then sections with ids and links spread over
+    paragraphs. targets[:-REAL_PAGES] are synthetic (they have the ids)."""
+    out = ['\n    <section class="content-section">\n      <div class="container">',
+           f'        <h1>{title}</h1>']
+    per = max(1, spec.headings)
+    links = [spec.links // per + (i < spec.links % per) for i in range(per)]
+    imgs = [spec.imgs // per + (i < spec.imgs % per) for i in range(per)]
+    for i in range(spec.headings or 1):
+        if spec.headings:
+            out.append(f'        <h2 id="sec-{i}">{sentence(rng, 3)}</h2>')
+        anchors = []
+        for _ in range(links[i]):
+            pick = rng.randrange(len(targets))
+            target = targets[pick]
+            frag = f'#sec-{rng.randrange(spec.headings)}' \
+                if spec.headings and pick < len(targets) - REAL_PAGES \
+                and rng.random() < 0.2 else ''
+            anchors.append(f'<a href="{prefix}{target}{frag}">{sentence(rng, 2)}</a>')
+        out.append(f'        <p>{sentence(rng, 12)}{"、".join(anchors)}{sentence(rng, 8)}</p>')
+        for _ in range(imgs[i]):
+            out.append(f'        <img src="{prefix}{rng.choice(images)}" '
+                       f'alt="{sentence(rng, 2)}" loading="lazy">')
+    out.append('      </div>\n    </section>\n  ')
+    return '\n'.join(out)
+
+
+def fill_shell(shell: str, body: str, replace: Dict[str, str]) -> str:
+    html = RE_MAIN.sub(lambda m: m.group(1) + body + m.group(2), shell, count=1)
+    # the shell's in-page links pointed at ids inside the replaced <main>
+    html = RE_SELF_LINK.sub('href="#main-content"', html)
+    for old, new in replace.items():
+        html = html.replace(old, new)
+    return html
+
+
+def news_items(rng: random.Random, count: int, base: List[dict]) -> List[dict]:
+    day = _dt.date(2024, 10, 1)
+    items = []
+    for i in range(count):
+        template = base[i % len(base)]
+        date = (day - _dt.timedelta(days=i // 3)).isoformat()
+        items.append(dict(
+            template,
+            date=date,
+            title=f"{sentence(rng, 6)} #{i}",
+            excerpt=sentence(rng, 20),
+            url=f"../news/{date}-synthetic-{i:06d}.html",
+        ))
+    return items
+
+
+def generate_site(dest: Path, spec: SiteSpec) -> Dict[str, int]:
+    """Write the synthetic site under dest (which must not exist yet)."""
+    rng = random.Random(spec.seed)
+    copy_tree(dest)
+    base = json.loads(MANIFEST.read_text(encoding='utf-8'))
+    items = news_items(rng, spec.news, base)
+    manifest = dest / MANIFEST.relative_to(ROOT)
+    manifest.write_text(json.dumps(base + items, ensure_ascii=False, indent=2) + '\n',
+                        encoding='utf-8')
+
+    images = sorted(p.relative_to(ROOT).as_posix()
+                    for p in (ROOT / 'images').glob('*.webp')
+                    if not re.search(r'-\d+w\.webp$', p.name))
+    sections = [f'pages/section-{i:05d}.html' for i in range(spec.pages)]
+    news = [site_path(item['url']) for item in items]
+    # entries left without a page (decided up front so nothing links there)
+    missing = {rel for rel in news if rng.random() < spec.missing}
+    real = sorted(p.relative_to(ROOT).as_posix() for p in (ROOT / 'pages').glob('*.html'))
+    targets = [rel for rel in news if rel not in missing] + sections + real[-REAL_PAGES:]
+
+    shell = (ROOT / NEWS_SHELL).read_text(encoding='utf-8')
+    shell_item = next(i for i in base if site_path(i['url']) == NEWS_SHELL)
+    written = 0
+    for item, rel in zip(items, news):
+        if rel in missing:
+            continue  # left for generate_news_stubs.py
+        body = render_body(rng, spec, item['title'], targets, images, '../')
+        html = fill_shell(shell, body, {
+            shell_item['title']: item['title'],
+            shell_item['excerpt']: item['excerpt'],
+            NEWS_SHELL: rel,
+        })
+        (dest / rel).write_text(html, encoding='utf-8')
+        written += 1
+
+    shell = (ROOT / PAGE_SHELL).read_text(encoding='utf-8')
+    for i, rel in enumerate(sections):
+        title = f"{sentence(rng, 4)} {i}"
+        body = render_body(rng, spec, title, targets, images, '../')
+        html = fill_shell(shell, body, {PAGE_SHELL: rel})
+        html = RE_TITLE.sub(f'<title>{title} | 世新大學</title>', html, count=1)
+        (dest / rel).write_text(html, encoding='utf-8')
+    return {'manifest_items': len(base) + len(items), 'news_pages': written,
+            'section_pages': len(sections)}
+
+
+def add_spec_args(ap: argparse.ArgumentParser) -> None:
+    d = SiteSpec()
+    ap.add_argument('--news', type=int, default=d.news, help='synthetic news entries')
+    ap.add_argument('--pages', type=int, default=d.pages, help='extra pages/*.html')
+    ap.add_argument('--links', type=int, default=d.links, help='links per page')
+    ap.add_argument('--imgs', type=int, default=d.imgs, help='images per page')
+    ap.add_argument('--headings', type=int, default=d.headings,
+                    help='sections (h2 with id) per page')
+    ap.add_argument('--missing', type=float, default=d.missing,
+                    help='fraction of news entries without a page')
+    ap.add_argument('--seed', type=int, default=d.seed)
+
+
+def spec_from_args(args: argparse.Namespace) -> SiteSpec:
+    return SiteSpec(news=args.news, pages=args.pages, links=args.links,
+                    imgs=args.imgs, headings=args.headings,
+                    missing=args.missing, seed=args.seed)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('dest', type=Path, help='directory to create')
+    add_spec_args(ap)
+    args = ap.parse_args(argv)
+    if args.dest.exists():
+        print(f"{args.dest} already exists")
+        return 1
+    counts = generate_site(args.dest, spec_from_args(args))
+    print(', '.join(f"{k}={v}" for k, v in counts.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
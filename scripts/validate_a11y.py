@@ -6,41 +6,46 @@ Accessibility checks:
 Prints issues and exits non-zero if any are found.
 """
 from __future__ import annotations
-from pathlib import Path
-import re
-
-ROOT = Path(__file__).resolve().parents[1]
-HTML_FILES = [
-    ROOT / 'index.html',
-    *(ROOT / 'pages').glob('*.html'),
-    *(ROOT / 'news').glob('*.html'),
-]
-IMG_RE = re.compile(r'<img\s+([^>]+)>', re.I)
-ALT_RE = re.compile(r'alt=["\']([^"\']*)["\']', re.I)
-ROLE_PRESENT = re.compile(r'role=["\']presentation["\']', re.I)
-ARIA_HIDDEN = re.compile(r'aria-hidden=["\']true["\']', re.I)
-
-issues: list[str] = []
-
-for html in HTML_FILES:
-    if not html.exists():
-        continue
-    text = html.read_text(encoding='utf-8', errors='ignore')
-    for m in IMG_RE.finditer(text):
-        attrs = m.group(1)
-        if ROLE_PRESENT.search(attrs) or ARIA_HIDDEN.search(attrs):
+import sys
+
+import instrument
+from site_corpus import Page, is_top_level_page, load_pages, run_check
+
+CHECK_NAME = 'a11y'
+VERSION = 1
+FATAL = True
+
+
+def select(rel: str) -> bool:
+    return is_top_level_page(rel)
+
+
+def check_page(page: Page) -> list[str]:
+    issues: list[str] = []
+    for attrs in page.imgs:
+        if attrs.get('role', '').lower() == 'presentation':
+            continue
+        if attrs.get('aria-hidden', '').lower() == 'true':
             continue
-        altm = ALT_RE.search(attrs)
-        if not altm or altm.group(1).strip() == '':
-            msg = (
-                f"[IMG ALT] {html.relative_to(ROOT)} -> missing or empty alt"
-            )
-            issues.append(msg)
-
-if issues:
-    print('Accessibility validation found issues:')
-    for i in issues:
-        print(' -', i)
-    raise SystemExit(1)
-else:
+        if attrs.get('alt', '').strip() == '':
+            issues.append(f"[IMG ALT] {page.rel} -> missing or empty alt")
+    return issues
+
+
+def report(pages: list[Page], issues: list[str]) -> int:
+    if issues:
+        print('Accessibility validation found issues:')
+        for i in issues:
+            print(' -', i)
+        return 1
     print('Accessibility validation OK: all <img> have alt or are decorative.')
+    return 0
+
+
+def main() -> int:
+    pages = load_pages()
+    return report(pages, run_check(sys.modules[__name__], pages))
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
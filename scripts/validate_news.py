@@ -1,49 +1,61 @@
 #!/usr/bin/env python3
 """
-Validate news-manifest.json against actual files and images.
+Validate news-manifest.json against actual files, images and shard-safe
+category names.
 Exits with non-zero code if problems found.
 """
 from __future__ import annotations
-import json
 from pathlib import Path
+import sys
 from typing import List
 
+import instrument
+from generate_news_shards import bad_categories
+from news_store import NewsStore, site_path
+
 ROOT = Path(__file__).resolve().parents[1]
 MANIFEST = ROOT / 'js' / 'news-manifest.json'
 IMG_ROOT = ROOT / 'images'
 NEWS_ROOT = ROOT / 'news'
 BASE_URL = 'https://shu-edu-tw.github.io'
 
-problems: List[str] = []
 
-if not MANIFEST.exists():
-    print('No news-manifest.json found. Skipping.')
-    raise SystemExit(0)
+def main() -> int:
+    problems: List[str] = []
+
+    if not MANIFEST.exists():
+        print('No news-manifest.json found. Skipping.')
+        return 0
 
-data = json.loads(MANIFEST.read_text(encoding='utf-8'))
+    store = NewsStore.load(MANIFEST)
+    for name in bad_categories(store):
+        problems.append(f"[BAD CATEGORY] {name!r}: use a lower-case slug "
+                        f"(letters, digits, '-', '_') other than 'all'")
 
-for i, item in enumerate(data, start=1):
-    title = item.get('title', '(no title)')
-    url = item.get('url', '')
-    image = item.get('image', '')
+    for item in store:
+        title = item.get('title', '(no title)')
 
-    # Normalize relative paths (../images/... -> images/...)
-    page_rel = url.replace('../', '')
-    img_rel = image.replace('../', '')
+        # Normalize relative paths (../images/... -> images/...)
+        page_rel = site_path(item.get('url', ''))
+        img_rel = site_path(item.get('image', ''))
 
-    page_path = ROOT / page_rel
-    img_path = ROOT / img_rel
+        page_path = ROOT / page_rel
+        img_path = ROOT / img_rel
 
-    if not page_path.exists():
-        problems.append(f"[MISSING PAGE] {title} -> {BASE_URL}/{page_rel}")
+        if not page_path.exists():
+            problems.append(f"[MISSING PAGE] {title} -> {BASE_URL}/{page_rel}")
 
-    if not img_path.exists():
-        problems.append(f"[MISSING IMAGE] {title} -> {BASE_URL}/{img_rel}")
+        if not img_path.exists():
+            problems.append(f"[MISSING IMAGE] {title} -> {BASE_URL}/{img_rel}")
 
-if problems:
-    print('News validation found issues:')
-    for p in problems:
-        print(' -', p)
-    raise SystemExit(1)
-else:
+    if problems:
+        print('News validation found issues:')
+        for p in problems:
+            print(' -', p)
+        return 1
     print('News validation OK: all listed pages and images exist.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(instrument.run(main))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Watch the tree and revalidate / regenerate on every change.
+- Polls file stamps (size, mtime) every --interval seconds; pure Python,
+  no inotify binding needed, and an unchanged poll costs one directory
+  walk
+- Keeps the parsed pages, check findings, the news manifest index
+  (NewsStore) and the link graph in memory; a change re-parses only the
+  changed pages and updates the graph in place
+- Re-runs the run_all checks only on affected pages: the changed pages
+  plus, for checks with page_deps (links), the pages that link to a path
+  that appeared, disappeared or changed its ids
+- Re-runs in-process only the build.py outputs whose inputs changed
+  (WATCH_NODES: stubs, news shards, sitemaps, service worker manifest,
+  validate_news); files they write are picked up on the next poll
+- Prints new and resolved findings per cycle with its timing
+Starts from the run_all cache (.cache/), so a warm start is quick.
+Changes to scripts/*.py need a restart. Stop with Ctrl-C.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import check_internal_links
+import generate_news_shards
+import generate_news_stubs
+import generate_sitemaps
+import generate_sw_manifest
+import validate_news
+from build import NODES
+from corpus_cache import CorpusCache
+from link_graph import MANIFEST_REL, LinkGraph, manifest_edges, page_edges
+from news_store import NewsStore
+from run_all import CHECKS
+from site_corpus import ROOT, SKIP_DIRS, Page, is_corpus_check, parse_page, read_html
+
+Stamp = Tuple[int, int]
+IGNORED_DIRS = {'.git', '.cache', 'deploy_bundle', '__pycache__'}
+
+# build.py nodes re-run in-process, in this order; their inputs decide
+# when (images rewrites pages and is left to build.py)
+WATCH_NODES: Dict[str, Callable[[], object]] = {
+    'stubs': lambda: generate_news_stubs.main([]),
+    'news_shards': generate_news_shards.main,
+    'sitemaps': lambda: generate_sitemaps.main([]),
+    'sw_manifest': lambda: generate_sw_manifest.main([]),
+    'validate_news': validate_news.main,
+}
+
+
+def snapshot(root: Path = ROOT) -> Dict[str, Stamp]:
+    """Repo-relative path -> (size, mtime_ns) for every watched file."""
+    stamps: Dict[str, Stamp] = {}
+    todo = [('', str(root))]
+    while todo:
+        prefix, path = todo.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS:
+                        todo.append((prefix + entry.name + '/', entry.path))
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed while we were looking
+                stamps[prefix + entry.name] = (st.st_size, st.st_mtime_ns)
+    return stamps
+
+
+def is_page(rel: str) -> bool:
+    return rel.endswith('.html') and not rel.startswith(SKIP_DIRS)
+
+
+class Watcher:
+    def __init__(self, root: Path = ROOT, outputs: bool = True):
+        self.root = root
+        self.outputs = outputs
+        self.stamps: Dict[str, Stamp] = {}
+        self.pages: Dict[str, Page] = {}
+        self.findings: Dict[str, Dict[str, List[str]]] = {}
+        self.graph = LinkGraph(set())
+        self.nodes = [n for name in WATCH_NODES for n in NODES if n.name == name]
+
+    # -- startup ---------------------------------------------------------
+
+    def load(self) -> None:
+        """Everything from the run_all cache; only changed pages parse."""
+        cache = CorpusCache(root=self.root)
+        pages = cache.load_pages()
+        for check in CHECKS:
+            cache.run_check(check, pages)
+            self.findings[check.CHECK_NAME] = {
+                rel: hit['issues']
+                for rel, hit in cache.checks[check.CHECK_NAME]['pages'].items()}
+        cache.save()
+        self.stamps = snapshot(self.root)
+        self.pages = {page.rel: page for page in pages}
+        # one set shared by the graph and the links check, updated in place
+        exists = set(self.stamps)
+        check_internal_links.EXISTING = exists
+        self.graph = LinkGraph(exists)
+        for page in pages:
+            self.graph.set_page(page.rel, page_edges(page), page.ids)
+        self.graph.set_page(MANIFEST_REL, manifest_edges(NewsStore.load()))
+
+    # -- one cycle -------------------------------------------------------
+
+    def poll(self) -> Tuple[Set[str], Set[str], Set[str]]:
+        """(added, removed, modified) since the last poll."""
+        now = snapshot(self.root)
+        old = self.stamps
+        self.stamps = now
+        added = now.keys() - old.keys()
+        removed = old.keys() - now.keys()
+        modified = {rel for rel in now.keys() & old.keys() if now[rel] != old[rel]}
+        return set(added), set(removed), modified
+
+    def update_pages(self, added: Set[str], removed: Set[str],
+                     modified: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """Re-parse changed pages; returns (pages to check, dependency
+        triggers: paths whose existence or ids changed)."""
+        exists = self.graph.exists
+        exists |= added
+        exists -= removed
+        triggers = added | removed
+        for rel in sorted(removed):
+            if self.pages.pop(rel, None) is not None:
+                self.graph.remove_page(rel)
+                for found in self.findings.values():
+                    found.pop(rel, None)
+        changed = {rel for rel in added | modified if is_page(rel)}
+        for rel in sorted(changed):
+            try:
+                page = parse_page(rel, read_html(rel, self.root))
+            except FileNotFoundError:
+                continue
+            old = self.pages.get(rel)
+            if old is None or old.ids != page.ids:
+                triggers.add(rel)
+            self.pages[rel] = page
+            self.graph.set_page(rel, page_edges(page), page.ids)
+        if MANIFEST_REL in added | modified:
+            self.graph.set_page(MANIFEST_REL, manifest_edges(NewsStore.load()))
+        return changed, triggers
+
+    def run_checks(self, changed: Set[str], triggers: Set[str]) -> Tuple[List[str], List[str], int]:
+        """Re-check affected pages; returns (new, resolved, pages checked)."""
+        linked = {src for target in triggers
+                  for src in self.graph.inbound.get(target, {})} & self.pages.keys()
+        new: List[str] = []
+        resolved: List[str] = []
+        checked: Set[str] = set()
+        pages = list(self.pages.values())
+        for check in CHECKS:
+            rels = changed | linked if hasattr(check, 'page_deps') else changed
+            rels = {rel for rel in rels if rel in self.pages and check.select(rel)}
+            if not rels:
+                continue
+            if is_corpus_check(check):
+                check.prepare(pages)
+            found = self.findings.setdefault(check.CHECK_NAME, {})
+            for rel in sorted(rels):
+                before = set(found.get(rel, ()))
+                after = check.check_page(self.pages[rel])
+                found[rel] = after
+                new += [i for i in dict.fromkeys(after) if i not in before]
+                resolved += sorted(before.difference(after))
+            checked |= rels
+        return new, resolved, len(checked)
+
+    def run_outputs(self, paths: Set[str]) -> List[Tuple[str, float]]:
+        ran = []
+        for node in self.nodes:
+            if not any(fnmatch.fnmatchcase(rel, pat)
+                       for rel in paths for pat in node.inputs):
+                continue
+            t = time.perf_counter()
+            print(f"[{node.name}]")
+            try:
+                WATCH_NODES[node.name]()
+            except SystemExit:
+                pass
+            except Exception as exc:  # keep watching; report and go on
+                print(f"[{node.name}] failed: {exc!r}")
+            ran.append((node.name, time.perf_counter() - t))
+        return ran
+
+    def cycle(self) -> bool:
+        """Poll once and react; False if nothing changed."""
+        added, removed, modified = self.poll()
+        if not (added or removed or modified):
+            return False
+        t = time.perf_counter()
+        paths = added | removed | modified
+        changed, triggers = self.update_pages(added, removed, modified)
+        new, resolved, checked = self.run_checks(changed, triggers)
+        checks_done = time.perf_counter()
+        ran = self.run_outputs(paths) if self.outputs else []
+        stamp = time.strftime('%H:%M:%S')
+        print(f"{stamp} {len(paths)} changed ({', '.join(sorted(paths)[:3])}"
+              f"{', ...' if len(paths) > 3 else ''}): re-parsed {len(changed)}, "
+              f"checked {checked} pages in {(checks_done - t) * 1000:.1f} ms")
+        for issue in new:
+            print(f"  + {issue}")
+        for issue in resolved:
+            print(f"  - {issue} (fixed)")
+        for name, secs in ran:
+            print(f"  {name} {secs * 1000:.1f} ms")
+        total = sum(len(v) for found in self.findings.values() for v in found.values())
+        print(f"  {total} open findings")
+        return True
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--interval', type=float, default=0.5,
+                    help='seconds between polls (default 0.5)')
+    ap.add_argument('--no-outputs', action='store_true',
+                    help='only re-run checks, never regenerate files')
+    args = ap.parse_args(argv)
+
+    t = time.perf_counter()
+    watcher = Watcher(outputs=not args.no_outputs)
+    watcher.load()
+    total = sum(len(v) for found in watcher.findings.values() for v in found.values())
+    print(f"Watching {len(watcher.stamps)} files ({len(watcher.pages)} pages, "
+          f"{total} open findings); loaded in {time.perf_counter() - t:.2f}s. "
+          f"Ctrl-C to stop.")
+    try:
+        while True:
+            watcher.cycle()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
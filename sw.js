@@ -1,39 +1,78 @@
 // Service Worker for Caching
 // ==========================
+// The precache list below is generated (python3 scripts/generate_sw_manifest.py);
+// each entry carries a content revision, so an update only re-downloads
+// the files whose revision changed. The runtime cache is named after
+// PRECACHE_VERSION, so it starts empty whenever the list changes.
 
-const CACHE_NAME = 'shu-website-v4';
-const urlsToCache = [
-    '/',
-    '/index.html',
-    '/offline.html',
-    '/css/style.css',
-    '/js/main.js',
-    '/js/performance.js',
-    '/images/shu-logo.webp',
-    '/images/Banner.webp',
-    '/pages/about.html',
-    '/pages/academics.html',
-    '/pages/admissions.html',
-    '/pages/alumni.html',
-    '/pages/campus-life.html',
-    '/pages/contact.html',
-    '/pages/courses.html',
-    '/pages/faculty.html',
-    '/pages/news.html',
-    '/news/2024-10-04-marshall-president-visit.html',
-    '/news/2024-10-08-printing-gold-award.html',
-    '/news/2024-10-11-golden-harvest-award.html',
-    '/news/2024-10-18-campus-recruitment.html'
+// precache-manifest:start (generated by scripts/generate_sw_manifest.py)
+const PRECACHE_MANIFEST = [
+    {"url": "/", "revision": "c444711fd83a"},
+    {"url": "/index.html", "revision": "c444711fd83a"},
+    {"url": "/offline.html", "revision": "e1aae6b5f389"},
+    {"url": "/pages/about.html", "revision": "454c931602a4"},
+    {"url": "/pages/academics.html", "revision": "b9cf30ee84b6"},
+    {"url": "/pages/admissions.html", "revision": "071272c92637"},
+    {"url": "/pages/alumni.html", "revision": "baa4e033c6f8"},
+    {"url": "/pages/campus-life.html", "revision": "9c4dc5926ac4"},
+    {"url": "/pages/contact.html", "revision": "b5c2a3d31a2d"},
+    {"url": "/pages/courses.html", "revision": "1062bd3e7fb4"},
+    {"url": "/pages/faculty.html", "revision": "43178618f3e1"},
+    {"url": "/pages/news.html", "revision": "2d5fc3a2f69e"},
+    {"url": "/news/2024-10-28-ai-broadcasting-award.html", "revision": "e839c290084b"},
+    {"url": "/news/2024-10-25-lvs-upgrade.html", "revision": "35a35a742ecc"},
+    {"url": "/news/2024-10-22-gianna-jun-ambassador.html", "revision": "565938985188"},
+    {"url": "/news/2024-10-18-campus-recruitment.html", "revision": "7e245ef7e74a"},
+    {"url": "/news/2024-10-15-cheerleading-championship.html", "revision": "55818e434a23"},
+    {"url": "/news/2024-10-11-golden-harvest-award.html", "revision": "f01908209e1b"},
+    {"url": "/news/2024-10-08-printing-gold-award.html", "revision": "aa7bf36ee537"},
+    {"url": "/news/2024-10-04-marshall-president-visit.html", "revision": "7b1ec72f8a21"},
+    {"url": "/css/style.css", "revision": "1be660dbf670"},
+    {"url": "/images/Banner.webp", "revision": "621a2c90e64c"},
+    {"url": "/images/shu-logo.webp", "revision": "d413a46a4644"},
+    {"url": "/js/main.js", "revision": "07fb44abbf50"},
+    {"url": "/js/performance.js", "revision": "10b9144a704f"},
+    {"url": "/js/news-loader.js", "revision": "6eea03a51d63"},
+    {"url": "/images/ai-smart-challenge.webp", "revision": "22c1298a47c0"},
+    {"url": "/images/lvs-studio-upgrade.webp", "revision": "26386ff70f87"},
+    {"url": "/images/gianna-jun-ambassador.webp", "revision": "fa4a49105a20"},
+    {"url": "/images/cheerleading-champion.webp", "revision": "5064ad929b2b"},
 ];
+const PRECACHE_VERSION = 'f78e4e829c63';
+// precache-manifest:end
+
+const PRECACHE_NAME = 'shu-precache';
+const RUNTIME_NAME = `shu-runtime-${PRECACHE_VERSION}`;
+const REVISION_HEADER = 'X-Precache-Revision';
+
+// Fetch and store one entry unless the cached copy has the same revision
+function precacheEntry(cache, entry) {
+    return cache.match(entry.url).then(cached => {
+        if (cached && cached.headers.get(REVISION_HEADER) === entry.revision) {
+            return;
+        }
+        return fetch(entry.url, { cache: 'reload' }).then(response => {
+            if (!response.ok) {
+                throw new Error(`${entry.url}: HTTP ${response.status}`);
+            }
+            const headers = new Headers(response.headers);
+            headers.set(REVISION_HEADER, entry.revision);
+            return response.blob().then(body => cache.put(entry.url,
+                new Response(body, {
+                    status: response.status,
+                    statusText: response.statusText,
+                    headers
+                })));
+        });
+    });
+}
 
 // Install event
 self.addEventListener('install', event => {
     event.waitUntil(
-        caches.open(CACHE_NAME)
-            .then(cache => {
-                console.log('Opened cache');
-                return cache.addAll(urlsToCache);
-            })
+        caches.open(PRECACHE_NAME)
+            .then(cache => Promise.all(
+                PRECACHE_MANIFEST.map(entry => precacheEntry(cache, entry))))
             .catch(err => {
                 console.error('Cache installation failed:', err);
             })
@@ -44,15 +83,15 @@ self.addEventListener('install', event => {
 // Fetch event with network-first strategy for HTML
 self.addEventListener('fetch', event => {
     const { request } = event;
-    const url = new URL(request.url);
-    
+    if (request.method !== 'GET') return;
+
     // Network-first for HTML pages
-    if (request.headers.get('accept').includes('text/html')) {
+    if ((request.headers.get('accept') || '').includes('text/html')) {
         event.respondWith(
             fetch(request)
                 .then(response => {
                     const responseClone = response.clone();
-                    caches.open(CACHE_NAME).then(cache => {
+                    caches.open(RUNTIME_NAME).then(cache => {
                         cache.put(request, responseClone);
                     });
                     return response;
@@ -66,7 +105,26 @@ self.addEventListener('fetch', event => {
         );
         return;
     }
-    
+
+    // Network-first for JSON (news manifest and shards change between
+    // deploys); the cached copy is only an offline fallback
+    if (new URL(request.url).pathname.endsWith('.json')) {
+        event.respondWith(
+            fetch(request)
+                .then(response => {
+                    if (response.ok) {
+                        const responseClone = response.clone();
+                        caches.open(RUNTIME_NAME).then(cache => {
+                            cache.put(request, responseClone);
+                        });
+                    }
+                    return response;
+                })
+                .catch(() => caches.match(request))
+        );
+        return;
+    }
+
     // Cache-first for other resources
     event.respondWith(
         caches.match(request)
@@ -80,7 +138,7 @@ self.addEventListener('fetch', event => {
                         return response;
                     }
                     const responseClone = response.clone();
-                    caches.open(CACHE_NAME).then(cache => {
+                    caches.open(RUNTIME_NAME).then(cache => {
                         cache.put(request, responseClone);
                     });
                     return response;
@@ -89,20 +147,27 @@ self.addEventListener('fetch', event => {
     );
 });
 
-// Activate event - clean up old caches
+// Activate event - drop other caches (including runtime caches of earlier
+// versions) and precache entries no longer listed
 self.addEventListener('activate', event => {
+    const wanted = new Set(
+        PRECACHE_MANIFEST.map(entry => new URL(entry.url, self.location).href));
     event.waitUntil(
-        caches.keys().then(cacheNames => {
-            return Promise.all(
+        caches.keys()
+            .then(cacheNames => Promise.all(
                 cacheNames.map(cacheName => {
-                    if (cacheName !== CACHE_NAME) {
+                    if (cacheName !== PRECACHE_NAME && cacheName !== RUNTIME_NAME) {
                         console.log('Deleting old cache:', cacheName);
                         return caches.delete(cacheName);
                     }
                 })
-            );
-        })
+            ))
+            .then(() => caches.open(PRECACHE_NAME))
+            .then(cache => cache.keys().then(requests => Promise.all(
+                requests
+                    .filter(request => !wanted.has(request.url))
+                    .map(request => cache.delete(request))
+            )))
     );
     return self.clients.claim();
 });
-